@@ -1,4 +1,6 @@
-from bytes_utils import ints_from_4bytes, ints_to_4bytes
+import threading
+
+from bytes_utils import ints_from_4bytes, words_to_bytes
 
 sigma = "expand 32-byte k"
 tau = "expand 16-byte k"
@@ -27,6 +29,7 @@ class ChaCha(object):
             self.state += ints_from_4bytes(key)
         self.state += [0, 0]
         self.state += ints_from_4bytes(iv)
+        self.lock = threading.Lock()
 
     def permuted(self, a):
         """Takes 16 integers or 64 bytes, returns the ChaCha-permuted bytes
@@ -64,16 +67,28 @@ class ChaCha(object):
             for i in range(16):
                 x[i] = (x[i] + a[i] & 0xFFFFFFFF)
 
-        return b''.join(ints_to_4bytes(x))
+        return words_to_bytes(x)
 
     def keystream(self, N=64):
         """Returns N bytes of keystream starting from the current state
 
-        Note that if N is not a multiple of 64, some keystream is discarded."""
-        output = bytes()
+        Note that if N is not a multiple of 64, some keystream is discarded.
+        The blocks are reserved by advancing the counter under a lock before
+        they are computed, so threads that share an instance get disjoint
+        parts of the keystream."""
+        with self.lock:
+            state = list(self.state)
+            for n in range(N, 0, -64):
+                increment(self.state)
+        output = []
         for n in range(N, 0, -64):
-            output += self.permuted(self.state)[:min(n, 64)]
-            self.state[12] += 1
-            if self.state[12] & 0xFFFFFFFF == 0:
-                self.state[13] += 1
-        return output
+            output.append(self.permuted(state)[:min(n, 64)])
+            increment(state)
+        return b''.join(output)
+
+
+def increment(state):
+    """Advances the block counter of state"""
+    state[12] += 1
+    if state[12] & 0xFFFFFFFF == 0:
+        state[13] += 1
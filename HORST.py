@@ -1,6 +1,7 @@
 import itertools
-from trees import hash_tree, auth_path, construct_root, root
-from bytes_utils import xor, chunkbytes
+from trees import (hash_tree, auth_path, construct_root, root, treehash,
+                   MaskedHash)
+from bytes_utils import chunkbytes
 
 
 class HORST(object):
@@ -39,42 +40,74 @@ class HORST(object):
         assert len(masks) >= 2 * self.tau
         sk = self.Gt(seed)
         sk = chunkbytes(sk, self.n // 8)
+        L = map(self.F, sk)
+        H = MaskedHash(self.H, masks)
+        _, pk = treehash(H, L)
+        return pk
+
+    def subtree(self, sk, masks):
+        """Returns the layers of the subtree of height tau - x above sk
+
+        sk -- the 2^{tau - x} secret-key elements below this subtree
+        """
         L = list(map(self.F, sk))
-        H = lambda x, y, i: self.H(xor(x, masks[2*i]), xor(y, masks[2*i+1]))
-        return root(hash_tree(H, L))
+        H = MaskedHash(self.H, masks)
+        return list(hash_tree(H, L))
 
-    def sign(self, m, seed, masks):
+    def sign(self, m, seed, masks, subtrees=None):
+        """Signs m, returning the signature and the public key
+
+        subtrees -- optional function that maps a list of chunks of secret-key
+                    elements to the list of their subtrees (see subtree),
+                    e.g. to compute these in parallel
+        """
         assert len(m) == self.m // 8
         assert len(seed) == self.n // 8
         assert len(masks) >= 2 * self.tau
         sk = self.Gt(seed)
         sk = chunkbytes(sk, self.n // 8)
-        L = list(map(self.F, sk))
-        H = lambda x, y, i: self.H(xor(x, masks[2*i]), xor(y, masks[2*i+1]))
-        tree = hash_tree(H, L)
-        trunk = list(itertools.islice(tree, 0, self.tau - self.x))
-        sigma_k = next(tree)
+        chunks = chunkbytes(sk, 1 << (self.tau - self.x))
+        if subtrees is None:
+            trees = [self.subtree(chunk, masks) for chunk in chunks]
+        else:
+            trees = subtrees(chunks)
+        # the layers of all subtrees together form the trunk of the tree
+        trunk = [list(itertools.chain(*layers)) for layers in zip(*trees)]
+        sigma_k = trunk.pop()
         M = self.message_indices(m)
-        pk = root(tree)
+        pk = self.top_root(sigma_k, masks)
         # the SPHINCS paper suggests to put sigma_k at the end of sigma
         # but the reference code places it at the front
         return ([(sk[Mi], auth_path(trunk, Mi)) for Mi in M] + [sigma_k], pk)
 
+    def subtree_root(self, Mi, sk, path, masks):
+        """Returns the index and root of the subtree that holds leaf Mi
+
+        Mi -- index of the revealed secret-key element
+        sk -- the revealed secret-key element
+        path -- authentication path from the leaf to the subtree root
+        """
+        H = MaskedHash(self.H, masks)
+        leaf = self.F(sk)
+        r = construct_root(H, path, leaf, Mi)
+        # there is an error in the SPHINCS paper for this formula, as it
+        # states that y_i = floor(M_i / 2^tau - x)
+        # rather than y_i = floor(M_i / 2^{tau - x})
+        yi = Mi // (1 << (self.tau - self.x))
+        return yi, r
+
+    def top_root(self, sigma_k, masks):
+        """Returns the HORST public key, given the subtree roots sigma_k"""
+        H = MaskedHash(self.H, masks[2*(self.tau - self.x):])
+        return root(hash_tree(H, sigma_k))
+
     def verify(self, m, sig, masks):
         assert len(m) == self.m // 8
         assert len(masks) >= 2 * self.tau
         M = self.message_indices(m)
-        H = lambda x, y, i: self.H(xor(x, masks[2*i]), xor(y, masks[2*i+1]))
         sigma_k = sig[-1]
         for (sk, path), Mi in zip(sig, M):
-            leaf = self.F(sk)
-            r = construct_root(H, path, leaf, Mi)
-            # there is an error in the SPHINCS paper for this formula, as it
-            # states that y_i = floor(M_i / 2^tau - x)
-            # rather than y_i = floor(M_i / 2^{tau - x})
-            yi = Mi // (1 << (self.tau - self.x))
+            yi, r = self.subtree_root(Mi, sk, path, masks)
             if r != sigma_k[yi]:
                 return False
-        Qtop = masks[2*(self.tau - self.x):]
-        H = lambda x, y, i: self.H(xor(x, Qtop[2*i]), xor(y, Qtop[2*i+1]))
-        return root(hash_tree(H, sigma_k))
+        return self.top_root(sigma_k, masks)
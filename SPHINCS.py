@@ -2,9 +2,14 @@
 """Python implementation of the SPHINCS signature scheme
 
 Usage:
-    SPHINCS.py keygen [--secret-key FILE] [--public-key FILE]
-    SPHINCS.py sign [-m FILE|--message FILE] [--secret-key FILE] [-s FILE|--signature FILE]
-    SPHINCS.py verify [-m FILE|--message FILE] [-s FILE|--signature FILE] [--public-key FILE]
+    SPHINCS.py keygen [--secret-key FILE] [--public-key FILE] [--trace FILE]
+    SPHINCS.py sign [-m FILE|--message FILE] [--secret-key FILE] [-s FILE|--signature FILE] [--trace FILE] [--jobs N]
+    SPHINCS.py verify [-m FILE|--message FILE] [-s FILE|--signature FILE] [--public-key FILE] [--trace FILE]
+    SPHINCS.py profile (keygen|sign|verify) [-m FILE|--message FILE] [--secret-key FILE] [--public-key FILE] [-s FILE|--signature FILE] [--deterministic] [--interval SEC] [--top N] [--collapsed FILE]
+    SPHINCS.py serve --socket PATH [--secret-key FILE] [--public-key FILE] [--workers N] [--max-workers N] [--max-queue N] [--cache-levels N] [--ring-slot-size N] [--metrics FILE]
+    SPHINCS.py client (sign|verify) --socket PATH [-m FILE|--message FILE] [-s FILE|--signature FILE]
+    SPHINCS.py sign-batch (--manifest FILE|--dir DIR) --secret-key FILE [--out DIR|--archive FILE] [--workers N] [--cache-levels N]
+    SPHINCS.py verify-batch (--manifest FILE|--dir DIR) --public-key FILE [--out DIR|--archive FILE] [--workers N]
     SPHINCS.py (-h|--help)
 
 Options:
@@ -12,20 +17,46 @@ Options:
     -m FILE, --message FILE      Specify a message file.
              --secret-key FILE   Specify a secret-key file.
              --public-key FILE   Specify a public-key file.
+             --trace FILE        Write a Chrome trace of the phases to FILE.
+             --jobs N            Compute the parts of a signature in N workers.
+             --deterministic     Profile by tracing every call, not sampling.
+             --interval SEC      Sampling interval [default: 0.001].
+             --top N             Number of functions in the table [default: 20].
+             --collapsed FILE    Write collapsed stacks for flame graphs to FILE.
+             --socket PATH       Unix socket of the signing service.
+             --workers N         Number of worker processes of the service.
+             --max-workers N     Grow the service up to N workers under load.
+             --max-queue N       Reject requests when N are already waiting.
+             --cache-levels N    Share the leaves of the top N levels [default: 0].
+             --ring-slot-size N  Pass payloads to workers in N-byte shared slots.
+             --metrics FILE      Write the metrics of the service to FILE.
+             --manifest FILE     File listing the files of a batch, one per line.
+             --dir DIR           Directory holding the files of a batch.
+             --out DIR           Directory for the signatures of a batch.
+             --archive FILE      Signature archive for the signatures of a batch.
     -h --help                    Show this help screen.
+
+When profiling, inputs that are not specified are generated; a signature needs
+the public key (or the secret key) it was made with. The collapsed stacks are
+written to stdout by default, and the table to stderr. The service loads the
+keys once and handles sign and verify requests from clients. Batches are
+signed and verified by a pool of workers; signatures are written as FILE.sig
+next to each file, unless --out or --archive is given.
 """
 
 import sys
 import docopt
 import os
 from math import ceil, log
-
+import addresses
 from ChaCha import ChaCha
 from WOTSplus import WOTSplus
 from HORST import HORST
 from bytes_utils import xor
 from blake import BLAKE
-from trees import l_tree, hash_tree, auth_path, construct_root, root
+from trees import l_tree, construct_root, root, treehash, MaskedHash
+from streaming import Verifier
+from instrument import Phase, NULL_PHASE
 
 
 class SPHINCS(object):
@@ -51,6 +82,8 @@ class SPHINCS(object):
         self.t = 1 << tau
         self.k = k
 
+        # every call gets its own BLAKE and ChaCha state (the permutation
+        # itself is stateless), so an instance can be shared by threads
         self.Hdigest = lambda r, m: BLAKE(512).digest(r + m)
         self.Fa = lambda a, k: BLAKE(256).digest(k + a)
         self.Frand = lambda m, k: BLAKE(512).digest(k + m)
@@ -61,95 +94,219 @@ class SPHINCS(object):
         self.F = lambda m: perm(m + C)[:32]
         self.H = lambda m1, m2: perm(xor(perm(m1 + C), m2 + bytes(32)))[:32]
 
-        self.wots = WOTSplus(n=n, w=w, F=self.F, Gl=self.Glambda)
-        self.horst = HORST(n=n, m=m, k=k, tau=tau,
+        self.observers = []
+        self.leaf_cache = None
+        self.assemble()
+
+    def __reduce__(self):
+        # the hash functions are lambdas, so pickle by parameters instead;
+        # this allows bound methods to be passed to process pools (without
+        # the observers and the leaf cache)
+        return (SPHINCS, (self.n, self.m, self.h, self.d,
+                          self.w, self.tau, self.k))
+
+    def assemble(self):
+        """(Re)builds WOTS+ and HORST from the current hash functions"""
+        self.wots = WOTSplus(n=self.n, w=self.w, F=self.F, Gl=self.Glambda)
+        self.horst = HORST(n=self.n, m=self.m, k=self.k, tau=self.tau,
                            F=self.F, H=self.H, Gt=self.Glambda)
 
+    def phase(self, name, **attrs):
+        """Returns a context manager that marks a phase for the observers"""
+        if not self.observers:
+            return NULL_PHASE
+        return Phase(self.observers, name, attrs)
+
     @classmethod
     def address(self, level, subtree, leaf):
-        t = level | (subtree << 4) | (leaf << 59)
-        return int.to_bytes(t, length=8, byteorder='little')
+        return addresses.to_bytes(addresses.pack(level, subtree, leaf))
 
     def wots_leaf(self, address, SK1, masks):
-        seed = self.Fa(address, SK1)
+        with self.phase('seed'):
+            seed = self.Fa(address, SK1)
         pk_A = self.wots.keygen(seed, masks)
-        H = lambda x, y, i: self.H(xor(x, masks[2*i]), xor(y, masks[2*i+1]))
-        return root(l_tree(H, pk_A))
+        return root(l_tree(MaskedHash(self.H, masks), pk_A))
+
+    def wots_leaves(self, a, SK1, Q, subh):
+        """Returns the leaves of the subtree that holds address a"""
+        A = addresses.leaf_addresses(a, subh)
+        return [self.wots_leaf(A_leaf, SK1, Q)
+                for A_leaf in addresses.split(A)]
 
     def wots_path(self, a, SK1, Q, subh):
-        ta = dict(a)
-        leafs = []
-        for subleaf in range(1 << subh):
-            ta['leaf'] = subleaf
-            leafs.append(self.wots_leaf(self.address(**ta), SK1, Q))
+        leafs = None
+        if self.leaf_cache is not None:
+            leafs = self.leaf_cache.leaves(a, SK1, Q)
+            for observer in self.observers:
+                if hasattr(observer, 'cache'):
+                    observer.cache('leaves', leafs is not None)
+        if leafs is None:
+            A = addresses.leaf_addresses(a, subh)
+            leafs = (self.wots_leaf(A_leaf, SK1, Q)
+                     for A_leaf in addresses.split(A))
         Qtree = Q[2 * ceil(log(self.wots.l, 2)):]
-        H = lambda x, y, i: self.H(xor(x, Qtree[2*i]), xor(y, Qtree[2*i+1]))
-        tree = list(hash_tree(H, leafs))
-        return auth_path(tree, a['leaf']), root(tree)
-
-    def keygen(self):
-        SK1 = os.urandom(self.n // 8)
-        SK2 = os.urandom(self.n // 8)
-        p = max(self.w-1, 2 * (self.h + ceil(log(self.wots.l, 2))), 2*self.tau)
-        Q = [os.urandom(self.n // 8) for _ in range(p)]
-        PK1 = self.keygen_pub(SK1, Q)
+        H = MaskedHash(self.H, Qtree)
+        path, pk = treehash(H, leafs, addresses.leaf(a))
+        # the neighbouring leaf may be a view into the leaf cache
+        return [bytes(node) for node in path], pk
+
+    def keygen(self, token=None):
+        """Returns a new key pair (SK, PK)
+
+        token -- optional cancellation.Token; raises Cancelled if it expires
+                 before the public key is complete
+        """
+        with self.phase('keygen'):
+            SK1 = os.urandom(self.n // 8)
+            SK2 = os.urandom(self.n // 8)
+            p = max(self.w-1, 2 * (self.h + ceil(log(self.wots.l, 2))),
+                    2*self.tau)
+            Q = [os.urandom(self.n // 8) for _ in range(p)]
+            PK1 = self.keygen_pub(SK1, Q, token)
         return (SK1, SK2, Q), (PK1, Q)
 
-    def keygen_pub(self, SK1, Q):
-        addresses = [self.address(self.d - 1, 0, i)
-                     for i in range(1 << (self.h//self.d))]
-        leafs = [self.wots_leaf(A, SK1, Q) for A in addresses]
+    def keygen_pub(self, SK1, Q, token=None):
+        check = token.check if token is not None else lambda: None
+        A = addresses.leaf_addresses(addresses.pack(self.d - 1, 0, 0),
+                                     self.h // self.d)
+        leafs = (check() or self.wots_leaf(A_leaf, SK1, Q)
+                 for A_leaf in addresses.split(A))
         Qtree = Q[2 * ceil(log(self.wots.l, 2)):]
-        H = lambda x, y, i: self.H(xor(x, Qtree[2*i]), xor(y, Qtree[2*i+1]))
-        PK1 = root(hash_tree(H, leafs))
+        H = MaskedHash(self.H, Qtree)
+        with self.phase('keygen.pub'):
+            _, PK1 = treehash(H, leafs)
         return PK1
 
-    def sign(self, M, SK):
+    def horst_subtree(self, sk, Q):
+        return self.horst.subtree(sk, Q)
+
+    def sign_parts(self, M, SK, executor=None, token=None):
+        """Yields the parts of the signature, each as soon as it is final
+
+        The parts are yielded in the order of the tuple returned by sign.
+        executor -- optional concurrent.futures executor that is used to
+                    compute the HORST subtrees and the authentication paths of
+                    all layers in parallel (this gives the same signature)
+        token -- optional cancellation.Token, checked between the HORST
+                 subtrees and between the layers; raises Cancelled (and
+                 cancels the work still queued in executor) once it expires
+        """
+        check = token.check if token is not None else lambda: None
+        check()
         SK1, SK2, Q = SK
         R = self.Frand(M, SK2)
         R1, R2 = R[:self.n // 8], R[self.n // 8:]
         D = self.Hdigest(R1, M)
         i = int.from_bytes(R2, byteorder='big')
         i >>= self.n - self.h
+        yield i
+        yield R1
         subh = self.h // self.d
-        a = {'level': self.d,
-             'subtree': i >> subh,
-             'leaf': i & ((1 << subh) - 1)}
-        a_horst = self.address(**a)
-        seed_horst = self.Fa(a_horst, SK1)
-        sig_horst, pk_horst = self.horst.sign(D, seed_horst, Q)
-        pk = pk_horst
-        sig = [i, R1, sig_horst]
+        a_horst = a = addresses.pack(self.d, i >> subh, i & ((1 << subh) - 1))
+        layers = []
         for level in range(self.d):
-            a['level'] = level
-            a_wots = self.address(**a)
-            seed_wots = self.Fa(a_wots, SK1)
-            wots_sig = self.wots.sign(pk, seed_wots, Q)
-            sig.append(wots_sig)
-            path, pk = self.wots_path(a, SK1, Q, subh)
-            sig.append(path)
-            a['leaf'] = a['subtree'] & ((1 << subh) - 1)
-            a['subtree'] >>= subh
-        return tuple(sig)
+            a = addresses.with_level(a, level)
+            layers.append(a)
+            a = addresses.parent(a, subh)
+        pending = []
+        if executor is not None:
+            # the paths do not depend on the signed roots, so start them all
+            paths = [executor.submit(self.wots_path, a, SK1, Q, subh)
+                     for a in layers]
+            pending.extend(paths)
 
-    def verify(self, M, sig, PK):
-        i, R1, sig_horst, *sig = sig
-        PK1, Q = PK
+        def subtrees(chunks):
+            if executor is None:
+                results = (self.horst_subtree(chunk, Q) for chunk in chunks)
+            else:
+                futures = [executor.submit(self.horst_subtree, chunk, Q)
+                           for chunk in chunks]
+                pending.extend(futures)
+                results = (future.result() for future in futures)
+            trees = []
+            for tree in results:
+                check()
+                trees.append(tree)
+            return trees
+        try:
+            with self.phase('sign.horst'):
+                with self.phase('seed'):
+                    seed_horst = self.Fa(addresses.to_bytes(a_horst), SK1)
+                sig_horst, pk_horst = self.horst.sign(D, seed_horst, Q,
+                                                      subtrees)
+            pk = pk_horst
+            yield sig_horst
+            for level, a in enumerate(layers):
+                check()
+                subtree = addresses.subtree(a)
+                with self.phase('sign.wots', level=level, subtree=subtree):
+                    with self.phase('seed'):
+                        seed_wots = self.Fa(addresses.to_bytes(a), SK1)
+                    wots_sig = self.wots.sign(pk, seed_wots, Q)
+                yield wots_sig
+                with self.phase('sign.wots_path', level=level,
+                                subtree=subtree):
+                    if executor is None:
+                        path, pk = self.wots_path(a, SK1, Q, subh)
+                    else:
+                        path, pk = paths[level].result()
+                yield path
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def sign(self, M, SK, executor=None, token=None):
+        with self.phase('sign'):
+            return tuple(self.sign_parts(M, SK, executor, token))
+
+    def sign_stream(self, M, SK, executor=None, token=None):
+        """Yields the packed signature in chunks, in wire order
+
+        Concatenating the chunks gives pack(sign(M, SK)).
+        """
+        with self.phase('sign'):
+            for part in self.sign_parts(M, SK, executor, token):
+                with self.phase('sign.pack'):
+                    chunk = self.pack(part)
+                yield chunk
+
+    def verify_layer(self, pk, wots_sig, wots_path, idx, Q):
+        """Returns the root of the subtree that signed pk at leaf idx"""
         Qtree = Q[2 * ceil(log(self.wots.l, 2)):]
-        D = self.Hdigest(R1, M)
-        pk = pk_horst = self.horst.verify(D, sig_horst, Q)
-        if pk_horst is False:
-            return False
-        subh = self.h // self.d
-        H = lambda x, y, i: self.H(xor(x, Q[2*i]), xor(y, Q[2*i+1]))
-        Ht = lambda x, y, i: self.H(xor(x, Qtree[2*i]), xor(y, Qtree[2*i+1]))
-        for _ in range(self.d):
-            wots_sig, wots_path, *sig = sig
-            pk_wots = self.wots.verify(pk, wots_sig, Q)
-            leaf = root(l_tree(H, pk_wots))
-            pk = construct_root(Ht, wots_path, leaf, i & 0x1f)
-            i >>= subh
-        return PK1 == pk
+        pk_wots = self.wots.verify(pk, wots_sig, Q)
+        leaf = root(l_tree(MaskedHash(self.H, Q), pk_wots))
+        return construct_root(MaskedHash(self.H, Qtree), wots_path, leaf, idx)
+
+    def verify(self, M, sig, PK):
+        with self.phase('verify'):
+            i, R1, sig_horst, *sig = sig
+            PK1, Q = PK
+            if i >> self.h:  # the unused high bits of the index must be zero
+                return False
+            D = self.Hdigest(R1, M)
+            with self.phase('verify.horst'):
+                pk = pk_horst = self.horst.verify(D, sig_horst, Q)
+            if pk_horst is False:
+                return False
+            subh = self.h // self.d
+            for level in range(self.d):
+                wots_sig, wots_path, *sig = sig
+                with self.phase('verify.wots', level=level):
+                    pk = self.verify_layer(pk, wots_sig, wots_path,
+                                           i & ((1 << subh) - 1), Q)
+                i >>= subh
+            return PK1 == pk
+
+    def verifier(self, M, PK):
+        """Returns a Verifier that consumes the packed signature in chunks"""
+        return Verifier(self, M, PK)
+
+    def signature_bytes(self):
+        """Returns the length of a packed signature (in bytes)"""
+        n = self.n // 8
+        horst = self.k * (1 + self.tau - self.horst.x) + (1 << self.horst.x)
+        layers = self.d * (self.wots.l + self.h // self.d)
+        return (self.h + 7) // 8 + n + (horst + layers) * n
 
     def pack(self, x):
         if type(x) is bytes:
@@ -190,11 +347,108 @@ class SPHINCS(object):
 if __name__ == "__main__":
     args = docopt.docopt(__doc__)
     sphincs256 = SPHINCS()
+    if args['--trace'] is not None:
+        from tracing import Recorder
+        recorder = Recorder()
+        sphincs256.observers.append(recorder)
 
     for f in ['--signature', '--message', '--secret-key', '--public-key']:
         if args[f] is None or args[f] == '-':
             args[f] = None
-    if args['keygen']:
+
+    def read(f):
+        """Returns the contents of the file given as option f, if any"""
+        if args[f] is None:
+            return None
+        with open(args[f], 'rb') as fh:
+            return fh.read()
+
+    if args['profile']:
+        import profiler
+        if args['--message']:
+            message = read('--message')
+        else:
+            message = os.urandom(256)
+        if args['verify'] and args['--public-key'] and not args['--signature']:
+            sys.exit("Profiling verify with --public-key needs --signature")
+        if args['verify'] and args['--signature']:
+            sig = sphincs256.unpack(sig=read('--signature'))
+            if not (args['--public-key'] or args['--secret-key']):
+                sys.exit("Profiling verify with --signature needs "
+                         "--public-key or --secret-key")
+        if args['verify'] and args['--public-key']:
+            pk = sphincs256.unpack(pk=read('--public-key'))
+        elif not args['keygen']:
+            if args['--secret-key']:
+                sk = sphincs256.unpack(sk=read('--secret-key'))
+                if args['verify']:  # only verification needs the public key
+                    pk = (sphincs256.keygen_pub(sk[0], sk[2]), sk[2])
+            else:
+                print("Generating keys..", file=sys.stderr)
+                sk, pk = sphincs256.keygen()
+        if args['verify'] and not args['--signature']:
+            print("Signing..", file=sys.stderr)
+            sig = sphincs256.sign(message, sk)
+        if args['keygen']:
+            target = sphincs256.keygen
+        elif args['sign']:
+            target = lambda: sphincs256.sign(message, sk)
+        elif args['verify']:
+            target = lambda: sphincs256.verify(message, sig, pk)
+        if args['--deterministic']:
+            p = profiler.Tracer()
+        else:
+            p = profiler.Sampler(float(args['--interval']))
+        print("Profiling..", file=sys.stderr)
+        with p:
+            target()
+        if args['--collapsed'] is None:
+            profiler.write_collapsed(p.stacks, sys.stdout)
+        else:
+            with open(args['--collapsed'], 'w') as f:
+                profiler.write_collapsed(p.stacks, f)
+        profiler.write_top(profiler.top(p.stacks, int(args['--top'])),
+                           sys.stderr)
+        sys.exit(0)
+
+    if args['sign-batch'] or args['verify-batch']:
+        import batch
+        op = 'sign' if args['sign-batch'] else 'verify'
+        base, paths = batch.collect(args['--manifest'], args['--dir'])
+        with open(args['--secret-key' if op == 'sign' else '--public-key'],
+                  'rb') as f:
+            key = f.read()
+        number = lambda f: int(args[f]) if args[f] else None
+        report = batch.run(op, paths, base, key, out=args['--out'],
+                           workers=number('--workers'),
+                           cache_levels=number('--cache-levels'),
+                           archive=args['--archive'], log=sys.stderr)
+        batch.summary(report, op, sys.stderr)
+        sys.exit(1 if report['failed'] else 0)
+    elif args['serve']:
+        import service
+        number = lambda f: int(args[f]) if args[f] else None
+        server = service.Server(args['--socket'], sk=read('--secret-key'),
+                                pk=read('--public-key'),
+                                workers=number('--workers'),
+                                max_workers=number('--max-workers'),
+                                max_queue=number('--max-queue'),
+                                cache_levels=number('--cache-levels'),
+                                ring_slot_size=number('--ring-slot-size'),
+                                metrics=args['--metrics'])
+        print("Listening on %s.." % args['--socket'], file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        sys.exit(0)
+    if args['client'] and args['sign']:
+        ihandles, ohandles = ['--message'], ['--signature']
+    elif args['client']:
+        ihandles, ohandles = ['--message', '--signature'], []
+    elif args['keygen']:
         ihandles, ohandles = [], ['--secret-key', '--public-key']
     elif args['sign']:
         ihandles, ohandles = ['--message', '--secret-key'], ['--signature']
@@ -213,28 +467,61 @@ if __name__ == "__main__":
         else:
             fh[f[2:]] = open(args[f], 'wb')
 
-    if args['keygen']:
+    if args['client']:
+        import service
+        message = fh['message'].read()
+        try:
+            with service.Client(args['--socket']) as client:
+                if args['sign']:
+                    fh['signature'].write(client.sign(message))
+                    print('Wrote signature', file=sys.stderr)
+                elif client.verify(message, fh['signature'].read()):
+                    print('Verification succeeded', file=sys.stderr)
+                else:
+                    print('Verification failed', file=sys.stderr)
+        except (service.ServiceError, OSError) as e:
+            print('Service request failed: %s' % e, file=sys.stderr)
+            sys.exit(1)
+    elif args['keygen']:
         print("Generating keys..", file=sys.stderr)
         sk, pk = sphincs256.keygen()
-        fh['secret-key'].write(sphincs256.pack(sk))
-        fh['public-key'].write(sphincs256.pack(pk))
+        with sphincs256.phase('cli.write'):
+            fh['secret-key'].write(sphincs256.pack(sk))
+            fh['public-key'].write(sphincs256.pack(pk))
         print('Wrote keys', file=sys.stderr)
     elif args['sign']:
-        message = fh['message'].read()
-        sk = sphincs256.unpack(sk=fh['secret-key'].read())
+        with sphincs256.phase('cli.read'):
+            message = fh['message'].read()
+            sk = sphincs256.unpack(sk=fh['secret-key'].read())
         print("Signing..", file=sys.stderr)
-        signature = sphincs256.sign(message, sk)
-        fh['signature'].write(sphincs256.pack(signature))
+        executor = None
+        if args['--jobs'] is not None:
+            import pool
+            executor = pool.parallel_executor(int(args['--jobs']))
+        for chunk in sphincs256.sign_stream(message, sk, executor):
+            with sphincs256.phase('cli.write'):
+                fh['signature'].write(chunk)
+                fh['signature'].flush()
+        if executor is not None:
+            executor.shutdown()
         print('Wrote signature', file=sys.stderr)
     elif args['verify']:
-        message = fh['message'].read()
-        sig = sphincs256.unpack(sig=fh['signature'].read())
-        pk = sphincs256.unpack(pk=fh['public-key'].read())
+        with sphincs256.phase('cli.read'):
+            message = fh['message'].read()
+            pk = sphincs256.unpack(pk=fh['public-key'].read())
         print("Verifying..", file=sys.stderr)
-        if sphincs256.verify(message, sig, pk):
+        verifier = sphincs256.verifier(message, pk)
+        with sphincs256.phase('verify'):
+            for chunk in iter(lambda: fh['signature'].read(4096), b''):
+                if not verifier.update(chunk):
+                    break
+        if verifier.finalize():
             print('Verification succeeded', file=sys.stderr)
         else:
             print('Verification failed', file=sys.stderr)
 
     for f in fh.values():
         f.close()
+    if args['--trace'] is not None:
+        with open(args['--trace'], 'w') as f:
+            recorder.dump(f)
@@ -1,5 +1,5 @@
 from math import ceil, floor, log2
-from bytes_utils import xor, chunkbytes
+from bytes_utils import xor_each, chunkbytes
 
 
 class WOTSplus(object):
@@ -22,9 +22,15 @@ class WOTSplus(object):
 
     def chains(self, x, masks, chainrange):
         x = list(x)
-        for i in range(self.l):
-            for j in chainrange[i]:
-                x[i] = self.F(xor(x[i], masks[j]))
+        # advance all chains one step at a time, so that the masks can be
+        # applied to all chains that take that step in a single batch
+        for j in range(self.w - 1):
+            active = [i for i in range(self.l) if j in chainrange[i]]
+            if not active:
+                continue
+            masked = xor_each([x[i] for i in active], masks[j])
+            for i, y in zip(active, masked):
+                x[i] = self.F(y)
         return x
 
     def int_to_basew(self, x, base):
@@ -0,0 +1,67 @@
+"""Hyper-tree addresses as packed integers
+
+An address (level, subtree, leaf) is packed into a single integer as
+'level | subtree << 4 | leaf << 59', i.e. the layout of the reference
+implementation. Addresses are only converted to bytes where they are used
+as input to Fa, so that walking the hyper-tree needs no dicts or bytes.
+"""
+import struct
+
+LEVEL_BITS = 4
+LEAF_SHIFT = 59
+LEVEL_MASK = (1 << LEVEL_BITS) - 1
+SUBTREE_MASK = (1 << (LEAF_SHIFT - LEVEL_BITS)) - 1
+ADDRESS_BYTES = 8
+
+
+def pack(level, subtree, leaf):
+    return level | (subtree << LEVEL_BITS) | (leaf << LEAF_SHIFT)
+
+
+def level(a):
+    return a & LEVEL_MASK
+
+
+def subtree(a):
+    return (a >> LEVEL_BITS) & SUBTREE_MASK
+
+
+def leaf(a):
+    return a >> LEAF_SHIFT
+
+
+def with_level(a, level):
+    return (a & ~LEVEL_MASK) | level
+
+
+def with_leaf(a, leaf):
+    return (a & ((1 << LEAF_SHIFT) - 1)) | (leaf << LEAF_SHIFT)
+
+
+def parent(a, subh):
+    """Returns the address of the leaf that the subtree of a hangs below
+
+    subh -- height of the subtrees
+    """
+    s = subtree(a)
+    return pack(level(a) + 1, s >> subh, s & ((1 << subh) - 1))
+
+
+def to_bytes(a):
+    return int.to_bytes(a, length=ADDRESS_BYTES, byteorder='little')
+
+
+def leaf_addresses(a, subh):
+    """Returns the addresses of all leafs in the subtree of a as one buffer
+
+    The buffer holds 2^subh consecutive addresses of ADDRESS_BYTES each.
+    """
+    base = with_leaf(a, 0)
+    n = 1 << subh
+    return struct.pack('<%dQ' % n,
+                       *[base | (j << LEAF_SHIFT) for j in range(n)])
+
+
+def split(buf):
+    """Splits a buffer of addresses into the individual byte sequences"""
+    return [buf[j:j+ADDRESS_BYTES] for j in range(0, len(buf), ADDRESS_BYTES)]
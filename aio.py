@@ -0,0 +1,96 @@
+"""asyncio interface to SPHINCS
+
+Signing takes seconds, and even verification takes long enough to stall an
+event loop when many requests arrive at once. AsyncSPHINCS runs the
+operations in an executor instead, so that the loop keeps serving other
+tasks, and limits how many of them are in flight at the same time.
+"""
+import asyncio
+import weakref
+import functools
+
+from cancellation import Token, DeadlineExceeded
+
+
+class AsyncSPHINCS(object):
+
+    def __init__(self, sphincs, executor=None, limit=None):
+        """Wraps the SPHINCS instance sphincs for use from coroutines
+
+        executor -- concurrent.futures executor to run the operations in
+                    (the default executor of the loop if None); SPHINCS
+                    instances pickle, so a ProcessPoolExecutor can be used
+        limit -- maximal number of operations in the executor at a time
+                 (per event loop); further calls wait for a slot without
+                 occupying a worker
+        """
+        self.sphincs = sphincs
+        self.executor = executor
+        self.limit = limit
+        self.semaphores = weakref.WeakKeyDictionary()
+
+    def semaphore(self, loop):
+        """Returns the semaphore of the running loop, or None without limit
+
+        It is created on first use in the loop, as an asyncio.Semaphore
+        belongs to one loop (on Python 3.9, the one that is current when it
+        is created), and the instance may be created outside of it.
+        """
+        if self.limit is None:
+            return None
+        if loop not in self.semaphores:
+            self.semaphores[loop] = asyncio.Semaphore(self.limit)
+        return self.semaphores[loop]
+
+    async def run(self, fn, *args, timeout=None):
+        """Runs fn(*args) in the executor and returns its result
+
+        Raises asyncio.TimeoutError if it does not complete within timeout
+        seconds (including the time spent waiting for a slot). When the
+        call is cancelled or times out before a worker picked it up, it is
+        never started; an operation that is already running completes in
+        the background, but its result is discarded. Key generation and
+        signing, however, are aborted at their next checkpoint (see
+        cancellation).
+        """
+        loop = asyncio.get_running_loop()
+        call = functools.partial(fn, *args)
+        semaphore = self.semaphore(loop)
+
+        async def attempt():
+            if semaphore is None:
+                return await loop.run_in_executor(self.executor, call)
+            async with semaphore:
+                return await loop.run_in_executor(self.executor, call)
+        return await asyncio.wait_for(attempt(), timeout)
+
+    async def cancellable(self, fn, *args, timeout=None):
+        """Runs fn(*args, token=token), cancelling the token on timeout
+
+        With a process pool, the worker only sees the deadline of the token,
+        so cancellation without a timeout does not reach it.
+        """
+        token = Token(timeout)
+        try:
+            return await self.run(functools.partial(fn, token=token), *args,
+                                  timeout=timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            token.cancel()
+            raise
+        except DeadlineExceeded:
+            # the worker reached the deadline before wait_for noticed it
+            raise asyncio.TimeoutError()
+
+    async def async_keygen(self, timeout=None):
+        """Returns (SK, PK), as SPHINCS.keygen does"""
+        return await self.cancellable(self.sphincs.keygen, timeout=timeout)
+
+    async def async_sign(self, M, SK, timeout=None):
+        """Returns the signature on M, as SPHINCS.sign does"""
+        return await self.cancellable(self.sphincs.sign, M, SK,
+                                      timeout=timeout)
+
+    async def async_verify(self, M, sig, PK, timeout=None):
+        """Returns whether sig is valid on M, as SPHINCS.verify does"""
+        return await self.run(self.sphincs.verify, M, sig, PK,
+                              timeout=timeout)
@@ -0,0 +1,388 @@
+"""An append-only archive of signatures, indexed by message digest
+
+A signature is split into components: the head (index and R1), the HORST
+signature, and the WOTS+ signature and authentication path of every layer.
+The components are stored in the data file as they are; their lengths
+follow from their positions in the signature.
+
+The upper layers of the hyper-tree have few distinct subtrees (the top one
+has just one), so their components are shared by many signatures: a layer
+with at most 2^SHARED_BITS possible components is stored once per distinct
+component, and the SHA-256 digests and offsets of these shared components
+are listed in FILE.shared. The head, the HORST signature and the lower
+layers are as good as unique; they are neither hashed nor looked up, but
+simply appended.
+
+A signature is an entry in the index file (FILE.index), of fixed size:
+
+    digest of the message (32 bytes) | offset of each component (8 bytes)
+
+A writer buffers the entries, and appends them on flush (and close) as a
+run, sorted by digest, after a header that holds the number of entries in
+the run, the number of distinct messages in the archive, and the lengths of
+the data file and of FILE.shared that the run covers. Opening the archive
+only reads these headers; lookups bisect the runs, newest first, through
+mmap, so a later signature on a message replaces the earlier one. When there
+are more than MAX_RUNS runs, they are merged into one.
+
+The files are only ever appended to (apart from the merge, which writes a
+new index and renames it into place). A run is written after the components
+it refers to, so a torn write at the end is detected, and cut off, when the
+archive is next opened for writing; signatures that were added after the
+last flush are lost. A signature can be rebuilt, or streamed into a
+Verifier, without reading the rest of the archive.
+"""
+import os
+import mmap
+import heapq
+import struct
+import hashlib
+from bisect import bisect_left
+
+from SPHINCS import SPHINCS
+
+MAGIC = b'SPHA'
+VERSION = 3
+HEADER = struct.Struct('<4s8I')
+RUN = struct.Struct('<4s4Q')
+RUN_MAGIC = b'SPHR'
+SHARED = struct.Struct('<32sQ')
+DIGEST_BYTES = 32
+SHARED_BITS = 16
+MAX_RUNS = 8
+FLUSH_ENTRIES = 1 << 16
+
+
+def digest(M):
+    return hashlib.sha256(M).digest()
+
+
+def files(path):
+    """Returns the paths of the files of the archive at path"""
+    return [path, path + '.index', path + '.shared']
+
+
+class Keys(object):
+
+    def __init__(self, buffer, start, length, size):
+        """The message digests of a run of entries, as a sequence to bisect
+
+        start -- offset of the first entry of the run in buffer
+        length -- number of entries in the run
+        size -- size of an entry
+        """
+        self.buffer = buffer
+        self.start = start
+        self.length = length
+        self.size = size
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, i):
+        offset = self.start + i * self.size
+        return self.buffer[offset:offset + DIGEST_BYTES]
+
+
+class Archive(object):
+
+    def __init__(self, path, params=None, writable=False):
+        """Opens the archive at path (and path.index and path.shared)
+
+        params -- SPHINCS parameters of a new archive (defaults to
+                  SPHINCS-256); an existing archive records its own
+        writable -- whether signatures can be added; the archive is created
+                    if it does not exist
+        """
+        self.path = path
+        self.writable = writable
+        if writable and not os.path.exists(path):
+            sphincs = SPHINCS(**(params or {}))
+            with open(path, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, VERSION, sphincs.n, sphincs.m,
+                                    sphincs.h, sphincs.d, sphincs.w,
+                                    sphincs.tau, sphincs.k))
+            for other in files(path)[1:]:
+                open(other, 'wb').close()
+        mode = 'r+b' if writable else 'rb'
+        self.data = open(path, mode)
+        self.index = open(path + '.index', mode)
+        magic, version, *params = HEADER.unpack(self.data.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('%s is not a signature archive' % path)
+        self.shared = open(path + '.shared', mode) if writable else None
+        self.sphincs = SPHINCS(*params)
+        self.sizes = self.component_sizes()
+        self.entry = struct.Struct('<%ds%dQ' % (DIGEST_BYTES,
+                                                len(self.sizes)))
+        self.deduplicated = self.shared_components()
+        self.data_map = self.index_map = None
+        self.pending = {}
+        self.blobs = None
+        self.load_runs()
+        if os.fstat(self.data.fileno()).st_size < self.data_end:
+            raise ValueError('the data of %s is truncated' % path)
+        if writable:
+            self.recover()
+
+    def component_sizes(self):
+        """Returns the sizes of the components of a packed signature"""
+        s = self.sphincs
+        n = s.n // 8
+        horst = s.k * (1 + s.tau - s.horst.x) + (1 << s.horst.x)
+        layer = s.wots.l + s.h // s.d
+        return [(s.h + 7) // 8 + n, horst * n] + [layer * n] * s.d
+
+    def shared_components(self):
+        """Returns the positions of the components that are deduplicated
+
+        Layer j holds one of at most 2^(h - j*h/d) distinct components.
+        """
+        s = self.sphincs
+        subh = s.h // s.d
+        return {2 + j for j in range(s.d) if s.h - subh * j <= SHARED_BITS}
+
+    def load_runs(self):
+        """Reads the run headers, up to the first torn run"""
+        size = os.fstat(self.index.fileno()).st_size
+        self.runs = []  # pairs of the offset of the first entry and length
+        self.count, self.data_end, self.shared_end = 0, HEADER.size, 0
+        offset = 0
+        while offset + RUN.size <= size:
+            self.index.seek(offset)
+            magic, length, count, data_end, shared_end = \
+                RUN.unpack(self.index.read(RUN.size))
+            end = offset + RUN.size + length * self.entry.size
+            if magic != RUN_MAGIC or end > size:
+                break
+            self.runs.append((offset + RUN.size, length))
+            self.count, self.data_end, self.shared_end = \
+                count, data_end, shared_end
+            offset = end
+        self.index_end = offset
+
+    def recover(self):
+        """Cuts off torn writes and loads the shared components' digests"""
+        self.index.truncate(self.index_end)
+        self.data.truncate(self.data_end)
+        self.shared.truncate(self.shared_end)
+        self.shared.seek(0)
+        self.blobs = dict(SHARED.iter_unpack(self.shared.read()))
+
+    def remap(self):
+        # earlier maps are closed once the last view of them is released
+        self.data.flush()
+        self.data_map = mmap.mmap(self.data.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        self.index_map = None
+        if self.index_end:
+            self.index_map = mmap.mmap(self.index.fileno(), 0,
+                                       access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, M):
+        return self.lookup(digest(M)) is not None
+
+    def lookup(self, key):
+        """Returns the offsets of the components of key, or None"""
+        if key in self.pending:
+            return self.pending[key]
+        if self.runs and self.index_map is None:
+            self.remap()
+        for start, length in reversed(self.runs):
+            keys = Keys(self.index_map, start, length, self.entry.size)
+            i = bisect_left(keys, key)
+            if i < length and keys[i] == key:
+                offset = start + i * self.entry.size
+                return self.entry.unpack_from(self.index_map, offset)[1:]
+        return None
+
+    def add(self, M, sig):
+        """Adds the packed signature sig on M
+
+        A later signature on the same message replaces the earlier one.
+        Returns the number of bytes the archive grew by.
+        """
+        return self.add_digest(digest(M), sig)
+
+    def add_digest(self, key, sig):
+        """Adds sig as the signature on the message with digest key"""
+        if not self.writable:
+            raise ValueError('archive is read-only')
+        if len(sig) != sum(self.sizes):
+            raise ValueError('signature has the wrong length')
+        self.data.seek(0, os.SEEK_END)
+        start = self.data.tell()
+        offsets = []
+        i = 0
+        for position, size in enumerate(self.sizes):
+            component = sig[i:i + size]
+            i += size
+            if position not in self.deduplicated:
+                offsets.append(self.data.tell())
+                self.data.write(component)
+                continue
+            blob = digest(component)
+            offset = self.blobs.get(blob)
+            if offset is None:
+                offset = self.data.tell()
+                self.data.write(component)
+                self.blobs[blob] = offset
+                self.shared.write(SHARED.pack(blob, offset))
+            offsets.append(offset)
+        if self.lookup(key) is None:
+            self.count += 1
+        self.pending[key] = offsets
+        self.data_map = None
+        grown = self.data.tell() - start + self.entry.size
+        if len(self.pending) >= FLUSH_ENTRIES:
+            self.flush()
+        return grown
+
+    def flush(self):
+        """Writes the signatures added since the last flush as a run"""
+        if not self.pending:
+            return
+        self.data.flush()
+        self.shared.flush()
+        data_end = os.fstat(self.data.fileno()).st_size
+        shared_end = os.fstat(self.shared.fileno()).st_size
+        self.index.seek(self.index_end)
+        self.index.write(RUN.pack(RUN_MAGIC, len(self.pending), self.count,
+                                  data_end, shared_end))
+        for key in sorted(self.pending):
+            self.index.write(self.entry.pack(key, *self.pending[key]))
+        self.index.flush()
+        self.runs.append((self.index_end + RUN.size, len(self.pending)))
+        self.index_end = self.index.tell()
+        self.data_end, self.shared_end = data_end, shared_end
+        self.pending = {}
+        self.index_map = None
+        if len(self.runs) > MAX_RUNS:
+            self.merge()
+
+    def run_keys(self, run, age):
+        """Yields (key, age, offset) for the entries of a run"""
+        start, length = run
+        for i in range(length):
+            offset = start + i * self.entry.size
+            yield self.index_map[offset:offset + DIGEST_BYTES], age, offset
+
+    def merge(self):
+        """Rewrites the index as a single run, keeping the newest entries"""
+        if self.index_map is None:
+            self.remap()
+        ages = range(len(self.runs) - 1, -1, -1)  # the newest run is 0
+        merged = heapq.merge(*map(self.run_keys, self.runs, ages))
+        path = self.path + '.index'
+        with open(path + '.tmp', 'wb') as f:
+            f.write(RUN.pack(RUN_MAGIC, self.count, self.count,
+                             self.data_end, self.shared_end))
+            previous = None
+            for key, _, offset in merged:
+                if key != previous:
+                    f.write(self.index_map[offset:offset + self.entry.size])
+                previous = key
+        os.replace(path + '.tmp', path)
+        self.index.close()
+        self.index = open(path, 'r+b')
+        self.runs = [(RUN.size, self.count)]
+        self.index_end = RUN.size + self.count * self.entry.size
+        self.index_map = None
+
+    def components(self, key):
+        """Returns memoryviews of the components of the signature, or None
+
+        key -- digest of the message
+        """
+        offsets = self.lookup(key)
+        if offsets is None:
+            return None
+        if self.data_map is None:
+            self.remap()
+        # a reader only trusts the data that the runs cover
+        end = len(self.data_map) if self.writable else self.data_end
+        view = memoryview(self.data_map)
+        parts = []
+        for offset, size in zip(offsets, self.sizes):
+            if not HEADER.size <= offset <= end - size:
+                raise ValueError('entry points beyond the archive data')
+            parts.append(view[offset:offset + size])
+        return parts
+
+    def get(self, M):
+        """Returns the packed signature on M, or None"""
+        parts = self.components(digest(M))
+        return None if parts is None else b''.join(parts)
+
+    def digests(self):
+        """Yields the message digests, in increasing order, once each"""
+        if self.runs and self.index_map is None:
+            self.remap()
+        pending = ((key, len(self.runs), None) for key in sorted(self.pending))
+        merged = heapq.merge(*map(self.run_keys, self.runs,
+                                  range(len(self.runs))), pending)
+        previous = None
+        for key, _, _ in merged:
+            if key != previous:
+                yield key
+            previous = key
+
+    def verify(self, M, PK):
+        """Returns whether the archive holds a valid signature on M
+
+        The components are streamed from the archive into a Verifier.
+        """
+        parts = self.components(digest(M))
+        if parts is None:
+            return False
+        verifier = self.sphincs.verifier(M, PK)
+        for part in parts:
+            if not verifier.update(part):
+                break
+        return verifier.finalize()
+
+    def verify_all(self, PK, message):
+        """Verifies the signature on every message, in digest order
+
+        Yields the message digest and 'valid', 'invalid' or 'missing' (if
+        message returns None for it).
+        message -- function from a message digest to the message
+        """
+        for key in self.digests():
+            M = message(key)
+            if M is None:
+                yield key, 'missing'
+            elif self.verify(M, PK):
+                yield key, 'valid'
+            else:
+                yield key, 'invalid'
+
+    def stats(self):
+        """Returns the number of signatures and the stored and raw sizes"""
+        shared = self.shared_end
+        if self.writable:
+            self.data.flush()
+            self.shared.flush()
+            shared = os.fstat(self.shared.fileno()).st_size
+        return {'signatures': self.count,
+                'stored_bytes': (os.fstat(self.data.fileno()).st_size +
+                                 self.index_end + shared +
+                                 len(self.pending) * self.entry.size),
+                'raw_bytes': self.count * sum(self.sizes)}
+
+    def close(self):
+        if self.writable:
+            self.flush()
+            self.shared.close()
+        self.data_map = self.index_map = None
+        self.data.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
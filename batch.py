@@ -0,0 +1,203 @@
+"""Signing and verifying many files with one loaded key
+
+The files are listed in a manifest (one path per line, relative to the
+manifest; blank lines and lines starting with '#' are skipped) or are the
+files in a directory, recursively, except for those that batches read or
+write themselves: signatures, temporary files, files named MANIFEST and the
+files of archives. They are handed to a pool of worker processes that load
+the key once (see service.init_worker) and read the files themselves, so
+only paths and results are passed between processes. Signatures are written
+next to the inputs, as FILE.sig, into the same relative place below an
+output directory, or into an archive (see archive.py), which the workers
+read through mmap when verifying.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import service
+from SPHINCS import SPHINCS
+from cache import LeafCache
+from archive import Archive, digest, files as archive_files
+
+SUFFIX = '.sig'
+MANIFEST = 'MANIFEST'
+
+
+def collect(manifest=None, directory=None):
+    """Returns the root of the paths, and the paths, of the batch"""
+    if manifest is not None:
+        root = os.path.dirname(os.path.abspath(manifest))
+        with open(manifest) as f:
+            names = [line.strip() for line in f]
+        names = [n for n in names if n and not n.startswith('#')]
+        return root, [os.path.join(root, n) for n in names]
+    root = os.path.abspath(directory)
+    paths = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        skip = generated(filenames)
+        paths += [os.path.join(dirpath, f) for f in sorted(filenames)
+                  if f not in skip]
+    return root, paths
+
+
+def generated(names):
+    """Returns those of the names of the files in a directory that are not
+    part of a batch but belong to one: signatures, temporary files,
+    manifests and the files of archives"""
+    present = set(names)
+    skip = set(n for n in names
+               if n.endswith((SUFFIX, '.tmp')) or n == MANIFEST)
+    for name in names:
+        if present.issuperset(archive_files(name)):
+            skip.update(archive_files(name))
+    return skip
+
+
+def signature_path(path, root, out=None):
+    if out is None:
+        return path + SUFFIX
+    return os.path.join(out, os.path.relpath(path, root)) + SUFFIX
+
+
+# state of the worker processes when using an archive, set by init_worker
+
+_worker = {}
+
+
+def init_worker(params, sk, pk, cache=None, archive=None):
+    """Loads the keys, and opens the archive (read-only) if given"""
+    service.init_worker(params, sk, pk, cache)
+    if archive is not None:
+        _worker['archive'] = archive = Archive(archive)
+        _worker['pk'] = archive.sphincs.unpack(pk=pk) if pk else None
+
+
+def sign_file(path, sig_path):
+    """Signs the file at path into sig_path; returns (status, size)"""
+    with open(path, 'rb') as f:
+        M = f.read()
+    sig = service.sign_task(M)
+    os.makedirs(os.path.dirname(sig_path) or '.', exist_ok=True)
+    tmp = '%s.%d.tmp' % (sig_path, os.getpid())
+    with open(tmp, 'wb') as f:
+        f.write(sig)
+    os.replace(tmp, sig_path)
+    return 'signed', len(M)
+
+
+def verify_file(path, sig_path):
+    """Verifies the file at path against sig_path; returns (status, size)"""
+    with open(path, 'rb') as f:
+        M = f.read()
+    if not os.path.exists(sig_path):
+        return 'missing', len(M)
+    with open(sig_path, 'rb') as f:
+        sig = f.read()
+    return ('valid' if service.verify_task(M, sig) else 'invalid'), len(M)
+
+
+def sign_archived(path, _):
+    """Signs the file at path; returns the status, size, digest and sig"""
+    with open(path, 'rb') as f:
+        M = f.read()
+    return 'signed', len(M), digest(M), service.sign_task(M)
+
+
+def verify_archived(path, _):
+    """Verifies the file at path against the archive of the worker"""
+    with open(path, 'rb') as f:
+        M = f.read()
+    archive = _worker['archive']
+    if M not in archive:
+        return 'missing', len(M)
+    return ('valid' if archive.verify(M, _worker['pk']) else 'invalid'), \
+        len(M)
+
+
+def timed(task, path, sig_path):
+    """Runs task, returning its status, size and duration (and any extra
+    results)"""
+    start = time.perf_counter()
+    try:
+        status, size, *extra = task(path, sig_path)
+    except Exception as e:
+        # one file that fails must not abort the batch
+        status, size, extra = 'error: %s: %s' % (type(e).__name__, e), 0, []
+    return (status, size, time.perf_counter() - start) + tuple(extra)
+
+
+def run(op, paths, root, key, params=None, out=None, workers=None,
+        cache_levels=0, archive=None, log=None):
+    """Signs or verifies (op) the files at paths, returning a report
+
+    key -- the packed secret key (to sign) or public key (to verify)
+    out -- directory to put the signatures in, rather than next to the files
+    archive -- path of an archive to put the signatures in (or take them
+               from), rather than separate files
+    cache_levels -- number of hyper-tree levels whose leaves the workers
+                    share (see cache.LeafCache); only used when signing
+    log -- file to write a line per file to, as it completes
+    """
+    params = params or {}
+    sk, pk = (key, None) if op == 'sign' else (None, key)
+    cache = None
+    if op == 'sign' and cache_levels:
+        sphincs = SPHINCS(**params)
+        SK1, _, Q = sphincs.unpack(sk=sk)
+        cache = LeafCache.build(sphincs, SK1, Q, cache_levels, shared=True)
+        sk = service.without_masks(sphincs, sk)
+    if archive is None:
+        task = sign_file if op == 'sign' else verify_file
+        initargs = (params, sk, pk, cache)
+    elif op == 'sign':
+        task, initargs = sign_archived, (params, sk, pk, cache)
+        writer = Archive(archive, params, writable=True)
+    else:
+        task, initargs = verify_archived, (params, sk, pk, cache, archive)
+    results = {}
+    start = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(workers, initializer=init_worker,
+                                 initargs=initargs) as executor:
+            futures = {executor.submit(timed, task, path,
+                                       signature_path(path, root, out)): path
+                       for path in paths}
+            for future in as_completed(futures):
+                path = futures[future]
+                results[path] = future.result()[:3]
+                if task is sign_archived and len(future.result()) == 5:
+                    writer.add_digest(*future.result()[3:])
+                if log is not None:
+                    status, size, seconds = results[path]
+                    print('%-8s %8.3f s  %s' % (status, seconds,
+                                                os.path.relpath(path, root)),
+                          file=log)
+    finally:
+        if cache is not None:
+            cache.close()
+            cache.unlink()
+        if archive is not None and op == 'sign':
+            writer.close()
+    seconds = time.perf_counter() - start
+    total = sum(size for _, size, _ in results.values())
+    ok = 'signed' if op == 'sign' else 'valid'
+    return {'files': [{'path': path, 'status': results[path][0],
+                       'bytes': results[path][1],
+                       'seconds': results[path][2]} for path in paths],
+            'ok': sum(1 for s, _, _ in results.values() if s == ok),
+            'failed': sum(1 for s, _, _ in results.values() if s != ok),
+            'bytes': total,
+            'seconds': seconds,
+            'files_per_sec': len(paths) / seconds if seconds > 0 else 0.0,
+            'bytes_per_sec': total / seconds if seconds > 0 else 0.0}
+
+
+def summary(report, op, log):
+    print('%s %d files (%d bytes) in %.2f s: %.2f files/s, %.1f KiB/s; '
+          '%d ok, %d failed' %
+          ('Signed' if op == 'sign' else 'Verified', len(report['files']),
+           report['bytes'], report['seconds'], report['files_per_sec'],
+           report['bytes_per_sec'] / 1024, report['ok'], report['failed']),
+          file=log)
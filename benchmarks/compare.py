@@ -0,0 +1,194 @@
+"""Stores benchmark baselines and flags significant regressions against them
+
+Usage:
+    compare.py save NAME RESULT...
+    compare.py check NAME RESULT... [--threshold PCT] [--confidence LEVEL]
+    compare.py (-h|--help)
+
+Options:
+    --threshold PCT     Smallest slowdown that is reported [default: 5].
+    --confidence LEVEL  Confidence level of the intervals [default: 0.95].
+    -h --help           Show this help screen.
+
+RESULT files are the JSON output of benchmarks.micro or benchmarks.scaling;
+give several files of repeated runs to reduce the noise. Every operation or
+phase needs at least two samples, on both sides, for its confidence
+interval: 'save' refuses results with fewer, and 'check' reports such
+entries as 'too few samples' instead of comparing them (a scaling report
+holds one sample per operation, so pass at least two runs). Baselines are
+stored as benchmarks/baselines/NAME.json; use a name per machine, as timings
+are only comparable on the same machine. 'check' exits with status 1 if any
+operation or phase is significantly slower than in the baseline.
+Run from the project root as 'python -m benchmarks.compare'.
+"""
+
+import os
+import sys
+import json
+import time
+import statistics
+import subprocess
+import docopt
+
+BASELINE_VERSION = 1
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'baselines')
+MIN_SAMPLES = 2  # the variance, and hence the interval, needs two samples
+
+
+def timings(report):
+    """Returns the timings (in seconds) in a benchmark report, by name
+
+    For microbenchmarks these are the samples per operation, for the scaling
+    benchmark the wall time per operation and the mean time of every phase.
+    """
+    results = report['results']
+    if isinstance(results, dict):
+        return {name: list(stats['samples'])
+                for name, stats in results.items()}
+    t = {}
+    for r in results:
+        name = 'scaling/%s/%s/%d' % (r['mode'], r['op'], r['workers'])
+        t[name] = [r['wall'] / r['ops']]
+        for phase, stats in r['phases'].items():
+            t['%s/%s' % (name, phase)] = [stats['mean']]
+    return t
+
+
+def pooled(reports):
+    """Merges the timings of repeated runs"""
+    t = {}
+    for report in reports:
+        for name, samples in timings(report).items():
+            t.setdefault(name, []).extend(samples)
+    return t
+
+
+def too_few(t):
+    """Returns the names in pooled timings t with fewer than MIN_SAMPLES"""
+    return sorted(name for name, samples in t.items()
+                  if len(samples) < MIN_SAMPLES)
+
+
+def t_quantile(p, df):
+    """Approximates the p-quantile of Student's t-distribution
+
+    Uses the Cornish-Fisher expansion around the normal distribution, which
+    is accurate to a few percent for df >= 2 (and conservative below that).
+    """
+    z = statistics.NormalDist().inv_cdf(p)
+    return (z + (z**3 + z) / (4 * df) +
+            (5*z**5 + 16*z**3 + 3*z) / (96 * df**2) +
+            (3*z**7 + 19*z**5 + 17*z**3 - 15*z) / (384 * df**3))
+
+
+def difference(base, current, confidence=0.95):
+    """Returns the difference of the means with its confidence interval
+
+    Uses Welch's approximation, as the variances need not be equal. With a
+    single sample on either side, the variance is unknown and the interval
+    is unbounded.
+    """
+    diff = statistics.mean(current) - statistics.mean(base)
+    if len(base) < 2 or len(current) < 2:
+        return diff, float('-inf'), float('inf')
+    vb = statistics.variance(base) / len(base)
+    vc = statistics.variance(current) / len(current)
+    se = (vb + vc) ** 0.5
+    if se == 0:
+        return diff, diff, diff
+    df = (vb + vc) ** 2 / (vb ** 2 / (len(base) - 1) +
+                           vc ** 2 / (len(current) - 1))
+    margin = t_quantile(1 - (1 - confidence) / 2, max(df, 1)) * se
+    return diff, diff - margin, diff + margin
+
+
+def compare(base, current, threshold=5, confidence=0.95):
+    """Compares pooled timings, returning a row per common name
+
+    A row is flagged 'slower' if the whole confidence interval of the
+    difference lies above zero and the slowdown is at least threshold
+    percent, and 'faster' for the converse. Rows with fewer than MIN_SAMPLES
+    samples on either side are flagged 'too few samples'.
+    """
+    rows = []
+    for name in sorted(set(base) & set(current)):
+        mean = statistics.mean(base[name])
+        diff, low, high = difference(base[name], current[name], confidence)
+        change = 100 * diff / mean if mean else 0.0
+        flag = ''
+        if min(len(base[name]), len(current[name])) < MIN_SAMPLES:
+            flag = 'too few samples'
+        elif low > 0 and change >= threshold:
+            flag = 'slower'
+        elif high < 0 and -change >= threshold:
+            flag = 'faster'
+        rows.append({'name': name,
+                     'base': mean,
+                     'current': mean + diff,
+                     'change': change,
+                     'low': 100 * low / mean if mean else 0.0,
+                     'high': 100 * high / mean if mean else 0.0,
+                     'flag': flag})
+    return rows
+
+
+def report(rows, f):
+    for r in rows:
+        print('%-48s %11.6fs %11.6fs %+7.1f%% [%+.1f%%, %+.1f%%] %s' %
+              (r['name'], r['base'], r['current'], r['change'],
+               r['low'], r['high'], r['flag']), file=f)
+    slower = sum(r['flag'] == 'slower' for r in rows)
+    faster = sum(r['flag'] == 'faster' for r in rows)
+    few = sum(r['flag'] == 'too few samples' for r in rows)
+    print('%d compared, %d slower, %d faster, %d with too few samples' %
+          (len(rows), slower, faster, few), file=f)
+
+
+def commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                       stderr=subprocess.DEVNULL,
+                                       universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save(path, reports):
+    baseline = {'version': BASELINE_VERSION,
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'commit': commit(),
+                'runs': reports}
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=1)
+
+
+def load(path):
+    with open(path) as f:
+        baseline = json.load(f)
+    assert baseline['version'] == BASELINE_VERSION, 'unknown baseline version'
+    return baseline['runs']
+
+
+if __name__ == "__main__":
+    args = docopt.docopt(__doc__)
+    reports = []
+    for name in args['RESULT']:
+        with open(name) as f:
+            reports.append(json.load(f))
+    path = os.path.join(BASELINES, args['NAME'] + '.json')
+    if args['save']:
+        few = too_few(pooled(reports))
+        if few:
+            sys.exit('Fewer than %d samples for: %s' %
+                     (MIN_SAMPLES, ', '.join(few)))
+        os.makedirs(BASELINES, exist_ok=True)
+        save(path, reports)
+        print('Wrote baseline %s' % path, file=sys.stderr)
+    elif args['check']:
+        rows = compare(pooled(load(path)), pooled(reports),
+                       threshold=float(args['--threshold']),
+                       confidence=float(args['--confidence']))
+        report(rows, sys.stdout)
+        if any(r['flag'] == 'slower' for r in rows):
+            sys.exit(1)
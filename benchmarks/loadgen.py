@@ -0,0 +1,183 @@
+"""Open-loop load generation and trace replay for sign/verify workloads
+
+Usage:
+    loadgen.py synth [--rate R] [--duration SEC] [--verify-ratio P] [--sizes LIST] [--keys N] [--seed N] [--out FILE]
+    loadgen.py replay TRACE [--params NAME] [--workers N] [--target KIND] [--json FILE]
+    loadgen.py (-h|--help)
+
+Options:
+    --rate R            Mean arrival rate (requests per second) [default: 2].
+    --duration SEC      Length of the synthetic trace [default: 10].
+    --verify-ratio P    Fraction of requests that are verifies [default: 0.9].
+    --sizes LIST        Comma-separated message sizes [default: 32,1024,65536].
+    --keys N            Number of distinct keys [default: 1].
+    --seed N            Seed for the synthetic trace [default: 0].
+    --out FILE          Write the trace to FILE instead of stdout.
+    --params NAME       Parameter set: sphincs256 or small [default: small].
+    --workers N         Number of workers of the service [default: 1].
+    --target KIND       Service stand-in: processes or threads [default: processes].
+    --json FILE         Write the results as JSON to FILE ('-' for stdout).
+    -h --help           Show this help screen.
+
+A trace has one JSON object per line, with the arrival time 't' (seconds
+since the start), 'op' (sign or verify), message 'size' and 'key' (a name).
+Requests are submitted at their arrival time, regardless of whether earlier
+requests have completed, so that queueing shows up in the latencies.
+Run from the project root as 'python -m benchmarks.loadgen'.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import platform
+import docopt
+
+from benchmarks.micro import FORMAT_VERSION
+from benchmarks.scaling import instance, EXECUTORS
+
+
+def synthetic(rate, duration, verify_ratio=0.9, sizes=(32,), keys=1, seed=0):
+    """Returns a trace with Poisson arrivals at the given mean rate"""
+    rng = random.Random(seed)
+    trace = []
+    t = rng.expovariate(rate)
+    while t < duration:
+        trace.append({'t': t,
+                      'op': 'verify' if rng.random() < verify_ratio else 'sign',
+                      'size': rng.choice(sizes),
+                      'key': 'key%d' % rng.randrange(keys)})
+        t += rng.expovariate(rate)
+    return trace
+
+
+def load(f):
+    return [json.loads(line) for line in f if line.strip()]
+
+
+def save(trace, f):
+    for request in trace:
+        f.write(json.dumps(request, sort_keys=True) + '\n')
+
+
+def handle(params, op, M, key, sig):
+    """Serves one request; returns when it started and ended being served
+
+    Times are taken from time.monotonic, which is shared between processes.
+    """
+    start = time.monotonic()
+    sphincs = instance(params)
+    if op == 'sign':
+        sphincs.sign(M, key)
+    else:
+        assert sphincs.verify(M, sig, key)
+    return start, time.monotonic()
+
+
+def percentiles(values):
+    values = sorted(values)
+    if not values:
+        return {}
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+    return {'mean': sum(values) / len(values),
+            'p50': pick(0.5), 'p95': pick(0.95), 'p99': pick(0.99),
+            'max': values[-1]}
+
+
+def fixtures(params, trace):
+    """Generates the keys, messages and signatures that the trace refers to"""
+    sphincs = instance(params)
+    keys, messages = {}, {}
+    for request in trace:
+        name, size = request['key'], request['size']
+        if name not in keys:
+            keys[name] = sphincs.keygen()
+        if (name, size) not in messages:
+            M = os.urandom(size)
+            messages[name, size] = M, sphincs.sign(M, keys[name][0])
+    return keys, messages
+
+
+def replay(trace, params='small', workers=1, target='processes', log=None):
+    """Replays the trace open-loop and returns the results as a dict"""
+    keys, messages = fixtures(params, trace)
+    arrivals, futures = [], []
+    with EXECUTORS[target](workers) as executor:
+        list(executor.map(instance, [params] * workers))
+        origin = time.monotonic()
+        for request in sorted(trace, key=lambda r: r['t']):
+            delay = origin + request['t'] - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            sk, pk = keys[request['key']]
+            M, sig = messages[request['key'], request['size']]
+            key = sk if request['op'] == 'sign' else pk
+            arrivals.append(origin + request['t'])
+            futures.append(executor.submit(handle, params, request['op'],
+                                           M, key, sig))
+        results = [f.result() for f in futures]
+    requests = sorted(trace, key=lambda r: r['t'])
+    report = {'version': FORMAT_VERSION,
+              'params': params,
+              'python': platform.python_version(),
+              'machine': platform.node(),
+              'workers': workers,
+              'target': target,
+              'requests': len(trace),
+              'ops': {}}
+    if not results:
+        return report
+    end = max(e for _, e in results)
+    report['offered_rate'] = len(trace) / max(r['t'] for r in trace) \
+        if len(trace) > 1 else 0.0
+    report['throughput'] = len(results) / (end - arrivals[0])
+    for op in ['sign', 'verify']:
+        picked = [(a, s, e) for r, a, (s, e) in
+                  zip(requests, arrivals, results) if r['op'] == op]
+        if not picked:
+            continue
+        report['ops'][op] = {
+            'count': len(picked),
+            'queueing': percentiles([s - a for a, s, e in picked]),
+            'service': percentiles([e - s for a, s, e in picked]),
+            'latency': percentiles([e - a for a, s, e in picked])}
+        if log is not None:
+            lat, queue = report['ops'][op]['latency'], \
+                report['ops'][op]['queueing']
+            print('%-7s %5d requests  latency p50 %.3fs p99 %.3fs  '
+                  'queueing p50 %.3fs p99 %.3fs' %
+                  (op, len(picked), lat['p50'], lat['p99'],
+                   queue['p50'], queue['p99']), file=log)
+    if log is not None:
+        print('throughput %.2f requests/s (offered %.2f requests/s)' %
+              (report['throughput'], report['offered_rate']), file=log)
+    return report
+
+
+if __name__ == "__main__":
+    args = docopt.docopt(__doc__)
+    if args['synth']:
+        trace = synthetic(rate=float(args['--rate']),
+                          duration=float(args['--duration']),
+                          verify_ratio=float(args['--verify-ratio']),
+                          sizes=[int(s) for s in args['--sizes'].split(',')],
+                          keys=int(args['--keys']),
+                          seed=int(args['--seed']))
+        if args['--out'] is None:
+            save(trace, sys.stdout)
+        else:
+            with open(args['--out'], 'w') as f:
+                save(trace, f)
+    elif args['replay']:
+        assert args['--target'] in EXECUTORS, 'unknown target'
+        with open(args['TRACE']) as f:
+            trace = load(f)
+        report = replay(trace, params=args['--params'],
+                        workers=int(args['--workers']),
+                        target=args['--target'], log=sys.stderr)
+        if args['--json'] == '-':
+            json.dump(report, sys.stdout, indent=1)
+        elif args['--json'] is not None:
+            with open(args['--json'], 'w') as f:
+                json.dump(report, f, indent=1)
@@ -0,0 +1,155 @@
+"""Peak memory and allocations per phase of keygen, sign and verify
+
+Usage:
+    memory.py [--params NAME] [--top N] [--json FILE]
+    memory.py (-h|--help)
+
+Options:
+    --params NAME       Parameter set: sphincs256 or small [default: small].
+    --top N             Number of allocation sites per phase [default: 5].
+    --json FILE         Write the results as JSON to FILE ('-' for stdout).
+    -h --help           Show this help screen.
+
+Run from the project root as 'python -m benchmarks.memory'.
+"""
+
+import os
+import sys
+import json
+import platform
+import tracemalloc
+import docopt
+
+from SPHINCS import SPHINCS
+from instrument import label
+from benchmarks.micro import PARAMS, FORMAT_VERSION
+
+
+class Entry(object):
+
+    def __init__(self, start, snapshot):
+        self.start = start
+        self.peak = start
+        self.snapshot = snapshot
+
+
+class MemoryProfiler(object):
+
+    def __init__(self, top=0, skip=('seed',)):
+        """Records the traced memory of every phase, using tracemalloc
+
+        For each phase label it reports the peak traced memory relative to
+        the start of the phase (including nested phases) and the net traced
+        memory at its end. If top is non-zero, it instead takes snapshots to
+        report the net number of allocated blocks and the top allocation
+        sites; as the snapshots themselves are traced, they distort the
+        peaks, so take those in a separate run. Append it to
+        SPHINCS.observers, and start tracemalloc before entering any phase.
+        top -- number of allocation sites to keep per phase
+        skip -- names of phases that are too frequent to track
+        """
+        self.top = top
+        self.skip = skip
+        self.stack = []
+        self.phases = {}
+        self.filters = [tracemalloc.Filter(False, tracemalloc.__file__),
+                        tracemalloc.Filter(False, __file__)]
+
+    def enter(self, name, attrs):
+        if name in self.skip:
+            return
+        snapshot = tracemalloc.take_snapshot() if self.top else None
+        current, peak = tracemalloc.get_traced_memory()
+        if self.stack:
+            self.stack[-1].peak = max(self.stack[-1].peak, peak)
+        tracemalloc.reset_peak()
+        self.stack.append(Entry(current, snapshot))
+
+    def exit(self, name, attrs, exc=None):
+        if name in self.skip:
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        entry = self.stack.pop()
+        entry.peak = max(entry.peak, peak)
+        if self.stack:
+            self.stack[-1].peak = max(self.stack[-1].peak, entry.peak)
+        stats = {'count': 1,
+                 'peak': entry.peak - entry.start,
+                 'net': current - entry.start}
+        if entry.snapshot is not None:
+            snapshot = tracemalloc.take_snapshot().filter_traces(self.filters)
+            old = entry.snapshot.filter_traces(self.filters)
+            diff = snapshot.compare_to(old, 'lineno')
+            stats = {'count': 1,
+                     'blocks': sum(d.count_diff for d in diff),
+                     'sites': [{'site': str(d.traceback[0]),
+                                'size': d.size_diff,
+                                'blocks': d.count_diff}
+                               for d in diff[:self.top]]}
+        self.record(label(name, attrs), stats)
+
+    def record(self, key, stats):
+        """Aggregates repeated phases, keeping the worst case"""
+        if key not in self.phases:
+            self.phases[key] = stats
+            return
+        old = self.phases[key]
+        stats['count'] += old['count']
+        if 'blocks' in stats:
+            stats['blocks'] = max(stats['blocks'], old['blocks'])
+        if old.get('peak', 0) > stats.get('peak', 0):
+            stats['peak'], stats['net'] = old['peak'], old['net']
+        self.phases[key] = stats
+
+
+def profile(sphincs, profiler):
+    M = os.urandom(256)
+    sphincs.observers.append(profiler)
+    started = tracemalloc.is_tracing()
+    if not started:
+        tracemalloc.start()
+    try:
+        sk, pk = sphincs.keygen()
+        sig = sphincs.sign(M, sk)
+        assert sphincs.verify(M, sig, pk)
+    finally:
+        if not started:
+            tracemalloc.stop()
+        sphincs.observers.remove(profiler)
+    return profiler.phases
+
+
+def run(params='small', top=5, log=None):
+    """Profiles keygen, sign and verify, returning the results as a dict
+
+    The peaks are measured in a first run; if top is non-zero, a second run
+    collects the allocation sites.
+    """
+    sphincs = SPHINCS(**PARAMS[params])
+    phases = profile(sphincs, MemoryProfiler())
+    if top:
+        for key, stats in profile(sphincs, MemoryProfiler(top)).items():
+            phases[key].update(blocks=stats['blocks'], sites=stats['sites'])
+    if log is not None:
+        for key, stats in phases.items():
+            print('%-24s %12d bytes peak %12d bytes net' %
+                  (key, stats['peak'], stats['net']), file=log)
+            for site in stats.get('sites', []):
+                print('    %-56s %+12d bytes %+8d blocks' %
+                      (site['site'], site['size'], site['blocks']), file=log)
+    return {'version': FORMAT_VERSION,
+            'params': params,
+            'python': platform.python_version(),
+            'machine': platform.node(),
+            'phases': phases}
+
+
+if __name__ == "__main__":
+    args = docopt.docopt(__doc__)
+    report = run(params=args['--params'], top=int(args['--top']),
+                 log=sys.stderr)
+    if args['--json'] == '-':
+        json.dump(report, sys.stdout, indent=1)
+    elif args['--json'] is not None:
+        with open(args['--json'], 'w') as f:
+            json.dump(report, f, indent=1)
@@ -0,0 +1,118 @@
+"""Microbenchmarks for the SPHINCS primitives and operations
+
+Usage:
+    micro.py [--params NAME] [--repeat N] [--warmup N] [--min-time SEC] [--filter TEXT] [--json FILE]
+    micro.py (-h|--help)
+
+Options:
+    --params NAME       Parameter set: sphincs256 or small [default: small].
+    --repeat N          Number of timed samples per benchmark [default: 5].
+    --warmup N          Number of untimed calls per benchmark [default: 1].
+    --min-time SEC      Minimal duration of a sample [default: 0.1].
+    --filter TEXT       Only run benchmarks whose name contains TEXT.
+    --json FILE         Write the results as JSON to FILE ('-' for stdout).
+    -h --help           Show this help screen.
+
+Run from the project root as 'python -m benchmarks.micro'.
+"""
+
+import os
+import sys
+import json
+import platform
+import docopt
+
+from SPHINCS import SPHINCS
+from ChaCha import ChaCha
+from blake import BLAKE
+from trees import hash_tree, treehash, root
+from bytes_utils import xor
+from benchmarks.timing import measure
+
+PARAMS = {'sphincs256': {},
+          'small': dict(n=256, m=512, h=4, d=2, w=16, tau=8, k=64)}
+
+FORMAT_VERSION = 1
+
+
+def benchmarks(sphincs):
+    """Yields pairs of benchmark names and callables without arguments"""
+    n = sphincs.n // 8
+    block = os.urandom(64)
+    yield 'chacha.permuted', lambda: ChaCha().permuted(block)
+    for N in [64, sphincs.wots.l * n, sphincs.t * n]:
+        yield 'chacha.keystream/%d' % N, lambda N=N: ChaCha().keystream(N)
+    for bits in [256, 512]:
+        for size in [32, 64, 1024]:
+            data = os.urandom(size)
+            yield ('blake%d/%d' % (bits, size),
+                   lambda bits=bits, data=data: BLAKE(bits).digest(data))
+    x, y = os.urandom(n), os.urandom(n)
+    yield 'F', lambda: sphincs.F(x)
+    yield 'H', lambda: sphincs.H(x, y)
+
+    sk, pk = sphincs.keygen()
+    SK1, SK2, Q = sk
+    seed = os.urandom(n)
+    m = os.urandom(n)
+    wots_sig = sphincs.wots.sign(m, seed, Q)
+    yield 'wots.keygen', lambda: sphincs.wots.keygen(seed, Q)
+    yield 'wots.sign', lambda: sphincs.wots.sign(m, seed, Q)
+    yield 'wots.verify', lambda: sphincs.wots.verify(m, wots_sig, Q)
+    D = os.urandom(sphincs.m // 8)
+    horst_sig, _ = sphincs.horst.sign(D, seed, Q)
+    yield 'horst.sign', lambda: sphincs.horst.sign(D, seed, Q)
+    yield 'horst.verify', lambda: sphincs.horst.verify(D, horst_sig, Q)
+
+    leafs = [os.urandom(n) for _ in range(1 << (sphincs.h // sphincs.d))]
+    H = lambda x, y, i: sphincs.H(xor(x, Q[2*i]), xor(y, Q[2*i+1]))
+    yield 'trees.hash_tree', lambda: root(hash_tree(H, leafs))
+    yield 'trees.treehash', lambda: treehash(H, leafs, 0)
+
+    M = os.urandom(256)
+    sig = sphincs.sign(M, sk)
+    packed_sig = sphincs.pack(sig)
+    yield 'keygen', sphincs.keygen
+    yield 'sign', lambda: sphincs.sign(M, sk)
+    yield 'verify', lambda: sphincs.verify(M, sig, pk)
+    yield 'pack', lambda: sphincs.pack(sig)
+    yield 'unpack', lambda: sphincs.unpack(sig=packed_sig)
+
+
+def run(params='small', repeat=5, warmup=1, min_time=0.1, only=None,
+        log=None):
+    """Runs the benchmarks and returns the results as a dict
+
+    only -- if given, only benchmarks whose name contains it are run
+    log -- file to report progress to (e.g. sys.stderr)
+    """
+    sphincs = SPHINCS(**PARAMS[params])
+    results = {}
+    for name, fn in benchmarks(sphincs):
+        if only is not None and only not in name:
+            continue
+        results[name] = measure(fn, repeat, warmup, min_time)
+        if log is not None:
+            print('%-28s %12.1f ops/s  %12.6f s/op' %
+                  (name, results[name]['ops_per_sec'],
+                   results[name]['median']), file=log)
+    return {'version': FORMAT_VERSION,
+            'params': params,
+            'python': platform.python_version(),
+            'machine': platform.node(),
+            'results': results}
+
+
+if __name__ == "__main__":
+    args = docopt.docopt(__doc__)
+    report = run(params=args['--params'],
+                 repeat=int(args['--repeat']),
+                 warmup=int(args['--warmup']),
+                 min_time=float(args['--min-time']),
+                 only=args['--filter'],
+                 log=sys.stderr)
+    if args['--json'] == '-':
+        json.dump(report, sys.stdout, indent=1)
+    elif args['--json'] is not None:
+        with open(args['--json'], 'w') as f:
+            json.dump(report, f, indent=1)
@@ -0,0 +1,192 @@
+"""Multi-core scaling of signing and verification
+
+Usage:
+    scaling.py [--params NAME] [--ops N] [--workers LIST] [--modes LIST] [--json FILE]
+    scaling.py (-h|--help)
+
+Options:
+    --params NAME       Parameter set: sphincs256 or small [default: small].
+    --ops N             Total number of operations per run [default: 8].
+    --workers LIST      Comma-separated numbers of workers; 1 is always run,
+                        as the baseline of the efficiency [default: 1,2,4].
+    --modes LIST        Comma-separated modes [default: processes,threads,intra-processes,intra-threads].
+    --json FILE         Write the results as JSON to FILE ('-' for stdout).
+    -h --help           Show this help screen.
+
+The 'processes' and 'threads' modes run independent operations concurrently,
+one per worker. The 'intra-' modes run the operations one after the other,
+but compute the parts of each signature in parallel (see SPHINCS.sign); as
+verification has no such parallelism, they only apply to signing. Threads
+only run in parallel on free-threaded builds of Python, which the report
+records; elsewhere, compare them with processes to see the cost of the GIL.
+The threads share a single SPHINCS instance, as do the parts of a signature
+in the 'intra-threads' mode.
+Run from the project root as 'python -m benchmarks.scaling'.
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import docopt
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from SPHINCS import SPHINCS
+from tracing import Recorder
+from pool import free_threaded
+from benchmarks.micro import PARAMS, FORMAT_VERSION
+
+MODES = ['processes', 'threads', 'intra-processes', 'intra-threads']
+EXECUTORS = {'processes': ProcessPoolExecutor, 'threads': ThreadPoolExecutor}
+
+_instances = {}
+
+
+def instance(params):
+    """Returns the SPHINCS instance for params of this process"""
+    if params not in _instances:
+        _instances[params] = SPHINCS(**PARAMS[params])
+    return _instances[params]
+
+
+def timed(sphincs, op, M, key, sig=None, executor=None):
+    """Performs one operation, returning its latency"""
+    start = time.perf_counter()
+    if op == 'sign':
+        sphincs.sign(M, key, executor)
+    else:
+        assert sphincs.verify(M, sig, key)
+    return time.perf_counter() - start
+
+
+def operation(params, op, M, key, sig=None):
+    """Performs one operation in a worker process, returning its latency and
+    phase histograms
+    """
+    sphincs = instance(params)
+    recorder = Recorder(keep_spans=False)
+    sphincs.observers.append(recorder)
+    try:
+        latency = timed(sphincs, op, M, key, sig)
+    finally:
+        sphincs.observers.remove(recorder)
+    return latency, recorder.histograms
+
+
+def merge(histograms, more):
+    for label, h in more.items():
+        if label in histograms:
+            histograms[label].merge(h)
+        else:
+            histograms[label] = h
+
+
+def run_one(params, mode, op, workers, ops, key, M, sig):
+    """Performs ops operations with the given number of workers"""
+    kind = mode.split('-')[-1]
+    # threads share this instance, so a single recorder observes it for the
+    # whole run rather than one per call (it would see the other threads)
+    sphincs = SPHINCS(**PARAMS[params])
+    recorder = Recorder(keep_spans=False)
+    sphincs.observers.append(recorder)
+    histograms = recorder.histograms
+    with EXECUTORS[kind](workers) as executor:
+        # start the workers before timing, so that start-up is excluded
+        list(executor.map(instance, [params] * workers))
+        start = time.perf_counter()
+        if mode.startswith('intra-'):
+            latencies = [timed(sphincs, op, M, key, sig, executor)
+                         for _ in range(ops)]
+        elif kind == 'threads':
+            futures = [executor.submit(timed, sphincs, op, M, key, sig)
+                       for _ in range(ops)]
+            latencies = [f.result() for f in futures]
+        else:
+            futures = [executor.submit(operation, params, op, M, key, sig)
+                       for _ in range(ops)]
+            latencies = []
+            for f in futures:
+                latency, h = f.result()
+                latencies.append(latency)
+                merge(histograms, h)
+        wall = time.perf_counter() - start
+    latencies.sort()
+    return {'mode': mode,
+            'op': op,
+            'workers': workers,
+            'ops': ops,
+            'wall': wall,
+            'throughput': ops / wall,
+            'latency_mean': sum(latencies) / ops,
+            'latency_max': latencies[-1],
+            'phases': {k: h.summary() for k, h in sorted(histograms.items())}}
+
+
+def run(params='small', ops=8, workers=(1, 2, 4), modes=MODES, log=None):
+    """Runs the scaling benchmark and returns the results as a dict
+
+    Parallel efficiency is the throughput relative to that of one worker in
+    the same mode, divided by the number of workers. A run with one worker
+    is therefore always made first, even if workers does not include 1.
+    """
+    sphincs = instance(params)
+    sk, pk = sphincs.keygen()
+    M = os.urandom(256)
+    sig = sphincs.sign(M, sk)
+    results = []
+    for mode in modes:
+        for op in ['sign', 'verify']:
+            if mode.startswith('intra-') and op == 'verify':
+                continue
+            base = None
+            for n in [1] + [n for n in workers if n != 1]:
+                key = sk if op == 'sign' else pk
+                r = run_one(params, mode, op, n, ops, key, M, sig)
+                if base is None:
+                    base = r['throughput']
+                r['efficiency'] = r['throughput'] / (n * base)
+                results.append(r)
+                if log is not None:
+                    print('%-16s %-7s %3d workers %9.3f ops/s %9.4f s/op '
+                          '%6.1f%% efficiency' %
+                          (mode, op, n, r['throughput'], r['latency_mean'],
+                           100 * r['efficiency']), file=log)
+    return {'version': FORMAT_VERSION,
+            'params': params,
+            'python': platform.python_version(),
+            'machine': platform.node(),
+            'cpus': os.cpu_count(),
+            'free_threaded': free_threaded(),
+            'results': results}
+
+
+def phase_report(report, log):
+    """Prints the share of time per phase for every run"""
+    for r in report['results']:
+        phases = r['phases']
+        top = phases.get(r['op'])
+        if top is None:
+            continue
+        total = top['mean'] * top['count']
+        shares = ['%s %.0f%%' % (k, 100 * v['mean'] * v['count'] / total)
+                  for k, v in phases.items() if k.startswith(r['op'] + '.')]
+        print('%-16s %-7s %3d workers: %s' %
+              (r['mode'], r['op'], r['workers'], ', '.join(shares)), file=log)
+
+
+if __name__ == "__main__":
+    args = docopt.docopt(__doc__)
+    modes = args['--modes'].split(',')
+    assert all(mode in MODES for mode in modes), 'unknown mode'
+    report = run(params=args['--params'],
+                 ops=int(args['--ops']),
+                 workers=[int(n) for n in args['--workers'].split(',')],
+                 modes=modes,
+                 log=sys.stderr)
+    phase_report(report, sys.stderr)
+    if args['--json'] == '-':
+        json.dump(report, sys.stdout, indent=1)
+    elif args['--json'] is not None:
+        with open(args['--json'], 'w') as f:
+            json.dump(report, f, indent=1)
@@ -0,0 +1,41 @@
+import time
+import statistics
+from math import ceil
+
+
+def summarize(samples):
+    """Returns statistics over a list of per-operation timings (in seconds)"""
+    median = statistics.median(samples)
+    return {'samples': list(samples),
+            'mean': statistics.mean(samples),
+            'median': median,
+            'stdev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+            'min': min(samples),
+            'max': max(samples),
+            'ops_per_sec': 1 / median if median > 0 else float('inf')}
+
+
+def timed(fn, number):
+    """Returns the time per call of fn, averaged over number calls"""
+    start = time.perf_counter()
+    for _ in range(number):
+        fn()
+    return (time.perf_counter() - start) / number
+
+
+def measure(fn, repeat=5, warmup=1, min_time=0.1):
+    """Times fn and returns statistics over repeat samples
+
+    fn -- callable without arguments that performs one operation
+    repeat -- number of samples to take
+    warmup -- number of calls to discard before calibrating
+    min_time -- minimal duration of one sample (in seconds); fast operations
+                are called repeatedly within a sample to get above it
+    """
+    for _ in range(warmup):
+        fn()
+    t = timed(fn, 1)
+    number = max(1, ceil(min_time / t)) if t > 0 else 1000
+    stats = summarize([timed(fn, number) for _ in range(repeat)])
+    stats['number'] = number
+    return stats
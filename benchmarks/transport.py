@@ -0,0 +1,72 @@
+"""Round trips of messages and signatures to worker processes
+
+Usage:
+    transport.py [--sizes LIST] [--workers N] [--repeat N] [--json FILE]
+    transport.py (-h|--help)
+
+Options:
+    --sizes LIST        Comma-separated payload sizes [default: 32,41000,1048576].
+    --workers N         Number of worker processes [default: 1].
+    --repeat N          Number of samples per measurement [default: 5].
+    --json FILE         Write the results as JSON to FILE ('-' for stdout).
+    -h --help           Show this help screen.
+
+Compares passing a payload to a worker and a payload of the same size back
+through a plain ProcessPoolExecutor (pickled, through a pipe) with passing
+them through a shared-memory ring (see ring.Transport).
+Run from the project root as 'python -m benchmarks.transport'.
+"""
+
+import os
+import sys
+import json
+import platform
+import docopt
+from concurrent.futures import ProcessPoolExecutor
+
+from ring import Ring, Transport
+from benchmarks.micro import FORMAT_VERSION
+from benchmarks.timing import measure
+
+
+def echo(payload):
+    return payload
+
+
+def run(sizes=(32, 41000), workers=1, repeat=5, log=None):
+    results = {}
+    with ProcessPoolExecutor(workers) as executor:
+        ring = Ring(workers, max(sizes) + 64)
+        transport = Transport(executor, ring)
+        try:
+            for size in sizes:
+                payload = os.urandom(size)
+                for name, target in [('pickle', executor),
+                                     ('ring', transport)]:
+                    fn = lambda: target.submit(echo, payload).result()
+                    stats = measure(fn, repeat=repeat, min_time=0.05)
+                    results['%s.%d' % (name, size)] = stats
+                    if log is not None:
+                        print('%-16s %10.1f us' % ('%s.%d' % (name, size),
+                                                   stats['median'] * 1e6),
+                              file=log)
+        finally:
+            ring.close()
+            ring.unlink()
+    return {'version': FORMAT_VERSION,
+            'python': platform.python_version(),
+            'workers': workers,
+            'results': results}
+
+
+if __name__ == "__main__":
+    args = docopt.docopt(__doc__)
+    report = run(sizes=[int(n) for n in args['--sizes'].split(',')],
+                 workers=int(args['--workers']),
+                 repeat=int(args['--repeat']),
+                 log=sys.stderr)
+    if args['--json'] == '-':
+        json.dump(report, sys.stdout, indent=1)
+    elif args['--json'] is not None:
+        with open(args['--json'], 'w') as f:
+            json.dump(report, f, indent=1)
@@ -1,7 +1,32 @@
+import struct
+
+try:
+    import numpy
+except ImportError:  # the batch forms fall back to plain Python
+    numpy = None
+
+# below this number of blocks, the NumPy set-up costs more than it saves
+BATCH_MIN = 256
+
+
 def xor(b1, b2):
     """Expects two bytes objects of equal length, returns their XOR"""
     assert len(b1) == len(b2)
-    return bytes([x ^ y for x, y in zip(b1, b2)])
+    x = int.from_bytes(b1, byteorder='little') ^ \
+        int.from_bytes(b2, byteorder='little')
+    return x.to_bytes(len(b1), byteorder='little')
+
+
+def xor_each(blocks, mask):
+    """Returns the XOR of each of the blocks with mask (of the same length)"""
+    n = len(mask)
+    if numpy is not None and len(blocks) >= BATCH_MIN:
+        a = numpy.frombuffer(b''.join(blocks), dtype=numpy.uint8)
+        a = a.reshape(-1, n) ^ numpy.frombuffer(mask, dtype=numpy.uint8)
+        return chunkbytes(a.tobytes(), n)
+    m = int.from_bytes(mask, byteorder='little')
+    return [(int.from_bytes(b, byteorder='little') ^ m).to_bytes(
+            n, byteorder='little') for b in blocks]
 
 
 def chunkbytes(a, n):
@@ -9,10 +34,27 @@ def chunkbytes(a, n):
 
 
 def ints_from_4bytes(a):
-    for chunk in chunkbytes(a, 4):
-        yield int.from_bytes(chunk, byteorder='little')
+    """Returns the little-endian 32-bit words of a as a tuple of integers"""
+    return struct.unpack('<%dI' % (len(a) // 4), a)
+
+
+def words_to_bytes(x):
+    """Packs a sequence of 32-bit integers into little-endian bytes"""
+    return struct.pack('<%dI' % len(x), *x)
+
+
+def words_from_blocks(blocks):
+    """Converts a list of equal-length blocks to lists of 32-bit words"""
+    if numpy is not None and len(blocks) >= BATCH_MIN:
+        a = numpy.frombuffer(b''.join(blocks), dtype='<u4')
+        return a.reshape(len(blocks), -1).tolist()
+    return [list(ints_from_4bytes(b)) for b in blocks]
+
 
+def words_to_blocks(words):
+    """Converts lists of 32-bit words back to a list of blocks"""
+    if numpy is not None and len(words) >= BATCH_MIN:
+        a = numpy.array(words, dtype='<u4')
+        return chunkbytes(a.tobytes(), a.shape[1] * 4)
+    return [words_to_bytes(w) for w in words]
 
-def ints_to_4bytes(x):
-    for v in x:
-        yield int.to_bytes(v, length=4, byteorder='little')
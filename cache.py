@@ -0,0 +1,146 @@
+"""A cache of the leaves of the upper hyper-tree subtrees
+
+Most of the work of an authentication path goes into the WOTS+ key pairs of
+the leaves, and the subtrees near the top of the hyper-tree are used by
+many signatures (the topmost one by all of them). LeafCache computes the
+leaves of the top levels once and stores them, together with the masks, in
+a flat buffer of fixed-stride records:
+
+    header | masks (p x n bits) | leaves of level d-1 | level d-2 | ...
+
+where every level holds the 2^subh leaves of each of its subtrees in order
+of the subtree index. Nothing needs to be deserialised to look up a leaf,
+so the buffer can live in a multiprocessing.shared_memory segment that
+worker processes attach to, or in memory that they inherit by forking. The
+masks and leaves are handed out as memoryviews into the buffer, not copies.
+"""
+import struct
+import hashlib
+from multiprocessing import shared_memory
+
+import addresses
+
+MAGIC = b'SPHL'
+HEADER = struct.Struct('<4sIIIII32s')
+
+
+def fingerprint(SK1, Q):
+    return hashlib.sha256(SK1 + b''.join(Q)).digest()
+
+
+class LeafCache(object):
+
+    def __init__(self, buffer, shm=None):
+        """Wraps a buffer laid out as described above
+
+        shm -- the SharedMemory segment that holds buffer, if any
+        """
+        self.shm = shm
+        self.buffer = memoryview(buffer)
+        (magic, self.n, self.subh, self.d, self.levels, p,
+         self.fingerprint) = HEADER.unpack_from(self.buffer)
+        if magic != MAGIC:
+            raise ValueError('not a leaf cache')
+        self.masks_offset = HEADER.size
+        self.leaves_offset = self.masks_offset + p * self.n
+        self.p = p
+        self.key = None  # the last key that matched the fingerprint
+
+    def __reduce__(self):
+        if self.shm is not None:
+            return (LeafCache.attach, (self.shm.name,))
+        return (LeafCache, (bytes(self.buffer),))
+
+    @staticmethod
+    def size(sphincs, levels, p):
+        n, subh = sphincs.n // 8, sphincs.h // sphincs.d
+        subtrees = sum(1 << (subh * t) for t in range(levels))
+        return HEADER.size + p * n + (subtrees << subh) * n
+
+    @classmethod
+    def build(cls, sphincs, SK1, Q, levels, shared=False, executor=None):
+        """Computes the leaves of the top levels of the hyper-tree of SK1
+
+        shared -- whether to put the cache in a new shared memory segment,
+                  which the caller should eventually unlink
+        executor -- optional executor to compute the subtrees in parallel
+        """
+        n, subh, d = sphincs.n // 8, sphincs.h // sphincs.d, sphincs.d
+        if not 0 < levels <= d:
+            raise ValueError('levels must be between 1 and d')
+        size = cls.size(sphincs, levels, len(Q))
+        if shared:
+            shm = shared_memory.SharedMemory(create=True, size=size)
+            buffer = shm.buf
+        else:
+            shm, buffer = None, bytearray(size)
+        HEADER.pack_into(buffer, 0, MAGIC, n, subh, d, levels, len(Q),
+                         fingerprint(SK1, Q))
+        buffer[HEADER.size:HEADER.size + len(Q) * n] = b''.join(Q)
+        cache = cls(buffer, shm)
+        subtrees = [addresses.pack(level, s, 0)
+                    for level in range(d - 1, d - 1 - levels, -1)
+                    for s in range(1 << (subh * (d - 1 - level)))]
+        map_ = map if executor is None else executor.map
+        leaves = map_(sphincs.wots_leaves, subtrees, [SK1] * len(subtrees),
+                      [Q] * len(subtrees), [subh] * len(subtrees))
+        for a, layer in zip(subtrees, leaves):
+            offset = cache.offset(a)
+            cache.buffer[offset:offset + (n << subh)] = b''.join(layer)
+        return cache
+
+    @classmethod
+    def attach(cls, name):
+        """Opens the cache in the shared memory segment called name"""
+        shm = shared_memory.SharedMemory(name)
+        return cls(shm.buf, shm)
+
+    def offset(self, a):
+        """Returns the offset of the leaves of the subtree of a, or None"""
+        t = self.d - 1 - addresses.level(a)
+        if not 0 <= t < self.levels:
+            return None
+        subtrees = sum(1 << (self.subh * u) for u in range(t))
+        subtrees += addresses.subtree(a)
+        return self.leaves_offset + ((subtrees * self.n) << self.subh)
+
+    def masks(self):
+        """Returns the masks Q of the key, as views into the buffer"""
+        return [self.buffer[i:i + self.n]
+                for i in range(self.masks_offset, self.leaves_offset, self.n)]
+
+    def matches(self, SK1, Q):
+        """Returns whether the cache holds the leaves of the key SK1, Q
+
+        The fingerprint is only computed for a key that differs from the
+        last one that matched, e.g. once when a worker attaches.
+        """
+        key = (SK1, list(Q))
+        if key == self.key:
+            return True
+        if fingerprint(SK1, Q) != self.fingerprint:
+            return False
+        self.key = key
+        return True
+
+    def leaves(self, a, SK1, Q):
+        """Returns views of the leaves of the subtree of a, or None if they
+        are not cached
+        """
+        offset = self.offset(a)
+        if offset is None or not self.matches(SK1, Q):
+            return None
+        return [self.buffer[i:i + self.n]
+                for i in range(offset, offset + (self.n << self.subh),
+                               self.n)]
+
+    def close(self):
+        self.key = None
+        self.buffer.release()
+        if self.shm is not None:
+            self.shm.close()
+
+    def unlink(self):
+        """Removes the shared memory segment (see build)"""
+        if self.shm is not None:
+            self.shm.unlink()
@@ -0,0 +1,52 @@
+"""Cooperative cancellation of long-running operations
+
+Signing and key generation take seconds and cannot be interrupted from the
+outside. They accept a Token instead, which they check at safe points (e.g.
+between HORST subtrees and between hyper-tree layers), aborting with
+Cancelled once the token is cancelled or its deadline has passed.
+"""
+import time
+
+
+class Cancelled(Exception):
+    """Raised at a checkpoint when the operation was cancelled"""
+
+
+class DeadlineExceeded(Cancelled):
+    """Raised at a checkpoint when the deadline of the operation passed"""
+
+
+class Token(object):
+
+    def __init__(self, timeout=None, deadline=None):
+        """Creates a token that expires after timeout seconds, or at deadline
+
+        deadline -- absolute time, in seconds since the epoch; wall-clock
+                    time is used so that a token keeps its meaning when it
+                    is sent to another process
+        """
+        if timeout is not None:
+            deadline = time.time() + timeout
+        self.deadline = deadline
+        self.cancelled = False
+
+    def __reduce__(self):
+        # cancel() only affects the local copy; other processes only see
+        # the deadline
+        return (Token, (None, self.deadline))
+
+    def cancel(self):
+        self.cancelled = True
+
+    def remaining(self):
+        """Returns the number of seconds left, or None without a deadline"""
+        if self.deadline is None:
+            return None
+        return max(0, self.deadline - time.time())
+
+    def check(self):
+        """Raises Cancelled if the operation should be abandoned"""
+        if self.cancelled:
+            raise Cancelled('operation was cancelled')
+        if self.deadline is not None and time.time() >= self.deadline:
+            raise DeadlineExceeded('deadline exceeded')
@@ -0,0 +1,315 @@
+"""Differential testing of the optimised code paths against reference ones
+
+Usage:
+    differential.py [--iterations N] [--seed N] [--only NAME]
+    differential.py (-h|--help)
+
+Options:
+    --iterations N      Number of random inputs per check [default: 10].
+    --seed N            Seed of the first iteration [default: 0].
+    --only NAME         Only run the checks whose name contains NAME.
+    -h --help           Show this help screen.
+
+Every check feeds the same random seeds, masks, messages and small parameter
+sets to a straightforward reference implementation (the code as it was
+before it was optimised) and to each alternative path, and reports the first
+intermediate value on which they diverge. The known-answer checks pin the
+test vectors of the reference implementation.
+"""
+
+import sys
+import random
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from math import ceil, log
+import docopt
+
+import addresses
+import bytes_utils
+from SPHINCS import SPHINCS
+from ChaCha import ChaCha
+from blake import BLAKE
+from trees import hash_tree, l_tree, auth_path, root, treehash, MaskedHash
+
+PARAMS = [dict(n=256, m=512, h=4, d=2, w=16, tau=8, k=64),
+          dict(n=256, m=512, h=8, d=2, w=4, tau=8, k=64),
+          dict(n=256, m=512, h=6, d=3, w=16, tau=8, k=64)]
+
+CHECKS = []
+
+
+def check(name):
+    """Registers a check, a function of a random.Random that yields triples
+    of the name of a value, its reference value and its alternative value
+    """
+    def register(f):
+        CHECKS.append((name, f))
+        return f
+    return register
+
+
+def first_difference(a, b, path=''):
+    """Returns the path to and values of the first difference, or None"""
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        for i, (x, y) in enumerate(zip(a, b)):
+            d = first_difference(x, y, '%s[%d]' % (path, i))
+            if d is not None:
+                return d
+        if len(a) != len(b):
+            return '%s (length)' % path, len(a), len(b)
+        return None
+    return None if a == b else (path, a, b)
+
+
+def randbytes(rng, n):
+    return bytes(rng.getrandbits(8) for _ in range(n))
+
+
+def random_key(rng, sphincs):
+    n = sphincs.n // 8
+    SK1, SK2 = randbytes(rng, n), randbytes(rng, n)
+    p = max(sphincs.w - 1, 2 * (sphincs.h + ceil(log(sphincs.wots.l, 2))),
+            2 * sphincs.tau)
+    Q = [randbytes(rng, n) for _ in range(p)]
+    return (SK1, SK2, Q), (sphincs.keygen_pub(SK1, Q), Q)
+
+
+# reference implementations
+
+def reference_xor(b1, b2):
+    return bytes([x ^ y for x, y in zip(b1, b2)])
+
+
+def reference_address(level, subtree, leaf):
+    t = level | (subtree << 4) | (leaf << 59)
+    return int.to_bytes(t, length=8, byteorder='little')
+
+
+def reference_chains(wots, x, masks, chainrange):
+    x = list(x)
+    for i in range(wots.l):
+        for j in chainrange[i]:
+            x[i] = wots.F(reference_xor(x[i], masks[j]))
+    return x
+
+
+def reference_wots_sign(wots, m, seed, masks):
+    sk = bytes_utils.chunkbytes(wots.Gl(seed), wots.n // 8)
+    B = wots.chainlengths(m)
+    return reference_chains(wots, sk, masks, [range(0, b) for b in B])
+
+
+def reference_wots_leaf(s, address, SK1, Q):
+    sk = bytes_utils.chunkbytes(s.wots.Gl(s.Fa(address, SK1)), s.n // 8)
+    pk = reference_chains(s.wots, sk, Q, [range(0, s.w - 1)] * s.wots.l)
+    H = lambda x, y, i: s.H(reference_xor(x, Q[2*i]),
+                            reference_xor(y, Q[2*i+1]))
+    return root(l_tree(H, pk))
+
+
+def reference_horst_sign(horst, m, seed, masks):
+    sk = bytes_utils.chunkbytes(horst.Gt(seed), horst.n // 8)
+    L = list(map(horst.F, sk))
+    H = lambda x, y, i: horst.H(reference_xor(x, masks[2*i]),
+                                reference_xor(y, masks[2*i+1]))
+    tree = hash_tree(H, L)
+    trunk = list(itertools.islice(tree, 0, horst.tau - horst.x))
+    sigma_k = next(tree)
+    M = horst.message_indices(m)
+    pk = root(tree)
+    return ([(sk[Mi], auth_path(trunk, Mi)) for Mi in M] + [sigma_k], pk)
+
+
+def reference_wots_path(s, a, SK1, Q, subh):
+    ta = dict(a)
+    leafs = []
+    for subleaf in range(1 << subh):
+        ta['leaf'] = subleaf
+        address = reference_address(**ta)
+        leafs.append(reference_wots_leaf(s, address, SK1, Q))
+    Qtree = Q[2 * ceil(log(s.wots.l, 2)):]
+    H = lambda x, y, i: s.H(reference_xor(x, Qtree[2*i]),
+                            reference_xor(y, Qtree[2*i+1]))
+    tree = list(hash_tree(H, leafs))
+    return auth_path(tree, a['leaf']), root(tree)
+
+
+def reference_sign(s, M, SK):
+    SK1, SK2, Q = SK
+    R = s.Frand(M, SK2)
+    R1, R2 = R[:s.n // 8], R[s.n // 8:]
+    D = s.Hdigest(R1, M)
+    i = int.from_bytes(R2, byteorder='big') >> (s.n - s.h)
+    subh = s.h // s.d
+    a = {'level': s.d, 'subtree': i >> subh, 'leaf': i & ((1 << subh) - 1)}
+    seed_horst = s.Fa(reference_address(**a), SK1)
+    sig_horst, pk = reference_horst_sign(s.horst, D, seed_horst, Q)
+    sig = [i, R1, sig_horst]
+    for level in range(s.d):
+        a['level'] = level
+        seed_wots = s.Fa(reference_address(**a), SK1)
+        sig.append(reference_wots_sign(s.wots, pk, seed_wots, Q))
+        path, pk = reference_wots_path(s, a, SK1, Q, subh)
+        sig.append(path)
+        a['leaf'] = a['subtree'] & ((1 << subh) - 1)
+        a['subtree'] >>= subh
+    return tuple(sig)
+
+
+# checks
+
+@check('known-answers')
+def known_answers(rng):
+    yield ('address', bytes([0xA1, 0x02, 0, 0, 0, 0, 0, 0x68]),
+           SPHINCS.address(level=1, subtree=42, leaf=13))
+    yield ('chacha12.permuted',
+           bytes.fromhex('b31afb8ec3531e3595b5d6ff902936a5'
+                         'f5b0af5a32ed4ccac6c2120475e94bef'
+                         '991539b29593c652df7f8e8f1da7248d'
+                         '3941b023ce1a3110353ebc80472eab09'),
+           ChaCha(rounds=12).permuted(bytes(range(64))))
+    yield ('blake256',
+           bytes.fromhex('0ce8d4ef4dd7cd8d62dfded9d4edb0a7'
+                         '74ae6a41929a74da23109e8f11139c87'),
+           BLAKE(256).digest(bytes(1)))
+
+
+@check('bytes_utils')
+def check_bytes_utils(rng):
+    blocks = [randbytes(rng, 32) for _ in range(rng.choice([1, 7, 300]))]
+    others = [randbytes(rng, 32) for _ in blocks]
+    mask = randbytes(rng, 32)
+    yield ('xor', [reference_xor(a, b) for a, b in zip(blocks, others)],
+           [bytes_utils.xor(a, b) for a, b in zip(blocks, others)])
+    yield ('xor_each', [reference_xor(b, mask) for b in blocks],
+           bytes_utils.xor_each(blocks, mask))
+    words = bytes_utils.words_from_blocks(blocks)
+    yield ('words_from_blocks',
+           [[int.from_bytes(b[i:i+4], 'little') for i in range(0, 32, 4)]
+            for b in blocks], words)
+    yield 'words_to_blocks', blocks, bytes_utils.words_to_blocks(words)
+
+
+@check('addresses')
+def check_addresses(rng):
+    subh = rng.randint(1, 5)
+    a = {'level': rng.randrange(16), 'subtree': rng.getrandbits(55),
+         'leaf': rng.randrange(1 << subh)}
+    packed = addresses.pack(**a)
+    yield 'to_bytes', reference_address(**a), addresses.to_bytes(packed)
+    yield ('leaf_addresses',
+           [reference_address(a['level'], a['subtree'], j)
+            for j in range(1 << subh)],
+           addresses.split(addresses.leaf_addresses(packed, subh)))
+    parent = {'level': a['level'] + 1, 'subtree': a['subtree'] >> subh,
+              'leaf': a['subtree'] & ((1 << subh) - 1)}
+    if parent['level'] < 16:
+        yield ('parent', reference_address(**parent),
+               addresses.to_bytes(addresses.parent(packed, subh)))
+
+
+@check('trees')
+def check_trees(rng):
+    s = SPHINCS(**rng.choice(PARAMS))
+    Q = [randbytes(rng, 32) for _ in range(2 * s.tau)]
+    H = lambda x, y, i: s.H(reference_xor(x, Q[2*i]),
+                            reference_xor(y, Q[2*i+1]))
+    leafs = [randbytes(rng, 32) for _ in range(1 << rng.randint(1, 5))]
+    idx = rng.randrange(len(leafs))
+    tree = list(hash_tree(H, leafs))
+    yield ('treehash', (auth_path(tree, idx), tree[-1][0]),
+           treehash(H, iter(leafs), idx))
+    yield ('root', tree[-1][0], root(hash_tree(H, leafs)))
+    odd = leafs + [randbytes(rng, 32)]
+    yield ('masked_l_tree', list(l_tree(H, odd)),
+           list(l_tree(MaskedHash(s.H, Q), odd)))
+
+
+@check('wots')
+def check_wots(rng):
+    s = SPHINCS(**rng.choice(PARAMS))
+    seed, m = randbytes(rng, 32), randbytes(rng, 32)
+    Q = [randbytes(rng, 32) for _ in range(s.w - 1)]
+    sk = bytes_utils.chunkbytes(s.wots.Gl(seed), 32)
+    B = s.wots.chainlengths(m)
+    ref = reference_chains(s.wots, sk, Q, [range(0, b) for b in B])
+    yield 'wots.sign', ref, s.wots.sign(m, seed, Q)
+    yield 'wots.sign(reference)', ref, reference_wots_sign(s.wots, m, seed, Q)
+    yield ('wots.keygen',
+           reference_chains(s.wots, sk, Q, [range(0, s.w - 1)] * s.wots.l),
+           s.wots.keygen(seed, Q))
+
+
+@check('horst')
+def check_horst(rng):
+    s = SPHINCS(**rng.choice(PARAMS))
+    seed, m = randbytes(rng, 32), randbytes(rng, s.m // 8)
+    Q = [randbytes(rng, 32) for _ in range(2 * s.tau)]
+    ref = reference_horst_sign(s.horst, m, seed, Q)
+    yield 'horst.sign', ref, s.horst.sign(m, seed, Q)
+    with ThreadPoolExecutor(2) as executor:
+        subtrees = lambda chunks: list(executor.map(
+            s.horst_subtree, chunks, [Q] * len(chunks)))
+        yield 'horst.sign(subtrees)', ref, s.horst.sign(m, seed, Q, subtrees)
+    yield 'horst.keygen', ref[1], s.horst.keygen(seed, Q)
+    yield 'horst.verify', ref[1], s.horst.verify(m, ref[0], Q)
+
+
+@check('sphincs')
+def check_sphincs(rng):
+    s = SPHINCS(**rng.choice(PARAMS))
+    sk, pk = random_key(rng, s)
+    M = randbytes(rng, rng.randrange(300))
+    ref = reference_sign(s, M, sk)
+    yield 'sign', ref, s.sign(M, sk)
+    with ThreadPoolExecutor(2) as executor:
+        yield 'sign(executor)', ref, s.sign(M, sk, executor)
+    packed = s.pack(ref)
+    yield 'sign_stream', packed, b''.join(s.sign_stream(M, sk))
+    yield 'unpack', ref, s.unpack(sig=packed)
+    yield 'verify', True, s.verify(M, ref, pk)
+    verifier = s.verifier(M, pk)
+    chunksize = rng.randint(1, len(packed))
+    for i in range(0, len(packed), chunksize):
+        verifier.update(packed[i:i+chunksize])
+    yield 'verifier', True, verifier.finalize()
+    # both verifiers must reject a signature with a single flipped bit
+    bit = rng.randrange(8 * len(packed))
+    corrupted = bytearray(packed)
+    corrupted[bit // 8] ^= 1 << (bit % 8)
+    corrupted = bytes(corrupted)
+    yield 'verify(corrupted)', False, s.verify(M, s.unpack(sig=corrupted), pk)
+    verifier = s.verifier(M, pk)
+    verifier.update(corrupted)
+    yield 'verifier(corrupted)', False, verifier.finalize()
+
+
+def run(iterations=10, seed=0, only=None, log=None):
+    """Runs the checks, returning the failures
+
+    Each failure is a tuple of the check, the seed, the name of the value
+    and the result of first_difference.
+    """
+    failures = []
+    for name, f in CHECKS:
+        if only is not None and only not in name:
+            continue
+        for it in range(seed, seed + iterations):
+            for value, ref, alt in f(random.Random('%s/%d' % (name, it))):
+                d = first_difference(ref, alt, value)
+                if d is not None:
+                    failures.append((name, it, value, d))
+                    if log is not None:
+                        print('%s (seed %d): %s differs at %s: %r != %r' %
+                              ((name, it, value) + d), file=log)
+        if log is not None:
+            print('%-16s done' % name, file=log)
+    return failures
+
+
+if __name__ == "__main__":
+    args = docopt.docopt(__doc__)
+    failures = run(iterations=int(args['--iterations']),
+                   seed=int(args['--seed']), only=args['--only'],
+                   log=sys.stderr)
+    sys.exit(1 if failures else 0)
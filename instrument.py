@@ -0,0 +1,120 @@
+"""Phases and hash-call counters for instrumenting SPHINCS
+
+SPHINCS marks the phases of keygen, sign and verify using SPHINCS.phase.
+Observers that are appended to SPHINCS.observers are notified when a phase
+is entered and left, by calls to their enter(name, attrs) and exit(name,
+attrs, exc) methods, where exc is the exception that ended the phase (or
+None if it completed). As long as there are no observers, marking a phase
+does not do anything, and the hash functions themselves are never wrapped
+unless a HashCounter is attached.
+"""
+import threading
+from collections import Counter
+
+OPERATIONS = ['F', 'H', 'Fa', 'Frand', 'Hdigest', 'Glambda']
+
+
+class Phase(object):
+
+    def __init__(self, observers, name, attrs):
+        self.observers = observers
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        for observer in self.observers:
+            observer.enter(self.name, self.attrs)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        for observer in reversed(self.observers):
+            observer.exit(self.name, self.attrs, exc)
+
+
+class NullPhase(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+NULL_PHASE = NullPhase()
+
+
+def label(name, attrs):
+    """Returns the label of a phase, e.g. 'sign.wots/3' for level 3"""
+    if 'level' in attrs:
+        return '%s/%d' % (name, attrs['level'])
+    return name
+
+
+class HashCounter(object):
+
+    def __init__(self, sphincs):
+        """Counts the hash function calls of a SPHINCS instance per phase
+
+        Calls are attributed to the innermost phase that is entered; calls
+        outside of any phase are counted under None. Besides the calls in
+        OPERATIONS, the number of keystream bytes produced by Glambda is
+        counted as 'keystream_bytes'. Use as a context manager, or call
+        attach and detach.
+        """
+        self.sphincs = sphincs
+        self.counts = {}
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.originals = None
+
+    @property
+    def stack(self):
+        """The labels of the phases that are entered in this thread"""
+        return self.local.__dict__.setdefault('stack', [])
+
+    def count(self, op, amount=1):
+        stack = self.stack
+        phase = stack[-1] if stack else None
+        with self.lock:
+            self.counts.setdefault(phase, Counter())[op] += amount
+
+    def counting(self, op, f):
+        def wrapper(*args, **kwargs):
+            self.count(op)
+            if op == 'Glambda':
+                n = kwargs['n'] if 'n' in kwargs else args[1]
+                self.count('keystream_bytes', n)
+            return f(*args, **kwargs)
+        return wrapper
+
+    def attach(self):
+        s = self.sphincs
+        self.originals = {op: getattr(s, op) for op in OPERATIONS}
+        for op, f in self.originals.items():
+            setattr(s, op, self.counting(op, f))
+        s.assemble()
+        s.observers.append(self)
+
+    def detach(self):
+        s = self.sphincs
+        s.observers.remove(self)
+        for op, f in self.originals.items():
+            setattr(s, op, f)
+        s.assemble()
+        self.originals = None
+
+    def __enter__(self):
+        self.attach()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.detach()
+
+    def enter(self, name, attrs):
+        self.stack.append(label(name, attrs))
+
+    def exit(self, name, attrs, exc=None):
+        self.stack.pop()
+
+    def total(self):
+        """Returns the counts summed over all phases"""
+        return sum(self.counts.values(), Counter())
@@ -0,0 +1,236 @@
+"""Metrics for long-running signing and verification processes
+
+A Registry holds counters, gauges and summaries, and renders them in the
+Prometheus text exposition format, either as a string or to a file (e.g. for
+the textfile collector of the node exporter). Metrics is an observer (see
+instrument.py) that keeps the SPHINCS operation metrics up to date, without
+affecting the results of keygen, sign and verify.
+"""
+import os
+import time
+import threading
+
+from cancellation import Cancelled
+
+from tracing import Histogram
+
+OPERATIONS = ['keygen', 'sign', 'verify']
+
+
+class Counter(object):
+    type = 'counter'
+
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def samples(self, name):
+        yield name, (), self.value
+
+
+class Gauge(Counter):
+    type = 'gauge'
+
+    def dec(self, amount=1):
+        with self.lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+
+class Summary(object):
+    type = 'summary'
+    QUANTILES = [0.5, 0.95, 0.99]
+
+    def __init__(self):
+        self.histogram = Histogram()
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        with self.lock:
+            self.histogram.add(value)
+
+    def samples(self, name):
+        with self.lock:
+            samples = [(name, (('quantile', str(q)),),
+                        self.histogram.quantile(q)) for q in self.QUANTILES]
+            samples.append((name + '_sum', (), self.histogram.sum))
+            samples.append((name + '_count', (), self.histogram.count))
+        return samples
+
+
+class Registry(object):
+
+    def __init__(self):
+        self.families = {}  # name -> (class, help, {labels: metric})
+        self.lock = threading.Lock()
+
+    def metric(self, cls, name, help, labels):
+        labels = tuple(sorted(labels.items()))
+        with self.lock:
+            family = self.families.setdefault(name, (cls, help, {}))
+            assert family[0] is cls, 'metric %s has another type' % name
+            return family[2].setdefault(labels, cls())
+
+    def counter(self, name, help, **labels):
+        return self.metric(Counter, name, help, labels)
+
+    def gauge(self, name, help, **labels):
+        return self.metric(Gauge, name, help, labels)
+
+    def summary(self, name, help, **labels):
+        return self.metric(Summary, name, help, labels)
+
+    def exposition(self, **labels):
+        """Returns all metrics in the Prometheus text format
+
+        labels -- labels added to every sample, e.g. to tell the files of
+                  several processes apart
+        """
+        common = tuple(sorted(labels.items()))
+        lines = []
+        with self.lock:
+            for name, (cls, help, metrics) in sorted(self.families.items()):
+                lines.append('# HELP %s %s' % (name, help))
+                lines.append('# TYPE %s %s' % (name, cls.type))
+                for labels, metric in sorted(metrics.items()):
+                    for sample, extra, value in metric.samples(name):
+                        text = format_labels(labels + common + extra)
+                        lines.append('%s%s %s' % (sample, text,
+                                                  format_value(value)))
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path, **labels):
+        """Writes the exposition to path, replacing it atomically"""
+        tmp = '%s.%d.tmp' % (path, os.getpid())
+        with open(tmp, 'w') as f:
+            f.write(self.exposition(**labels))
+        os.replace(tmp, path)
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escape = lambda v: v.replace('\\', r'\\').replace('"', r'\"')
+    return '{%s}' % ','.join('%s="%s"' % (k, escape(v)) for k, v in labels)
+
+
+def format_value(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+REGISTRY = Registry()
+
+
+def exposition(registry=REGISTRY):
+    return registry.exposition()
+
+
+def process_path(path, pid):
+    """Returns the file next to path for the metrics of process pid
+
+    E.g. sphincs.prom becomes sphincs.1234.prom, which the textfile
+    collector still picks up. pid may also be a glob pattern.
+    """
+    root, ext = os.path.splitext(path)
+    return '%s.%s%s' % (root, pid, ext)
+
+
+class Writer(object):
+
+    def __init__(self, path, interval=15.0, registry=REGISTRY, **labels):
+        """Writes registry to path every interval seconds, from a thread
+
+        labels -- passed on to Registry.exposition
+        """
+        self.path = path
+        self.interval = interval
+        self.registry = registry
+        self.labels = labels
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while True:
+            self.registry.write(self.path, **self.labels)
+            if self.stopped.wait(self.interval):
+                return
+
+    def close(self):
+        """Stops the thread, after writing the metrics a last time"""
+        self.stopped.set()
+        self.thread.join()
+        self.registry.write(self.path, **self.labels)
+
+
+class Metrics(object):
+
+    def __init__(self, sphincs, registry=REGISTRY):
+        """Records keygen, sign and verify metrics of a SPHINCS instance
+
+        Tracks operation counts and latencies, signature bytes produced,
+        operations in flight and cache hit ratios (reported through cache).
+        Operations that raise are counted as failed rather than completed,
+        with reason 'cancelled' if they were cancelled or abandoned.
+        Append it to SPHINCS.observers, or call attach.
+        """
+        self.sphincs = sphincs
+        self.registry = registry
+        self.starts = threading.local()
+        for op in OPERATIONS:
+            self.latency(op)
+            self.in_flight(op)
+        self.signature_bytes = registry.counter(
+            'sphincs_signature_bytes_total', 'Bytes of signatures produced.')
+
+    def attach(self):
+        self.sphincs.observers.append(self)
+        return self
+
+    def latency(self, op):
+        return self.registry.summary(
+            'sphincs_operation_seconds', 'Latency of operations.', op=op)
+
+    def in_flight(self, op):
+        return self.registry.gauge(
+            'sphincs_operations_in_flight', 'Operations in progress.', op=op)
+
+    def enter(self, name, attrs):
+        if name in OPERATIONS:
+            self.in_flight(name).inc()
+            stack = self.starts.__dict__.setdefault('stack', [])
+            stack.append(time.perf_counter())
+
+    def exit(self, name, attrs, exc=None):
+        if name in OPERATIONS:
+            duration = time.perf_counter() - self.starts.stack.pop()
+            self.latency(name).observe(duration)
+            self.in_flight(name).dec()
+            if exc is not None:
+                cancelled = isinstance(exc, (Cancelled, GeneratorExit))
+                self.registry.counter(
+                    'sphincs_operations_failed_total', 'Failed operations.',
+                    op=name, reason='cancelled' if cancelled else 'error'
+                ).inc()
+                return
+            self.registry.counter('sphincs_operations_total',
+                                  'Completed operations.', op=name).inc()
+            if name == 'sign':
+                self.signature_bytes.inc(self.sphincs.signature_bytes())
+
+    def cache(self, name, hit):
+        """Records a hit (or a miss, if hit is False) for cache name"""
+        r = self.registry
+        hits = r.counter('sphincs_cache_hits_total', 'Cache hits.', cache=name)
+        misses = r.counter('sphincs_cache_misses_total', 'Cache misses.',
+                           cache=name)
+        (hits if hit else misses).inc()
+        r.gauge('sphincs_cache_hit_ratio', 'Ratio of cache hits.',
+                cache=name).set(hits.value / (hits.value + misses.value))
@@ -0,0 +1,273 @@
+"""A process pool that adapts its size to the load
+
+Every worker is a single-process executor of its own, so that workers can
+be added when work queues up and retired after they have been idle for a
+while. New workers run a warm-up call before they are handed any work, and
+the queue is bounded: when it is full, submit raises Overloaded rather than
+letting the latency grow without bounds. How many workers there should be
+is decided by a SizingPolicy, which can be tested without any processes.
+"""
+import os
+import sys
+import time
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, CancelledError
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+class Overloaded(Exception):
+    """Raised when work is rejected because the queue is full"""
+
+
+def cpu_count():
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def free_threaded():
+    """Returns whether threads run Python code in parallel (no GIL)"""
+    return hasattr(sys, '_is_gil_enabled') and not sys._is_gil_enabled()
+
+
+def parallel_executor(workers=None):
+    """Returns an executor for the parallel parts of SPHINCS.sign
+
+    On free-threaded builds, threads avoid the cost of starting processes
+    and pickling the arguments; otherwise only processes run in parallel.
+    """
+    if free_threaded():
+        return ThreadPoolExecutor(workers or cpu_count())
+    return ProcessPoolExecutor(workers or cpu_count())
+
+
+def other_load(busy):
+    """Returns the number of CPUs kept busy by processes other than ours"""
+    if not hasattr(os, 'getloadavg'):
+        return 0.0
+    return max(0.0, os.getloadavg()[0] - busy)
+
+
+class SizingPolicy(object):
+
+    def __init__(self, min_workers=1, max_workers=None, idle=30.0, cpus=None):
+        """Sizes a pool between min_workers and max_workers
+
+        max_workers -- defaults to the number of CPUs
+        idle -- number of seconds a surplus worker stays idle before it is
+                retired
+        cpus -- number of CPUs to plan with (defaults to those available)
+        """
+        self.cpus = cpus or cpu_count()
+        self.min_workers = min_workers
+        self.max_workers = max_workers or self.cpus
+        self.idle = idle
+
+    def size(self, busy, queued, load=0.0):
+        """Returns the number of workers the pool should have
+
+        busy -- number of workers that are running a call
+        queued -- number of calls waiting for a worker
+        load -- number of CPUs kept busy by other processes; no workers are
+                added for which there is no CPU left (but busy ones remain)
+        """
+        available = max(busy, int(self.cpus - load))
+        wanted = min(busy + queued, self.max_workers, available)
+        return max(self.min_workers, wanted)
+
+
+class Worker(object):
+
+    def __init__(self, initializer, initargs):
+        self.executor = ProcessPoolExecutor(1, initializer=initializer,
+                                            initargs=initargs)
+        self.idle_since = None
+
+
+class AdaptivePool(object):
+
+    def __init__(self, policy=None, max_queue=None, initializer=None,
+                 initargs=(), warmup=None, interval=1.0, load=other_load):
+        """Creates a pool of policy.min_workers warm workers
+
+        max_queue -- number of calls that may wait for a worker (unbounded
+                     if None); further calls raise Overloaded
+        initializer, initargs -- as for ProcessPoolExecutor
+        warmup -- function that new workers run before they accept work
+        interval -- number of seconds between checks of the pool size
+        load -- function of the number of busy workers that returns the
+                load of other processes (see SizingPolicy.size)
+
+        A Scheduler in front of the pool can set backlog, a function that
+        returns the number of calls it holds back (which count as queued
+        when sizing the pool), and ready, a function that is called when a
+        new worker can take calls.
+        """
+        self.policy = policy or SizingPolicy()
+        self.max_queue = max_queue
+        self.initializer = initializer
+        self.initargs = initargs
+        self.warmup = warmup
+        self.load = load
+        self.backlog = lambda: 0
+        self.ready = None
+        self.queue = deque()
+        self.workers = []
+        self.idle = deque()
+        self.warming = 0
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        with self.lock:
+            for _ in range(self.policy.min_workers):
+                self.spawn()
+        self.thread = threading.Thread(target=self.maintain, args=(interval,),
+                                       daemon=True)
+        self.thread.start()
+
+    def submit(self, fn, *args):
+        """Schedules fn(*args) on a worker, returning a Future
+
+        Raises Overloaded if max_queue calls are already waiting.
+        """
+        future = Future()
+        with self.lock:
+            if self.stopped.is_set():
+                raise RuntimeError('cannot submit after shutdown')
+            if (self.max_queue is not None and not self.idle and
+                    len(self.queue) >= self.max_queue):
+                raise Overloaded('%d calls are queued' % len(self.queue))
+            self.queue.append((future, fn, args))
+            ready = self.dispatch()
+            self.resize()
+        self.start(ready)
+        return future
+
+    def size(self):
+        """Returns the number of workers, including those warming up"""
+        with self.lock:
+            return len(self.workers)
+
+    def capacity(self):
+        """Returns the number of workers that are warm
+
+        Does not take the lock, so that a Scheduler can call it while it
+        holds its own.
+        """
+        return len(self.workers) - self.warming
+
+    def check(self):
+        """Resizes the pool now, e.g. after calls were held back elsewhere"""
+        with self.lock:
+            self.resize()
+
+    def busy(self):
+        return len(self.workers) - len(self.idle) - self.warming
+
+    def spawn(self):
+        """Starts a new worker; must be called holding the lock"""
+        worker = Worker(self.initializer, self.initargs)
+        self.workers.append(worker)
+        self.warming += 1
+        warm = worker.executor.submit(self.warmup or int)
+        warm.add_done_callback(lambda f: self.warmed(worker, f))
+
+    def warmed(self, worker, future):
+        with self.lock:
+            self.warming -= 1
+            if future.cancelled() or future.exception() is not None:
+                self.retire(worker)
+                ready = []
+            else:
+                self.release(worker)
+                ready = self.dispatch()
+        self.start(ready)
+        if self.ready is not None and worker in self.workers:
+            self.ready()
+
+    def release(self, worker):
+        worker.idle_since = time.monotonic()
+        self.idle.append(worker)
+
+    def retire(self, worker):
+        self.workers.remove(worker)
+        worker.executor.shutdown(wait=False)
+
+    def dispatch(self):
+        """Pairs queued calls with idle workers; must hold the lock"""
+        ready = []
+        while self.queue and self.idle:
+            future, fn, args = self.queue.popleft()
+            if future.set_running_or_notify_cancel():
+                ready.append((self.idle.pop(), future, fn, args))
+        return ready
+
+    def start(self, ready):
+        for worker, future, fn, args in ready:
+            try:
+                inner = worker.executor.submit(fn, *args)
+            except BrokenProcessPool as e:
+                # the worker died while it was idle
+                future.set_exception(e)
+                with self.lock:
+                    if worker in self.workers:
+                        self.retire(worker)
+                    self.resize()
+                continue
+            inner.add_done_callback(
+                lambda f, w=worker, future=future: self.finish(w, future, f))
+
+    def finish(self, worker, future, inner):
+        error = CancelledError() if inner.cancelled() else inner.exception()
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(inner.result())
+        with self.lock:
+            if self.stopped.is_set():
+                return
+            if isinstance(error, BrokenProcessPool):
+                self.retire(worker)
+            else:
+                self.release(worker)
+            ready = self.dispatch()
+            self.resize()
+        self.start(ready)
+
+    def resize(self):
+        """Adds or retires workers as the policy says; must hold the lock"""
+        if self.stopped.is_set():
+            return
+        busy = self.busy()
+        queued = len(self.queue) + self.backlog()
+        target = self.policy.size(busy, queued, self.load(busy))
+        for _ in range(target - len(self.workers)):
+            self.spawn()
+        now = time.monotonic()
+        while len(self.workers) > target and self.idle and \
+                now - self.idle[0].idle_since >= self.policy.idle:
+            self.retire(self.idle.popleft())
+
+    def maintain(self, interval):
+        while not self.stopped.wait(interval):
+            with self.lock:
+                self.resize()
+
+    def shutdown(self, wait=True):
+        with self.lock:
+            self.stopped.set()
+            workers = list(self.workers)
+            for future, _, _ in self.queue:
+                future.cancel()
+            self.queue.clear()
+        for worker in workers:
+            worker.executor.shutdown(wait=wait)
+        if wait:
+            self.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
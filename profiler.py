@@ -0,0 +1,121 @@
+"""Profilers that produce collapsed stacks for flame graphs
+
+Both profilers collect a Counter that maps collapsed stacks (frames from the
+root to the leaf, joined by ';') to a weight: the Sampler counts samples of
+the call stack of a thread, the Tracer measures the time spent in each stack
+(in microseconds) by tracing every call. The stacks can be written in the
+format read by flamegraph.pl, speedscope and similar tools.
+"""
+import os
+import sys
+import time
+import threading
+from collections import Counter
+
+
+def frame_name(code):
+    return '%s:%s' % (os.path.basename(code.co_filename), code.co_name)
+
+
+class Sampler(object):
+
+    def __init__(self, interval=0.001):
+        """Samples the stack of the thread that starts it, every interval
+
+        Note that the sampling thread needs the GIL to take a sample, so the
+        effective interval may be longer (see sys.getswitchinterval).
+        """
+        self.interval = interval
+        self.stacks = Counter()
+        self.running = False
+
+    def sample(self, thread_id):
+        while self.running:
+            time.sleep(self.interval)
+            if not self.running:
+                break
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame_name(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.sample,
+                                       args=(threading.get_ident(),))
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.running = False
+        self.thread.join()
+
+
+class Tracer(object):
+
+    def __init__(self):
+        """Measures the time spent in every call stack, using sys.setprofile
+
+        This is exact in the call counts, but slows execution down a lot.
+        """
+        self.stacks = Counter()
+        self.stack = []  # lists of [path, start, time spent in children]
+
+    def profile(self, frame, event, arg):
+        now = time.perf_counter()
+        if event in ('call', 'c_call'):
+            if event == 'call':
+                name = frame_name(frame.f_code)
+            else:
+                name = '~' + getattr(arg, '__qualname__', repr(arg))
+            path = self.stack[-1][0] + ';' + name if self.stack else name
+            self.stack.append([path, now, 0.0])
+        elif self.stack:  # return, c_return or c_exception
+            path, start, children = self.stack.pop()
+            elapsed = now - start
+            self.stacks[path] += int(round((elapsed - children) * 1e6))
+            if self.stack:
+                self.stack[-1][2] += elapsed
+
+    def __enter__(self):
+        sys.setprofile(self.profile)
+        return self
+
+    def __exit__(self, *exc_info):
+        sys.setprofile(None)
+        while self.stack:  # frames that were entered but never left
+            self.profile(None, 'return', None)
+
+
+def write_collapsed(stacks, f):
+    for stack, weight in sorted(stacks.items()):
+        if weight > 0:
+            f.write('%s %d\n' % (stack, weight))
+
+
+def top(stacks, n=20):
+    """Returns the n functions with the highest self weight
+
+    Each row holds the function, its self weight and its inclusive weight
+    (that of all stacks that it occurs in), as fractions of the total.
+    """
+    total = sum(stacks.values()) or 1
+    own, inclusive = Counter(), Counter()
+    for stack, weight in stacks.items():
+        frames = stack.split(';')
+        own[frames[-1]] += weight
+        for name in set(frames):
+            inclusive[name] += weight
+    return [(name, weight / total, inclusive[name] / total)
+            for name, weight in own.most_common(n)]
+
+
+def write_top(rows, f):
+    print('%8s %8s  %s' % ('self', 'total', 'function'), file=f)
+    for name, own, inclusive in rows:
+        print('%7.1f%% %7.1f%%  %s' % (100 * own, 100 * inclusive, name),
+              file=f)
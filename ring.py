@@ -0,0 +1,177 @@
+"""Passing bytes between processes through a shared-memory ring of slots
+
+Submitting a call to a process pool pickles its arguments and its result
+and pushes them through a pipe, which for 41 KB signatures and large
+messages means copying every byte several times. A Ring is a shared memory
+segment of fixed-size slots; Transport wraps an executor so that the bytes
+arguments of a call are written into a free slot, the worker reads them
+from there and writes a bytes result back into the same slot. Only the
+slot number (and any small, non-bytes arguments) crosses the process
+boundary. A slot holds a field count followed by length-prefixed fields:
+
+    count (4 bytes) | length (4 bytes) | field | length | field | ...
+"""
+import struct
+import threading
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+
+COUNT = struct.Struct('<I')
+LENGTH = struct.Struct('<I')
+
+# rings attached by this process, so that a worker opens each only once
+_attached = {}
+
+
+class Ring(object):
+
+    def __init__(self, slots, slot_size, name=None):
+        """Creates a ring of slots of slot_size bytes, or attaches to it
+
+        name -- name of an existing segment to attach to; the process that
+                created the segment should eventually unlink it
+        """
+        self.slots = slots
+        self.slot_size = slot_size
+        self.shm = shared_memory.SharedMemory(
+            name, create=name is None, size=slots * slot_size)
+        self.name = self.shm.name
+        _attached.setdefault(self.name, self)
+
+    def __reduce__(self):
+        return (attach, (self.name, self.slots, self.slot_size))
+
+    def fits(self, fields):
+        """Returns whether fields fit in one slot"""
+        return (COUNT.size + LENGTH.size * len(fields) +
+                sum(len(f) for f in fields) <= self.slot_size)
+
+    def write(self, slot, fields):
+        """Writes the bytes-like fields into slot"""
+        if not self.fits(fields):
+            raise ValueError('fields do not fit in a slot')
+        buf = self.shm.buf
+        offset = slot * self.slot_size
+        COUNT.pack_into(buf, offset, len(fields))
+        offset += COUNT.size
+        for field in fields:
+            LENGTH.pack_into(buf, offset, len(field))
+            offset += LENGTH.size
+            buf[offset:offset + len(field)] = field
+            offset += len(field)
+
+    def read(self, slot):
+        """Returns the fields in slot, as bytes"""
+        buf = self.shm.buf
+        offset = slot * self.slot_size
+        count, = COUNT.unpack_from(buf, offset)
+        offset += COUNT.size
+        fields = []
+        for _ in range(count):
+            n, = LENGTH.unpack_from(buf, offset)
+            offset += LENGTH.size
+            fields.append(bytes(buf[offset:offset + n]))
+            offset += n
+        return fields
+
+    def close(self):
+        _attached.pop(self.name, None)
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+def attach(name, slots, slot_size):
+    if name not in _attached:
+        _attached[name] = Ring(slots, slot_size, name)
+    return _attached[name]
+
+
+def call(ring, slot, fn, others):
+    """Runs fn in a worker on the arguments in slot
+
+    others -- maps the positions of the arguments that are not in the slot
+              to their values
+    """
+    fields = ring.read(slot)
+    args, i = [], 0
+    for position in range(len(fields) + len(others)):
+        if position in others:
+            args.append(others[position])
+        else:
+            args.append(fields[i])
+            i += 1
+    result = fn(*args)
+    if isinstance(result, bytes) and ring.fits([result]):
+        ring.write(slot, [result])
+        return None, True
+    return result, False
+
+
+class Transport(object):
+
+    def __init__(self, executor, ring):
+        """Wraps executor to pass bytes through ring (see submit)
+
+        Calls wait for a free slot, so ring should have a slot for every
+        call that the executor runs at the same time.
+        """
+        self.executor = executor
+        self.ring = ring
+        self.free = deque(range(ring.slots))
+        self.available = threading.Condition()
+
+    def submit(self, fn, *args):
+        """Schedules fn(*args), returning a Future
+
+        The bytes arguments, and a bytes result, pass through a slot of the
+        ring; calls whose arguments do not fit in a slot are submitted to
+        the executor as they are.
+        """
+        fields = [a for a in args if isinstance(a, bytes)]
+        if not self.ring.fits(fields):
+            return self.executor.submit(fn, *args)
+        others = {i: a for i, a in enumerate(args)
+                  if not isinstance(a, bytes)}
+        with self.available:
+            while not self.free:
+                self.available.wait()
+            slot = self.free.popleft()
+        future = Future()
+        future.set_running_or_notify_cancel()
+        try:
+            self.ring.write(slot, fields)
+            inner = self.executor.submit(call, self.ring, slot, fn, others)
+        except Exception:
+            self.release(slot)
+            raise
+        inner.add_done_callback(lambda f: self.finish(slot, future, f))
+        return future
+
+    def release(self, slot):
+        with self.available:
+            self.free.append(slot)
+            self.available.notify()
+
+    def finish(self, slot, future, inner):
+        try:
+            result, in_ring = inner.result()
+            if in_ring:
+                result = self.ring.read(slot)[0]
+        except BaseException as e:
+            self.release(slot)
+            future.set_exception(e)
+        else:
+            self.release(slot)
+            future.set_result(result)
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
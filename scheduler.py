@@ -0,0 +1,153 @@
+"""Priority scheduling of SPHINCS operations onto a worker pool
+
+A signature costs about a hundred verifications, so in a first-come
+first-served pool a burst of sign requests makes every verification wait
+for seconds. The Scheduler keeps a queue per class of operation and only
+hands work to the executor when a worker is free, choosing between the
+classes by weight; slots can be reserved for a class, so that some workers
+are always available for e.g. verification even when signing saturates the
+rest of the pool.
+"""
+import time
+import threading
+from collections import deque
+from concurrent.futures import Future, CancelledError
+
+from metrics import REGISTRY
+from pool import Overloaded
+
+WEIGHTS = {'verify': 8, 'sign': 1, 'keygen': 1}
+
+
+class Scheduler(object):
+
+    def __init__(self, executor, slots, weights=WEIGHTS, reserved=None,
+                 registry=REGISTRY, max_queue=None):
+        """Schedules calls onto executor, running at most slots at a time
+
+        slots -- number of slots, or a function that returns the current
+                 number (e.g. pool.AdaptivePool.capacity); call wake when
+                 it grows
+        weights -- relative share of the dispatches per class, among the
+                   classes that have work queued
+        reserved -- number of slots per class that other classes cannot use;
+                    while there are too few slots, one is left unreserved
+        max_queue -- number of calls that may be queued in total; further
+                     calls raise pool.Overloaded
+        registry -- metrics.Registry to report queue depths and waiting
+                    times to (or None)
+        """
+        reserved = reserved or {}
+        if not callable(slots) and sum(reserved.values()) >= slots:
+            raise ValueError('at least one slot must remain unreserved')
+        self.executor = executor
+        self.slots = slots
+        self.weights = dict(weights)
+        self.reserved = dict(reserved)
+        self.registry = registry
+        self.max_queue = max_queue
+        self.queues = {c: deque() for c in self.weights}
+        self.running = {c: 0 for c in self.weights}
+        self.credit = {c: 0 for c in self.weights}
+        self.lock = threading.Lock()
+
+    def submit(self, cls, fn, *args):
+        """Queues fn(*args) as an operation of class cls; returns a Future"""
+        future = Future()
+        with self.lock:
+            queued = sum(len(q) for q in self.queues.values())
+            if self.max_queue is not None and queued >= self.max_queue:
+                raise Overloaded('%d calls are queued' % queued)
+            self.queues[cls].append((future, fn, args, time.perf_counter()))
+            self.report(cls)
+            ready = self.dispatch()
+        self.start(ready)
+        return future
+
+    def depth(self):
+        """Returns the number of queued operations per class"""
+        with self.lock:
+            return {c: len(q) for c, q in self.queues.items()}
+
+    def queued(self):
+        """Returns the number of queued operations
+
+        Does not take the lock, so that the executor can call it while it
+        holds its own (see pool.AdaptivePool).
+        """
+        return sum(len(q) for q in list(self.queues.values()))
+
+    def wake(self):
+        """Dispatches queued operations, e.g. after the slots grew"""
+        with self.lock:
+            ready = self.dispatch()
+        self.start(ready)
+
+    def free(self, cls):
+        """Returns whether an operation of class cls may take a slot"""
+        slots = self.slots() if callable(self.slots) else self.slots
+        held = sum(max(0, r - self.running[c])
+                   for c, r in self.reserved.items() if c != cls)
+        held = min(held, max(0, slots - 1))
+        return sum(self.running.values()) + held < slots
+
+    def dispatch(self):
+        """Picks the operations to start; must be called holding the lock
+
+        Among the classes with queued work that may take a slot, the one
+        with the most credit goes first (smooth weighted round-robin).
+        """
+        ready = []
+        while True:
+            eligible = [c for c, q in self.queues.items()
+                        if q and self.free(c)]
+            if not eligible:
+                return ready
+            for c in eligible:
+                self.credit[c] += self.weights[c]
+            cls = max(eligible, key=lambda c: self.credit[c])
+            self.credit[cls] -= sum(self.weights[c] for c in eligible)
+            future, fn, args, queued = self.queues[cls].popleft()
+            if not future.set_running_or_notify_cancel():
+                continue
+            self.running[cls] += 1
+            self.report(cls, time.perf_counter() - queued)
+            ready.append((cls, future, fn, args))
+
+    def start(self, ready):
+        for cls, future, fn, args in ready:
+            try:
+                inner = self.executor.submit(fn, *args)
+            except Exception as e:
+                future.set_exception(e)
+                self.done(cls)
+            else:
+                inner.add_done_callback(
+                    lambda f, cls=cls, future=future:
+                    self.finish(cls, future, f))
+
+    def finish(self, cls, future, inner):
+        if inner.cancelled():
+            future.set_exception(CancelledError())
+        elif inner.exception() is not None:
+            future.set_exception(inner.exception())
+        else:
+            future.set_result(inner.result())
+        self.done(cls)
+
+    def done(self, cls):
+        with self.lock:
+            self.running[cls] -= 1
+            ready = self.dispatch()
+        self.start(ready)
+
+    def report(self, cls, wait=None):
+        if self.registry is None:
+            return
+        self.registry.gauge('sphincs_scheduler_queue_depth',
+                            'Operations waiting for a worker.',
+                            op=cls).set(len(self.queues[cls]))
+        if wait is not None:
+            self.registry.summary('sphincs_scheduler_wait_seconds',
+                                  'Time operations spent queued.',
+                                  op=cls).observe(wait)
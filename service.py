@@ -0,0 +1,363 @@
+"""A signing and verification service on a Unix domain socket
+
+The server loads the keys once, into every worker process of a pool, so that
+requests do not pay for start-up, imports and key parsing. Requests and
+responses are frames: a 4-byte big-endian length followed by the payload.
+A request payload is an operation byte (b'S' for sign, b'V' for verify)
+followed by its fields, a response payload is a status byte (b'+' for
+success, b'-' for an error) followed by its fields; every field is again
+prefixed by its 4-byte length.
+
+    sign:   message[, timeout]   ->  packed signature
+    verify: message, signature   ->  b'\\x01' if valid, b'\\x00' otherwise
+    error:                       ->  message (utf-8)
+
+The optional timeout of a sign request is a big-endian double, in seconds;
+a signature that is not complete in time is abandoned by its worker. A
+request frame longer than the server's max_frame is answered with an error,
+after which the connection is closed.
+"""
+import os
+import glob
+import struct
+import socket
+import socketserver
+from concurrent.futures import ProcessPoolExecutor
+
+import addresses
+from SPHINCS import SPHINCS
+from cancellation import Token
+from scheduler import Scheduler, WEIGHTS
+from pool import AdaptivePool, SizingPolicy
+from cache import LeafCache
+from ring import Ring, Transport
+from metrics import Metrics, Registry, Writer, process_path
+
+SIGN = b'S'
+VERIFY = b'V'
+OK = b'+'
+ERROR = b'-'
+MAX_FRAME = 1 << 26
+
+
+class ServiceError(Exception):
+    pass
+
+
+def encode(kind, fields):
+    payload = kind + b''.join(struct.pack('>I', len(f)) + f for f in fields)
+    return struct.pack('>I', len(payload)) + payload
+
+
+def decode(payload):
+    kind, fields, i = payload[:1], [], 1
+    while i < len(payload):
+        n, = struct.unpack_from('>I', payload, i)
+        fields.append(payload[i+4:i+4+n])
+        i += 4 + n
+    return kind, fields
+
+
+def read_exactly(f, n):
+    data = f.read(n)
+    if len(data) < n:
+        raise EOFError('connection closed')
+    return data
+
+
+def read_frame(f, limit=MAX_FRAME):
+    """Reads one frame from the file object f; returns None at EOF
+
+    Raises ServiceError for frames longer than limit bytes, before reading
+    (or allocating) their payload.
+    """
+    header = f.read(4)
+    if not header:
+        return None
+    if len(header) < 4:
+        raise EOFError('connection closed')
+    n, = struct.unpack('>I', header)
+    if limit is not None and n > limit:
+        raise ServiceError('frame of %d bytes exceeds the limit of %d bytes'
+                           % (n, limit))
+    return read_exactly(f, n)
+
+
+# state of the worker processes, set up by init_worker
+
+_worker = {}
+
+
+def init_worker(params, sk, pk, cache=None, metrics=None,
+                metrics_interval=15.0):
+    """Loads the (packed) keys into the worker process
+
+    cache -- LeafCache of sk to use; a shared one is attached by name rather
+             than copied. The masks are read from it in place, so sk only
+             needs to hold SK1 and SK2 (see without_masks).
+    metrics -- if given, the operation metrics of the worker are written
+               every metrics_interval seconds to the file next to it that
+               metrics.process_path names, labelled with the worker's pid
+    """
+    sphincs = SPHINCS(**params)
+    sphincs.leaf_cache = cache
+    if metrics is not None:
+        # a registry of its own, not the one forked from the server
+        registry = Registry()
+        Metrics(sphincs, registry).attach()
+        pid = os.getpid()
+        _worker['metrics'] = Writer(process_path(metrics, pid),
+                                    metrics_interval, registry,
+                                    worker=str(pid))
+    _worker['sphincs'] = sphincs
+    _worker['sk'] = sphincs.unpack(sk=sk) if sk and cache is None else None
+    _worker['pk'] = sphincs.unpack(pk=pk) if pk else None
+    if cache is not None and sk:
+        n = sphincs.n // 8
+        SK1, SK2, Q = sk[:n], sk[n:2*n], cache.masks()
+        if not cache.matches(SK1, Q):
+            raise ValueError('the leaf cache belongs to another key')
+        _worker['sk'] = SK1, SK2, Q
+
+
+def without_masks(sphincs, sk):
+    """Returns the packed sk without its masks, for workers that read them
+    from a LeafCache"""
+    return sk[:2 * sphincs.n // 8]
+
+
+def warm_task():
+    """Prepares a new worker before it is handed requests
+
+    Looks up the top subtree in the leaf cache and computes one WOTS+ leaf
+    with the secret key, and runs the streaming verifier over an all-zero
+    signature with the public key (which it rejects after the HORST part),
+    so that the first request does not pay for the first use of the keys.
+    Returns whether a key is loaded.
+    """
+    sphincs = _worker['sphincs']
+    if _worker['sk'] is not None:
+        SK1, _, Q = _worker['sk']
+        a = addresses.pack(sphincs.d - 1, 0, 0)
+        if sphincs.leaf_cache is not None:
+            sphincs.leaf_cache.leaves(a, SK1, Q)
+        sphincs.wots_leaf(addresses.to_bytes(a), SK1, Q)
+    if _worker['pk'] is not None:
+        verifier = sphincs.verifier(b'', _worker['pk'])
+        verifier.update(bytes(sphincs.signature_bytes()))
+        verifier.finalize()
+    return _worker['sk'] is not None or _worker['pk'] is not None
+
+
+def sign_task(M, token=None):
+    sphincs = _worker['sphincs']
+    if _worker['sk'] is None:
+        raise ServiceError('no secret key loaded')
+    return b''.join(sphincs.sign_stream(M, _worker['sk'], token=token))
+
+
+def verify_task(M, sig):
+    sphincs = _worker['sphincs']
+    if _worker['pk'] is None:
+        raise ServiceError('no public key loaded')
+    with sphincs.phase('verify'):
+        verifier = sphincs.verifier(M, _worker['pk'])
+        verifier.update(sig)
+        return verifier.finalize()
+
+
+class Handler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        while True:
+            try:
+                payload = read_frame(self.rfile, self.server.max_frame)
+            except EOFError:
+                return
+            except ServiceError as e:
+                # the rest of the stream cannot be trusted
+                self.wfile.write(encode(ERROR, [str(e).encode()]))
+                return
+            if payload is None:
+                return
+            self.wfile.write(self.server.dispatch(payload))
+            self.wfile.flush()
+
+
+class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, params=None, sk=None, pk=None, workers=None,
+                 executor=None, weights=WEIGHTS, reserved=None,
+                 max_workers=None, max_queue=None, cache_levels=0,
+                 ring_slot_size=None, metrics=None, metrics_interval=15.0,
+                 max_frame=MAX_FRAME):
+        """Serves sign and verify requests on the Unix socket at path
+
+        params -- SPHINCS parameters (defaults to SPHINCS-256)
+        sk, pk -- packed keys; if only sk is given, pk is derived from it
+        workers -- size of the process pool (defaults to the number of CPUs)
+        max_workers -- if given, the pool grows from workers (or 1) up to
+                       max_workers processes with the load, and shrinks
+                       again when they are idle (see pool.AdaptivePool)
+        max_queue -- number of requests that may wait for a worker; further
+                     requests are rejected as Overloaded
+        cache_levels -- number of hyper-tree levels whose leaves are
+                        computed up front and shared by all workers through
+                        shared memory (see cache.LeafCache)
+        ring_slot_size -- if given, messages and signatures are passed to
+                          and from the workers through a shared memory ring
+                          with a slot of this size per worker (see ring)
+        metrics -- file to write the metrics of the server (such as those
+                   of the scheduler) to every metrics_interval seconds; the
+                   workers write theirs to files next to it (see
+                   metrics.process_path), which are removed on close
+        max_frame -- maximum length of a request frame, in bytes
+        executor -- executor to use instead of a new process pool; its
+                    workers must have been set up with init_worker
+        weights, reserved -- passed on to the Scheduler of the requests;
+                             by default, one worker is reserved for verify
+                             requests (if there are several)
+        """
+        params = params or {}
+        if sk and not pk:
+            sphincs = SPHINCS(**params)
+            SK1, _, Q = sphincs.unpack(sk=sk)
+            pk = sphincs.pack((sphincs.keygen_pub(SK1, Q), Q))
+        self.bound = False
+        self.executor = None
+        self.cache = None
+        self.ring = None
+        self.metrics = None
+        self.max_frame = max_frame
+        socketserver.UnixStreamServer.__init__(self, path, Handler)
+        if cache_levels and sk:
+            sphincs = SPHINCS(**params)
+            SK1, _, Q = sphincs.unpack(sk=sk)
+            self.cache = LeafCache.build(sphincs, SK1, Q, cache_levels,
+                                         shared=True)
+            sk = without_masks(sphincs, sk)
+        initargs = (params, sk, pk, self.cache, metrics, metrics_interval)
+        self.pool = None
+        if executor is None and max_workers is not None:
+            policy = SizingPolicy(workers or 1, max_workers)
+            executor = AdaptivePool(policy, initializer=init_worker,
+                                    initargs=initargs, warmup=warm_task)
+            self.pool = executor
+            workers = max_workers
+        elif executor is None:
+            executor = ProcessPoolExecutor(workers, initializer=init_worker,
+                                           initargs=initargs)
+        workers = workers or os.cpu_count()
+        if ring_slot_size is not None:
+            self.ring = Ring(workers, ring_slot_size)
+            executor = Transport(executor, self.ring)
+        self.executor = executor
+        if reserved is None:
+            reserved = {'verify': 1} if workers > 1 else {}
+        # the scheduler only hands out as many slots as there are warm
+        # workers, so that requests wait in its queues, by priority, rather
+        # than in the FIFO queue of the pool
+        slots = workers if self.pool is None else self.pool.capacity
+        self.scheduler = Scheduler(executor, slots, weights, reserved,
+                                   max_queue=max_queue)
+        if self.pool is not None:
+            self.pool.backlog = self.scheduler.queued
+            self.pool.ready = self.scheduler.wake
+        if metrics is not None:
+            self.metrics = Writer(metrics, metrics_interval)
+
+    def server_bind(self):
+        socketserver.UnixStreamServer.server_bind(self)
+        self.bound = True
+
+    def submit(self, op, fields):
+        if op == SIGN and len(fields) == 1:
+            future = self.scheduler.submit('sign', sign_task, *fields)
+        elif op == SIGN and len(fields) == 2 and len(fields[1]) == 8:
+            token = Token(struct.unpack('>d', fields[1])[0])
+            future = self.scheduler.submit('sign', sign_task, fields[0],
+                                           token)
+        elif op == VERIFY and len(fields) == 2:
+            future = self.scheduler.submit('verify', verify_task, *fields)
+        else:
+            raise ServiceError('malformed request')
+        if self.pool is not None:
+            self.pool.check()  # grow if the request had to wait
+        return future
+
+    def dispatch(self, payload):
+        """Handles one request payload, returning the response frame"""
+        try:
+            op, fields = decode(payload)
+            result = self.submit(op, fields).result()
+        except Exception as e:
+            return encode(ERROR, [('%s: %s' % (type(e).__name__, e)).encode()])
+        if op == VERIFY:
+            result = b'\x01' if result else b'\x00'
+        return encode(OK, [result])
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        if self.executor is not None:
+            self.executor.shutdown()
+        if self.cache is not None:
+            self.cache.close()
+            self.cache.unlink()
+            self.cache = None
+        if self.ring is not None:
+            self.ring.close()
+            self.ring.unlink()
+            self.ring = None
+        if self.metrics is not None:
+            self.metrics.close()
+            pattern = process_path(self.metrics.path, '[0-9]*')
+            for path in glob.glob(pattern):
+                os.remove(path)
+            self.metrics = None
+        if self.bound:
+            os.unlink(self.server_address)
+            self.bound = False
+
+
+class Client(object):
+
+    def __init__(self, path):
+        """Connects to the service listening on the Unix socket at path"""
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.connect(path)
+        self.file = self.socket.makefile('rwb')
+
+    def request(self, op, fields):
+        self.file.write(encode(op, fields))
+        self.file.flush()
+        payload = read_frame(self.file)
+        if payload is None:
+            raise ServiceError('connection closed')
+        status, fields = decode(payload)
+        if status != OK:
+            raise ServiceError(fields[0].decode())
+        return fields[0]
+
+    def sign(self, M, timeout=None):
+        """Returns the packed signature on M
+
+        timeout -- number of seconds after which the service gives up
+        """
+        if timeout is None:
+            return self.request(SIGN, [M])
+        return self.request(SIGN, [M, struct.pack('>d', timeout)])
+
+    def verify(self, M, sig):
+        """Returns whether the packed signature sig on M is valid"""
+        return self.request(VERIFY, [M, sig]) == b'\x01'
+
+    def close(self):
+        self.file.close()
+        self.socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
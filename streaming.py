@@ -0,0 +1,82 @@
+from bytes_utils import chunkbytes
+
+
+class Verifier(object):
+
+    def __init__(self, sphincs, M, PK):
+        """Initializes an incremental verifier for a packed signature
+
+        The signature is consumed in the order in which SPHINCS.pack lays it
+        out. Every part is verified as soon as it is complete, so that the
+        work overlaps with receiving the remainder of the signature, and a
+        bad HORST signature is rejected before the hyper-tree arrives.
+        sphincs -- the SPHINCS instance that defines the parameters
+        M -- the message that was signed
+        PK -- the (unpacked) public key
+        """
+        self.sphincs = sphincs
+        self.M = M
+        self.PK1, self.Q = PK
+        self.buffer = bytearray()
+        self.result = None  # set to True or False once it is decided
+        self.steps = self.consume()
+        self.need = next(self.steps)
+
+    def consume(self):
+        """Generator that receives the parts of the signature one by one
+
+        It yields the number of bytes that it needs for the next part, and
+        returns the outcome of the verification.
+        """
+        s = self.sphincs
+        n = s.n // 8
+        subh = s.h // s.d
+        i = yield (s.h + 7) // 8
+        i = int.from_bytes(i, byteorder='little')
+        if i >> s.h:  # the unused high bits of the index must be zero
+            return False
+        R1 = yield n
+        D = s.Hdigest(R1, self.M)
+        roots = []
+        for Mi in s.horst.message_indices(D):
+            sk = yield n
+            path = chunkbytes((yield (s.tau - s.horst.x) * n), n)
+            with s.phase('verify.horst'):
+                roots.append(s.horst.subtree_root(Mi, sk, path, self.Q))
+        sigma_k = chunkbytes((yield (1 << s.horst.x) * n), n)
+        if any(r != sigma_k[yi] for yi, r in roots):
+            return False
+        with s.phase('verify.horst'):
+            pk = s.horst.top_root(sigma_k, self.Q)
+        for level in range(s.d):
+            wots_sig = chunkbytes((yield s.wots.l * n), n)
+            wots_path = chunkbytes((yield subh * n), n)
+            with s.phase('verify.wots', level=level):
+                pk = s.verify_layer(pk, wots_sig, wots_path,
+                                    i & ((1 << subh) - 1), self.Q)
+            i >>= subh
+        return pk == self.PK1
+
+    def update(self, data):
+        """Consumes a chunk of the signature
+
+        Returns False as soon as the signature is known to be invalid, so
+        that the caller can stop reading; returns True otherwise.
+        """
+        if self.result is False:
+            return False
+        self.buffer += data
+        while self.result is None and len(self.buffer) >= self.need:
+            part = bytes(self.buffer[:self.need])
+            del self.buffer[:self.need]
+            try:
+                self.need = self.steps.send(part)
+            except StopIteration as e:
+                self.result = e.value
+        if self.result is not None and self.buffer:
+            self.result = False  # trailing data after the signature
+        return self.result is not False
+
+    def finalize(self):
+        """Returns True iff exactly one valid signature has been consumed"""
+        return self.result is True
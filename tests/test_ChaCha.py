@@ -1,3 +1,4 @@
+from concurrent.futures import ThreadPoolExecutor
 from ChaCha import ChaCha
 
 
@@ -73,3 +74,16 @@ def test_streamblocks():
 
 def test_halfblock():
     assert ChaCha().keystream(37) == ChaCha().keystream(64)[:37]
+
+
+def test_chacha_keystream_threads():
+    key = bytes(range(32))
+    expected = ChaCha(key=key).keystream(64 * 400)
+    chacha = ChaCha(key=key)
+    with ThreadPoolExecutor(4) as executor:
+        parts = list(executor.map(lambda _: chacha.keystream(64 * 4),
+                                  range(100)))
+    # the threads get disjoint blocks, which together form the keystream
+    blocks = sorted(p[i:i+64] for p in parts for i in range(0, len(p), 64))
+    assert blocks == sorted(expected[i:i+64]
+                            for i in range(0, len(expected), 64))
@@ -1,5 +1,7 @@
 import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from SPHINCS import SPHINCS
+from metrics import Registry, Metrics
 
 
 def test_address_ref():
@@ -163,3 +165,32 @@ def test_SPHINCS_ref():
         [bytes([0x61, 0x00, 0x55, 0xf4, 0xcc, 0x3a, 0x85, 0x7f, 0x07, 0x7a, 0x43, 0x7f, 0xc7, 0xaf, 0x35, 0x3f, 0x92, 0xfb, 0x25, 0xbf, 0x5a, 0x64, 0xd8, 0xb3, 0x9f, 0x0c, 0x82, 0x6d, 0xd2, 0xb7, 0x61, 0x38]), bytes([0x71, 0x38, 0xcc, 0x58, 0x37, 0x3a, 0x59, 0x63, 0x4d, 0x98, 0x80, 0x40, 0x23, 0x70, 0x2a, 0xcf, 0x2d, 0x1b, 0x9b, 0xba, 0xf9, 0x73, 0xb6, 0xff, 0x15, 0x79, 0x6a, 0xd6, 0xfa, 0xd0, 0x28, 0x91]), bytes([0xca, 0x62, 0x98, 0x65, 0x6a, 0xf6, 0xc4, 0xc4, 0xee, 0xa1, 0x3e, 0x03, 0x23, 0xd4, 0xc6, 0x94, 0x62, 0x43, 0x3d, 0xab, 0xee, 0x77, 0x86, 0x62, 0x09, 0x5c, 0x70, 0xb5, 0x85, 0xd9, 0x42, 0x62]), bytes([0x10, 0x0f, 0x73, 0x41, 0x41, 0xc4, 0xd6, 0x68, 0x7b, 0x4e, 0x46, 0x02, 0x35, 0xb4, 0xe5, 0xd0, 0x53, 0x50, 0x02, 0xa4, 0x35, 0x1d, 0x1f, 0xbd, 0x85, 0xe5, 0xd7, 0x9c, 0x1b, 0x5e, 0x16, 0x4c]), bytes([0x04, 0x66, 0x2d, 0xca, 0x97, 0x54, 0xc5, 0xf6, 0x45, 0xf8, 0xa0, 0xda, 0x75, 0xe7, 0xa9, 0xed, 0xc0, 0xc0, 0x4e, 0x8e, 0x3d, 0xf3, 0x0a, 0x67, 0x46, 0x3d, 0xa8, 0x7a, 0xce, 0x3c, 0xc1, 0x72])],
         [bytes([0x03, 0x83, 0x55, 0x79, 0x3e, 0x48, 0x93, 0x4f, 0xd1, 0x9a, 0xa1, 0x37, 0xa5, 0x7e, 0xe7, 0xac, 0x27, 0xd0, 0x45, 0xbb, 0xcd, 0x6d, 0x70, 0x1b, 0xa9, 0x02, 0xb8, 0xe3, 0xb6, 0x62, 0xba, 0xc1]), bytes([0xbd, 0xd7, 0x7a, 0xcb, 0x8b, 0xb8, 0x0e, 0x25, 0xda, 0xc5, 0x59, 0xde, 0xf8, 0xdf, 0x59, 0x0e, 0x98, 0x1f, 0xf4, 0x66, 0x10, 0x2a, 0xc8, 0x0f, 0x57, 0x59, 0x5d, 0xe0, 0x4d, 0x27, 0x1c, 0xed]), bytes([0x24, 0x4a, 0x1f, 0xea, 0xdc, 0x2d, 0x67, 0x6f, 0x0a, 0x02, 0xdc, 0x2f, 0x7e, 0x83, 0x68, 0x4a, 0xa1, 0x53, 0x31, 0x80, 0xee, 0xc3, 0xf8, 0x29, 0x9d, 0xce, 0xd2, 0xd7, 0x9f, 0x74, 0x83, 0xa9]), bytes([0x95, 0x7b, 0xed, 0x2c, 0x14, 0x54, 0xef, 0xf3, 0xcf, 0x39, 0xbf, 0xd4, 0x97, 0x0b, 0xbf, 0x40, 0xdc, 0xe3, 0x88, 0xcf, 0xd4, 0xfd, 0x35, 0x1a, 0xa9, 0xe5, 0x92, 0x16, 0x40, 0xec, 0x39, 0x3f]), bytes([0xe0, 0xf8, 0xb2, 0x1f, 0x83, 0xba, 0x70, 0xf7, 0x86, 0x4d, 0x03, 0xaa, 0x12, 0xaa, 0x2c, 0xc9, 0xab, 0xa6, 0x03, 0xb5, 0xf3, 0xdd, 0xcf, 0x14, 0x68, 0x1f, 0xda, 0xbc, 0xa0, 0x23, 0x35, 0x51]), bytes([0x98, 0x53, 0x5b, 0x10, 0x3e, 0xdd, 0x3b, 0x10, 0x4f, 0x31, 0x81, 0xb3, 0x97, 0xbb, 0x3d, 0x17, 0x49, 0x40, 0xf8, 0x49, 0x59, 0x17, 0xde, 0x30, 0xcb, 0x81, 0xf3, 0x7a, 0x7c, 0x66, 0x8a, 0xa8]), bytes([0xde, 0x68, 0xee, 0x4a, 0x29, 0x13, 0x78, 0x23, 0x47, 0xa9, 0x68, 0x62, 0xc7, 0xf2, 0x58, 0xa1, 0x92, 0x75, 0x51, 0x26, 0x7a, 0x0b, 0x99, 0xeb, 0x33, 0x8f, 0xf9, 0x5f, 0x61, 0xce, 0x3a, 0x87]), bytes([0xbb, 0xac, 0x1d, 0x5f, 0xa4, 0x59, 0xf0, 0xf5, 0x01, 0x29, 0x1e, 0xb4, 0x23, 0x58, 0xe3, 0x3f, 0x62, 0xb3, 0x75, 0x34, 0x18, 0xd2, 0x98, 0x3c, 0xe4, 0x71, 0x3e, 0xd6, 0x93, 0xce, 0x07, 0x60]), bytes([0x51, 0xfb, 0xf5, 0xaf, 0x58, 0x71, 0x0b, 0x20, 0x54, 0x08, 0x5d, 0x07, 0x67, 0x05, 0x34, 0xbe, 0xc5, 0x55, 0x2f, 0xae, 0xe8, 0xa2, 0x44, 0xe3, 0x25, 0x4e, 0xef, 0x4b, 0x71, 0x60, 0x24, 0xd6]), bytes([0xa7, 0xe7, 0x2f, 0x91, 0xc8, 0x3e, 0x45, 0x4d, 0x26, 0x88, 0x76, 0xfa, 0xb3, 0xb6, 0x15, 0x80, 0x38, 0x78, 0x37, 0x22, 0x20, 0x14, 0x3c, 0x38, 0x2d, 0xc0, 0x02, 0x94, 0x2c, 0x49, 0x32, 0x98]), bytes([0x87, 0xa2, 0x0a, 0x67, 0x19, 0x2b, 0xb4, 0x2e, 0x65, 0x11, 0x71, 0x04, 0x5e, 0xf4, 0xe5, 0xa7, 0x74, 0xfd, 0x55, 0xa7, 0x76, 0xa5, 0x78, 0x5b, 0x2f, 0x75, 0x8d, 0xaf, 0x0d, 0xde, 0x03, 0x1d]), bytes([0x05, 0x1c, 0x73, 0x54, 0xeb, 0x9f, 0xf5, 0xc7, 0x19, 0x2c, 0xdf, 0xfb, 0x29, 0x0c, 0x8e, 0x37, 0x8c, 0xbf, 0xc1, 0xda, 0xd7, 0xa3, 0x73, 0x23, 0x40, 0xa3, 0xb1, 0x3e, 0xc9, 0x8e, 0xe3, 0xe7]), bytes([0xa0, 0xcd, 0xa2, 0xab, 0x1d, 0x90, 0x69, 0xcf, 0x1d, 0x71, 0xd6, 0xa0, 0x22, 0x92, 0xe4, 0x21, 0x0c, 0x96, 0xd5, 0xcd, 0xff, 0x3e, 0x1a, 0x5e, 0xcb, 0x73, 0xf3, 0x9a, 0x86, 0x18, 0x75, 0xd1]), bytes([0xf2, 0xa2, 0xad, 0xf8, 0x2a, 0x01, 0x45, 0xe7, 0xcc, 0x44, 0xde, 0x85, 0xa2, 0xd5, 0x0c, 0x5a, 0xc3, 0xdb, 0x10, 0x94, 0xb7, 0xbb, 0xb3, 0x83, 0x2c, 0x58, 0x5d, 0x94, 0xb9, 0x39, 0x8d, 0x22]), bytes([0xc0, 0x0d, 0x05, 0xd9, 0x9f, 0xd6, 0x77, 0xff, 0x49, 0x34, 0x6c, 0x76, 0x0c, 0xa4, 0x52, 0xc2, 0xb5, 0xdc, 0xe8, 0x08, 0xba, 0x7b, 0xf2, 0xee, 0x98, 0xd4, 0x6b, 0xe1, 0x5a, 0x58, 0xd7, 0x14]), bytes([0x4d, 0xb4, 0xcf, 0x1d, 0xd8, 0xa9, 0xbd, 0xf9, 0xb9, 0x8d, 0x6e, 0xb0, 0x45, 0x2b, 0xc5, 0x0e, 0x3e, 0xb7, 0x42, 0x61, 0xa6, 0x03, 0xfc, 0x5b, 0xea, 0x9c, 0x5e, 0xee, 0x23, 0xda, 0x36, 0xdc]), bytes([0xeb, 0xac, 0xba, 0x8a, 0x60, 0xca, 0x39, 0x24, 0x36, 0x0e, 0xf1, 0x7b, 0x2b, 0x20, 0x31, 0x70, 0x25, 0x12, 0xa2, 0x58, 0xfc, 0x19, 0xcf, 0x4a, 0x78, 0xae, 0xac, 0x78, 0x56, 0xe2, 0xf6, 0xf2]), bytes([0x09, 0x56, 0xd1, 0xda, 0x25, 0xe2, 0x12, 0xef, 0x56, 0x9e, 0x06, 0x8f, 0x41, 0xc2, 0xf2, 0xa5, 0x6a, 0xa5, 0x50, 0xe6, 0x95, 0xb7, 0x06, 0x42, 0xa0, 0x2f, 0x11, 0xac, 0x80, 0x55, 0xae, 0x06]), bytes([0x92, 0x65, 0x5f, 0x34, 0xfa, 0x71, 0x51, 0xd8, 0xfa, 0x82, 0x98, 0x66, 0x8e, 0xb6, 0x19, 0x92, 0x64, 0x0b, 0x6d, 0xb5, 0x17, 0xc8, 0x73, 0x84, 0x68, 0xe7, 0x3d, 0xc3, 0xc4, 0xe0, 0x94, 0x04]), bytes([0x93, 0x82, 0xa9, 0x2b, 0x07, 0x66, 0x79, 0xd6, 0x15, 0x25, 0x3d, 0xc2, 0xba, 0xaf, 0x63, 0xcd, 0xeb, 0x14, 0xad, 0x32, 0x8d, 0xb1, 0x78, 0x2b, 0xdb, 0x19, 0x86, 0xa7, 0x17, 0x5e, 0x0c, 0xe7]), bytes([0xf8, 0x30, 0x7f, 0x8b, 0xb9, 0xab, 0xd1, 0xa0, 0xd2, 0x50, 0x21, 0x44, 0xe9, 0xed, 0x72, 0xd8, 0xcd, 0x15, 0xa9, 0xaa, 0x02, 0xb7, 0xed, 0x0c, 0x41, 0xf1, 0xe1, 0xed, 0xe7, 0xd5, 0x25, 0x37]), bytes([0xba, 0x44, 0x15, 0x82, 0x97, 0x31, 0x73, 0xc4, 0x96, 0xc8, 0xa7, 0xff, 0x5a, 0x15, 0x8f, 0xf5, 0xfb, 0x61, 0x30, 0xa2, 0x1c, 0x38, 0x25, 0x8a, 0x32, 0x08, 0x6e, 0xa9, 0x12, 0xeb, 0x0f, 0xaa]), bytes([0x46, 0x54, 0x6b, 0x52, 0x61, 0xf4, 0x1a, 0x38, 0x3c, 0xed, 0x16, 0xb7, 0x87, 0xbd, 0x11, 0x87, 0xe6, 0x88, 0xa7, 0xc8, 0xf9, 0x90, 0x0a, 0xb9, 0x54, 0xf9, 0x5b, 0x94, 0x11, 0x50, 0x16, 0x82]), bytes([0xf3, 0x24, 0xa6, 0x2a, 0xa6, 0xd9, 0x01, 0xd0, 0x61, 0x8a, 0x66, 0xc7, 0x8e, 0x9d, 0xd5, 0xf4, 0xe9, 0x38, 0x14, 0x1b, 0x29, 0xd0, 0x2d, 0xee, 0x70, 0xf7, 0xd5, 0x39, 0x7a, 0xad, 0x8e, 0x6c]), bytes([0x98, 0x00, 0x92, 0x1d, 0x13, 0x7c, 0x04, 0x0f, 0x69, 0x07, 0x5c, 0xd6, 0x3e, 0xe6, 0x02, 0xcf, 0x8a, 0x65, 0x41, 0xcb, 0xe2, 0xb9, 0x8a, 0x2d, 0xd8, 0xc4, 0x8c, 0x0c, 0xa9, 0xf9, 0x8b, 0xe6]), bytes([0xda, 0xc9, 0xee, 0xb7, 0xd8, 0x65, 0x32, 0x9c, 0x77, 0xd9, 0x12, 0x07, 0xa2, 0x2e, 0x51, 0x1b, 0xfb, 0xcd, 0x0c, 0xae, 0x5f, 0x91, 0x2f, 0x43, 0x59, 0xe8, 0xd5, 0x94, 0x03, 0xbf, 0xde, 0x48]), bytes([0xfe, 0x0c, 0x8e, 0x73, 0x00, 0x68, 0xe9, 0x48, 0x72, 0xe2, 0xff, 0xfd, 0x5f, 0x08, 0x33, 0x09, 0x34, 0x8e, 0xe2, 0xdd, 0x01, 0xc6, 0xd3, 0x63, 0x79, 0x1f, 0x1b, 0x7a, 0x98, 0x4b, 0x65, 0xac]), bytes([0xb3, 0x8c, 0x67, 0xeb, 0xc8, 0x3b, 0x4c, 0x7f, 0x58, 0x10, 0xed, 0xe7, 0x54, 0x52, 0x43, 0x1f, 0x71, 0x4c, 0x40, 0xe5, 0x36, 0xd9, 0xf9, 0x42, 0xf0, 0x03, 0x2e, 0x68, 0x50, 0xf1, 0x8e, 0x36]), bytes([0x62, 0xbd, 0x46, 0x4a, 0xe5, 0x00, 0x05, 0x3a, 0x22, 0x13, 0x2b, 0xd1, 0xbc, 0x01, 0xa3, 0x28, 0xc6, 0xd2, 0x69, 0x8e, 0xd9, 0xe3, 0x55, 0x00, 0xc8, 0x66, 0xb9, 0x70, 0x25, 0x60, 0x7d, 0xcb]), bytes([0x8a, 0xfe, 0xdd, 0x0f, 0xd1, 0x8c, 0xa6, 0x5f, 0x77, 0x61, 0xfb, 0x0e, 0x02, 0xf3, 0x9a, 0xf4, 0x7a, 0x80, 0xfd, 0x56, 0x95, 0x20, 0x7a, 0xa3, 0x08, 0xa3, 0xdc, 0x67, 0x44, 0xff, 0xb3, 0x02]), bytes([0xad, 0x21, 0x34, 0xb7, 0x1e, 0xe5, 0x8d, 0xb8, 0x36, 0x2b, 0xe4, 0x45, 0xb8, 0xa7, 0xf4, 0x7c, 0x57, 0x5f, 0xe6, 0xf0, 0x2f, 0x52, 0x15, 0x30, 0x2c, 0x5a, 0x83, 0xbe, 0x5a, 0xee, 0x96, 0xb7]), bytes([0x4c, 0xc7, 0x0f, 0x37, 0x81, 0x03, 0x02, 0x74, 0xe8, 0x49, 0x7f, 0x4f, 0xac, 0x09, 0xb6, 0x8c, 0xee, 0xeb, 0xc0, 0x8c, 0x3a, 0x12, 0xed, 0x68, 0x66, 0xfb, 0x6d, 0x60, 0x88, 0x6f, 0x2f, 0x06]), bytes([0xaa, 0x69, 0xdf, 0x89, 0x58, 0x75, 0x1b, 0xfe, 0xc0, 0xfe, 0x8b, 0x7c, 0x62, 0x00, 0x9f, 0x9c, 0x06, 0x88, 0x9e, 0x8e, 0x4b, 0x77, 0xd0, 0x90, 0x3b, 0xbb, 0xb3, 0xff, 0x6f, 0xf8, 0xc1, 0x34]), bytes([0x09, 0xcc, 0x46, 0x3f, 0x90, 0x8e, 0x58, 0xc2, 0xba, 0x5e, 0x26, 0x36, 0xc3, 0x27, 0xda, 0xb0, 0x25, 0xac, 0xca, 0xb3, 0xde, 0x88, 0x96, 0xf2, 0xca, 0xc3, 0xd9, 0x3b, 0x78, 0x3e, 0x65, 0x5a]), bytes([0x14, 0xc1, 0xce, 0x30, 0x36, 0x5e, 0xd0, 0x22, 0x63, 0x3e, 0x10, 0xad, 0x62, 0xb8, 0x8a, 0x9d, 0xba, 0xad, 0x7f, 0xa2, 0xf6, 0x7b, 0xd0, 0x8d, 0x91, 0xf6, 0x27, 0x78, 0xa9, 0xcc, 0xe8, 0xf9]), bytes([0x13, 0xed, 0xb3, 0x3b, 0xa6, 0x85, 0x00, 0x76, 0xaa, 0x69, 0x12, 0x01, 0x96, 0x5f, 0xdb, 0xbd, 0xf2, 0xb0, 0x8a, 0xbe, 0xae, 0xb0, 0x20, 0x06, 0x8f, 0x12, 0x07, 0x9a, 0xd4, 0xa8, 0xd3, 0xce]), bytes([0xb1, 0xea, 0x7f, 0x59, 0x17, 0xf3, 0x49, 0x04, 0x4c, 0xa8, 0xf2, 0x08, 0x59, 0x23, 0xf5, 0x3b, 0xc7, 0x04, 0xd1, 0xd2, 0x34, 0x08, 0xe1, 0x65, 0x95, 0x60, 0xe0, 0x7d, 0x85, 0xff, 0x54, 0xfd]), bytes([0xa3, 0xef, 0xd2, 0x9b, 0xed, 0xe5, 0xb8, 0x0f, 0x18, 0xb5, 0x65, 0x05, 0xcc, 0xba, 0x44, 0x4e, 0x3c, 0x2d, 0x70, 0x3b, 0x8a, 0xbe, 0x63, 0x68, 0x3d, 0x3b, 0x36, 0x54, 0x49, 0x7f, 0x2a, 0xba]), bytes([0xb2, 0x8e, 0xc9, 0x68, 0x02, 0x44, 0x6d, 0xb6, 0xef, 0x88, 0x65, 0x12, 0x9d, 0x4f, 0xa4, 0x0a, 0xa3, 0x43, 0x65, 0x3b, 0xa9, 0x57, 0x44, 0x49, 0x1f, 0x9a, 0xec, 0xdb, 0xea, 0xd1, 0x4d, 0x7e]), bytes([0x7f, 0x38, 0x26, 0xbc, 0x8a, 0xb2, 0xe2, 0xfd, 0xe9, 0x9c, 0x3b, 0x62, 0x1d, 0xb1, 0x0a, 0xd7, 0xb0, 0x9e, 0xba, 0x02, 0x05, 0x98, 0x79, 0x22, 0x40, 0x61, 0xcc, 0x7d, 0x78, 0xef, 0x6a, 0x2f]), bytes([0xdb, 0x3e, 0xf9, 0x79, 0x29, 0x07, 0xd0, 0x57, 0x6e, 0x9a, 0x8b, 0x10, 0xc3, 0xdf, 0x33, 0x54, 0x8f, 0xe8, 0x21, 0xff, 0xf5, 0xf6, 0x79, 0xe9, 0x52, 0x32, 0xff, 0xe7, 0xfd, 0xb1, 0xb1, 0x25]), bytes([0xc2, 0x93, 0x57, 0x84, 0x43, 0xc7, 0x5b, 0x1f, 0xbe, 0xbc, 0x63, 0x16, 0x8e, 0xf9, 0xb4, 0x92, 0x8b, 0x19, 0x6c, 0x9c, 0x63, 0x0a, 0x51, 0x0b, 0xb4, 0x8e, 0x1f, 0xe9, 0xcd, 0xa0, 0x9e, 0xb1]), bytes([0x6c, 0x70, 0xee, 0x9a, 0xbf, 0xcf, 0x3f, 0xbf, 0xf8, 0x4f, 0x54, 0x6c, 0x54, 0xbf, 0xd1, 0x92, 0x1d, 0x3e, 0x9b, 0x17, 0x45, 0x02, 0xc7, 0x24, 0xd6, 0x0a, 0xb5, 0x26, 0x22, 0xdb, 0x0c, 0xc9]), bytes([0xd7, 0x91, 0x53, 0x3c, 0xac, 0x77, 0x93, 0xd4, 0x92, 0x08, 0xfa, 0xf0, 0x06, 0x5b, 0xe0, 0x61, 0xc5, 0x91, 0x34, 0xbf, 0xdf, 0xcd, 0x9e, 0x1a, 0xc1, 0xd5, 0x17, 0x5e, 0xcd, 0xb6, 0xa2, 0x58]), bytes([0x85, 0x22, 0xf1, 0x1d, 0xf2, 0x5b, 0x1f, 0xc7, 0xe1, 0xbb, 0x7e, 0x0b, 0xbe, 0xdb, 0xf2, 0x57, 0x24, 0x48, 0x82, 0xe2, 0x78, 0xb0, 0x4d, 0xbd, 0x3a, 0x96, 0x5a, 0x76, 0x27, 0xb2, 0xde, 0xf5]), bytes([0x11, 0x1b, 0x00, 0x77, 0x79, 0xa0, 0xfd, 0xbf, 0xf3, 0x1e, 0xbb, 0x6f, 0x3b, 0x9e, 0x7f, 0xd5, 0x47, 0x48, 0x0d, 0xbe, 0x60, 0xd4, 0x06, 0x7e, 0x09, 0xc2, 0x22, 0x57, 0x55, 0x32, 0xac, 0x80]), bytes([0x98, 0x95, 0x9f, 0x72, 0x18, 0xdb, 0x85, 0x21, 0x2c, 0x78, 0x3c, 0x34, 0xac, 0xc3, 0x93, 0xe8, 0x74, 0x8f, 0xdb, 0x14, 0x23, 0xbb, 0xf2, 0x87, 0xc2, 0x10, 0xaf, 0x77, 0xa1, 0xee, 0xef, 0xcb]), bytes([0xff, 0x6e, 0xdd, 0xfb, 0xd2, 0xb8, 0x52, 0xe8, 0x44, 0xab, 0x4a, 0x2c, 0x4b, 0x5e, 0xf7, 0x7f, 0xf4, 0x67, 0x31, 0x2c, 0x73, 0x8d, 0xe9, 0x82, 0xdc, 0x8d, 0x1e, 0xc7, 0x84, 0x12, 0x75, 0x39]), bytes([0xa0, 0x12, 0x1a, 0xc4, 0x32, 0xb7, 0xe8, 0xaf, 0x63, 0xb7, 0x22, 0x0c, 0x1c, 0xf0, 0xac, 0x4b, 0x30, 0x3d, 0x95, 0xdc, 0x70, 0xbd, 0x83, 0x08, 0x71, 0x37, 0xd3, 0x05, 0x32, 0xb5, 0x3e, 0xfb]), bytes([0x1f, 0x51, 0x4c, 0xd4, 0xc5, 0x96, 0x48, 0x65, 0xc6, 0x30, 0x3d, 0x16, 0x45, 0x05, 0x45, 0xa7, 0xe0, 0x67, 0x08, 0x09, 0x45, 0x9a, 0xd7, 0x9d, 0xe8, 0x97, 0x57, 0xd0, 0xaa, 0x86, 0x1c, 0x3c]), bytes([0x22, 0x72, 0x23, 0x0c, 0xbc, 0xb8, 0xd1, 0x0a, 0x3f, 0x68, 0x8a, 0x0f, 0xc9, 0xeb, 0x59, 0xb8, 0xa7, 0xe1, 0x10, 0xd5, 0x5f, 0x54, 0xdc, 0xff, 0x36, 0x6c, 0x2c, 0xdd, 0xdd, 0xdd, 0xee, 0x3d]), bytes([0x07, 0x21, 0x81, 0x52, 0x0a, 0xa3, 0x40, 0xce, 0xbf, 0x06, 0x41, 0x3e, 0x1b, 0x77, 0x55, 0x1d, 0xf4, 0xce, 0xe0, 0x02, 0xb0, 0x33, 0x84, 0xe4, 0xea, 0x0b, 0x9e, 0x93, 0xa8, 0xa3, 0xc7, 0x56]), bytes([0x86, 0xc4, 0x86, 0x4e, 0x3f, 0xa0, 0xc1, 0x51, 0xed, 0x05, 0x89, 0xb1, 0xf5, 0x7b, 0x38, 0x64, 0x78, 0x18, 0x0f, 0xf2, 0x11, 0xdf, 0xe5, 0xaf, 0xfb, 0xe9, 0x20, 0xe6, 0x95, 0x01, 0x2b, 0x73]), bytes([0x63, 0x7d, 0x1f, 0xbe, 0xba, 0x32, 0x58, 0x23, 0xe9, 0x18, 0x61, 0xbe, 0x7c, 0xc4, 0xb8, 0xf6, 0xdb, 0x33, 0x02, 0x57, 0xb7, 0x8a, 0x04, 0xd0, 0x73, 0x69, 0xe9, 0xe0, 0xbb, 0xe4, 0xeb, 0x9c]), bytes([0x7a, 0xff, 0x8f, 0xb7, 0xbe, 0x17, 0xce, 0xf0, 0x6b, 0x12, 0x1c, 0xd2, 0x02, 0xfd, 0xf7, 0xf0, 0x43, 0xbc, 0xc4, 0xe5, 0x77, 0x78, 0x61, 0x46, 0xe3, 0x93, 0x01, 0x8d, 0x63, 0x3c, 0x96, 0x74]), bytes([0xe8, 0x20, 0x2d, 0xfb, 0x3e, 0x3e, 0x6d, 0x2d, 0xee, 0x68, 0x82, 0x43, 0xcb, 0x96, 0x88, 0x8f, 0xff, 0x24, 0xaf, 0x73, 0x10, 0x72, 0x4f, 0x05, 0x00, 0x1a, 0xd2, 0xc7, 0x8c, 0x19, 0xd6, 0xcd]), bytes([0x0a, 0x3f, 0xdb, 0x75, 0xdb, 0x73, 0x25, 0xf8, 0xc0, 0x0a, 0x6d, 0xb3, 0x0d, 0x98, 0x83, 0xdc, 0xcd, 0x7e, 0xb2, 0x9a, 0xb0, 0x5b, 0x4e, 0xba, 0xd3, 0x23, 0x41, 0xa7, 0x71, 0x3c, 0xff, 0x74]), bytes([0xf3, 0x4d, 0x77, 0x75, 0x20, 0x27, 0xbb, 0x0b, 0xad, 0x8a, 0xe9, 0x16, 0x34, 0x85, 0xf5, 0xdd, 0x60, 0x56, 0xfd, 0x8c, 0xa3, 0x50, 0x1e, 0xc7, 0x03, 0xfc, 0x26, 0x40, 0x4d, 0xe6, 0x29, 0xfb]), bytes([0x0d, 0xd4, 0x37, 0x9b, 0x6a, 0xb2, 0xe0, 0x2a, 0x37, 0x97, 0x8e, 0xd2, 0xd7, 0x51, 0x19, 0x5f, 0xd0, 0xed, 0x9c, 0x46, 0x1f, 0x20, 0xb9, 0x52, 0x06, 0xa7, 0x09, 0x3e, 0xe0, 0xe0, 0xa0, 0x5f]), bytes([0x91, 0xf9, 0xa2, 0x6f, 0x0d, 0x55, 0x37, 0xe5, 0x7a, 0xb1, 0x57, 0x7e, 0xb1, 0x69, 0xba, 0x82, 0xae, 0xf0, 0xf8, 0x87, 0x95, 0x2f, 0x30, 0x7b, 0x80, 0xba, 0x02, 0x78, 0x69, 0x1a, 0x48, 0xa2]), bytes([0x52, 0x8c, 0x88, 0x05, 0x0d, 0x00, 0xe2, 0x52, 0x74, 0xc1, 0xd5, 0x03, 0xd5, 0xc9, 0x98, 0x3f, 0x81, 0xa0, 0x53, 0x68, 0xb4, 0xb1, 0x30, 0xa8, 0xc1, 0x20, 0x6e, 0x36, 0x6c, 0x68, 0x1d, 0x65]), bytes([0x4f, 0xb3, 0x34, 0x1a, 0x96, 0x3d, 0x82, 0x2f, 0x5a, 0xf6, 0x37, 0xf7, 0xa4, 0x13, 0x15, 0x35, 0xef, 0x1f, 0x74, 0xa2, 0x9b, 0xee, 0x9d, 0xbc, 0xa0, 0xab, 0x55, 0x89, 0x90, 0x97, 0xe7, 0xc1]), bytes([0x04, 0x3e, 0xf5, 0x05, 0xe2, 0x33, 0xa1, 0x09, 0xb4, 0x7c, 0xa6, 0xec, 0x12, 0x45, 0x40, 0xbc, 0xc0, 0x4b, 0xe5, 0xf0, 0x28, 0xc9, 0x89, 0x8e, 0x23, 0x27, 0x83, 0x70, 0xa9, 0x96, 0x68, 0xb2]), bytes([0xa0, 0x7b, 0x38, 0x05, 0xc7, 0x78, 0xad, 0x99, 0x2f, 0xf2, 0xde, 0x69, 0xc5, 0xf9, 0x91, 0x0e, 0xfa, 0x0e, 0x56, 0x8b, 0xc7, 0xfa, 0x2d, 0xd1, 0x51, 0xa1, 0x06, 0xd4, 0x71, 0xb6, 0x63, 0x76]), bytes([0x04, 0x97, 0x1b, 0x9e, 0x9a, 0x5f, 0x0a, 0x41, 0x1e, 0x8d, 0x10, 0x6a, 0x16, 0x5a, 0x85, 0xf5, 0x04, 0x74, 0x43, 0xbd, 0xb1, 0xfb, 0xca, 0x78, 0xe9, 0x52, 0xe6, 0xa5, 0x4f, 0x4b, 0xe6, 0x5d]), bytes([0xe7, 0xbf, 0xc3, 0xb2, 0x59, 0xe5, 0x08, 0x0f, 0x02, 0xd4, 0x91, 0xaa, 0xc3, 0x3b, 0x7d, 0x82, 0x2b, 0x48, 0x6b, 0xfc, 0x35, 0x86, 0x4f, 0xc9, 0xa2, 0x3e, 0x22, 0x59, 0x15, 0x3e, 0xa9, 0xf6]), bytes([0x4b, 0x8d, 0x20, 0x36, 0xa9, 0x9c, 0x4d, 0x25, 0x4a, 0xb3, 0x7f, 0x92, 0x7c, 0xdb, 0x9f, 0xbb, 0x84, 0xae, 0x13, 0x11, 0x45, 0xeb, 0xd1, 0x8f, 0xe7, 0x18, 0x44, 0xa7, 0x5d, 0xa4, 0x50, 0xc9])],
         [bytes([0xd4, 0x44, 0xb8, 0xce, 0x60, 0xaa, 0x14, 0x08, 0x50, 0x28, 0xb4, 0x5b, 0x13, 0x73, 0xec, 0x28, 0x9b, 0x04, 0xa7, 0x1f, 0x9a, 0x0c, 0x5a, 0x91, 0xc8, 0x4f, 0x1f, 0x69, 0x6f, 0xfd, 0x36, 0x17]), bytes([0x33, 0x5a, 0xcb, 0x93, 0x65, 0xe1, 0x10, 0x67, 0x7b, 0x1e, 0x6a, 0x15, 0x7a, 0x20, 0x6f, 0x5c, 0xf4, 0xf4, 0xad, 0xd7, 0x6e, 0xb6, 0x01, 0xaa, 0x26, 0xdd, 0x4f, 0x22, 0xc3, 0xb0, 0xe0, 0xa0]), bytes([0xde, 0x22, 0xc4, 0x9f, 0x36, 0x6b, 0x5d, 0xa8, 0x7a, 0xc8, 0xaf, 0x50, 0x5a, 0x88, 0x50, 0xb2, 0xd2, 0x37, 0xd4, 0x36, 0xb1, 0xae, 0x94, 0x02, 0x39, 0xf5, 0x13, 0x24, 0xab, 0x20, 0xd0, 0x96]), bytes([0x74, 0x9b, 0x55, 0xba, 0x3b, 0x18, 0x00, 0x7e, 0xe9, 0x8b, 0x3d, 0xef, 0x10, 0xb1, 0x6f, 0x36, 0x78, 0x08, 0xb1, 0xd7, 0xd9, 0xa0, 0xda, 0x2d, 0x25, 0xff, 0xff, 0xb2, 0x59, 0x6b, 0x45, 0xa9]), bytes([0x21, 0xd2, 0x47, 0x54, 0x1a, 0x29, 0xf5, 0x92, 0x00, 0x8e, 0x65, 0x25, 0xbf, 0x2b, 0xae, 0x92, 0x97, 0x11, 0x15, 0xf8, 0xc1, 0xf7, 0x17, 0x56, 0xd4, 0x62, 0x05, 0x15, 0x35, 0xe8, 0x09, 0xc7])])
+
+
+def test_SPHINCS_executor():
+    sphincs = SPHINCS(n=256, m=512, h=8, d=2, w=4, tau=8, k=64)
+    M = os.urandom(256)
+    sk, pk = sphincs.keygen()
+    sig = sphincs.sign(M, sk)
+    for executor in [ThreadPoolExecutor(2), ProcessPoolExecutor(2)]:
+        with executor:
+            assert sphincs.sign(M, sk, executor) == sig
+
+
+def test_SPHINCS_shared_by_threads():
+    sphincs = SPHINCS(n=256, m=512, h=4, d=2, w=16, tau=8, k=64)
+    registry = Registry()
+    Metrics(sphincs, registry).attach()
+    sk, pk = sphincs.keygen()
+    messages = [os.urandom(32) for _ in range(8)]
+    with ThreadPoolExecutor(4) as executor:
+        sigs = list(executor.map(lambda M: sphincs.sign(M, sk, executor),
+                                 messages[:2]))
+        sigs += list(executor.map(lambda M: sphincs.sign(M, sk), messages[2:]))
+        assert all(executor.map(lambda M, sig: sphincs.verify(M, sig, pk),
+                                messages, sigs))
+    assert sigs == [sphincs.sign(M, sk) for M in messages]
+    exposition = registry.exposition()
+    assert 'sphincs_operations_total{op="sign"} 16' in exposition
+    assert 'sphincs_operations_total{op="verify"} 8' in exposition
+    assert 'sphincs_operations_in_flight{op="sign"} 0' in exposition
@@ -0,0 +1,24 @@
+import addresses
+from SPHINCS import SPHINCS
+
+
+def test_fields():
+    a = addresses.pack(level=3, subtree=231, leaf=7)
+    assert addresses.to_bytes(a) == SPHINCS.address(3, 231, 7)
+    assert addresses.level(a) == 3
+    assert addresses.subtree(a) == 231
+    assert addresses.leaf(a) == 7
+    b = addresses.with_leaf(addresses.with_level(a, 9), 2)
+    assert b == addresses.pack(level=9, subtree=231, leaf=2)
+
+
+def test_parent():
+    a = addresses.pack(level=0, subtree=(5 << 5) | 17, leaf=3)
+    assert addresses.parent(a, 5) == addresses.pack(1, 5, 17)
+
+
+def test_leaf_addresses():
+    a = addresses.pack(level=1, subtree=42, leaf=13)
+    A = addresses.leaf_addresses(a, 5)
+    assert len(A) == 32 * addresses.ADDRESS_BYTES
+    assert addresses.split(A) == [SPHINCS.address(1, 42, i) for i in range(32)]
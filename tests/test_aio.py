@@ -0,0 +1,106 @@
+import os
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from SPHINCS import SPHINCS
+from aio import AsyncSPHINCS
+
+PARAMS = dict(n=256, m=512, h=4, d=2, w=16, tau=8, k=64)
+
+
+def test_async_sphincs():
+    sphincs = SPHINCS(**PARAMS)
+    M = os.urandom(100)
+
+    async def main(executor):
+        aio = AsyncSPHINCS(sphincs, executor, limit=2)
+        sk, pk = await aio.async_keygen()
+        sig = await aio.async_sign(M, sk)
+        assert sphincs.verify(M, sig, pk)
+        results = await asyncio.gather(
+            *[aio.async_verify(M if i % 2 else M + b'!', sig, pk)
+              for i in range(20)])
+        assert results == [bool(i % 2) for i in range(20)]
+
+    with ThreadPoolExecutor(4) as executor:
+        asyncio.run(main(executor))
+    with ProcessPoolExecutor(2) as executor:
+        asyncio.run(main(executor))
+
+
+def test_async_limit_and_timeout():
+    lock = threading.Lock()
+    running = [0, 0]
+    started = []
+
+    def work(t):
+        with lock:
+            started.append(t)
+            running[0] += 1
+            running[1] = max(running)
+        time.sleep(t)
+        with lock:
+            running[0] -= 1
+        return t
+
+    async def main(executor):
+        aio = AsyncSPHINCS(SPHINCS(**PARAMS), executor, limit=2)
+        assert await asyncio.gather(
+            *[aio.run(work, 0.01) for _ in range(10)]) == [0.01] * 10
+        try:
+            await aio.run(work, 0.5, timeout=0.05)
+            assert False
+        except asyncio.TimeoutError:
+            pass
+        # calls still waiting for a slot are never started when cancelled
+        await asyncio.sleep(0.5)
+        calls = [asyncio.ensure_future(aio.run(work, t))
+                 for t in [0.2, 0.2, 0.3]]
+        await asyncio.sleep(0.05)
+        calls[2].cancel()
+        results = await asyncio.gather(*calls, return_exceptions=True)
+        assert results[:2] == [0.2, 0.2]
+        assert 0.3 not in started
+
+    with ThreadPoolExecutor(4) as executor:
+        asyncio.run(main(executor))
+    assert running[1] == 2
+
+
+def test_async_limit_outside_loop():
+    # built before any loop runs, and used from two loops in turn
+    with ThreadPoolExecutor(4) as executor:
+        aio = AsyncSPHINCS(SPHINCS(**PARAMS), executor, limit=1)
+
+        async def main():
+            return await asyncio.gather(
+                *[aio.run(time.sleep, 0.01) for _ in range(4)])
+        assert asyncio.run(main()) == [None] * 4
+        assert asyncio.run(main()) == [None] * 4
+
+
+def test_async_sign_timeout():
+    sphincs = SPHINCS(**PARAMS)
+    sk, pk = sphincs.keygen()
+    calls = []
+    subtree = sphincs.horst_subtree
+
+    def horst_subtree(chunk, Q):
+        calls.append(chunk)
+        time.sleep(0.01)
+        return subtree(chunk, Q)
+    sphincs.horst_subtree = horst_subtree
+
+    async def main(executor):
+        aio = AsyncSPHINCS(sphincs, executor)
+        try:
+            await aio.async_sign(b'', sk, timeout=0.1)
+            assert False
+        except asyncio.TimeoutError:
+            pass
+
+    with ThreadPoolExecutor(1) as executor:
+        asyncio.run(main(executor))
+    # the worker abandoned the signature instead of finishing it
+    assert len(calls) < 1 << sphincs.horst.x
@@ -0,0 +1,104 @@
+import os
+import tempfile
+from SPHINCS import SPHINCS
+import archive as archive_module
+from archive import Archive, digest, SHARED, MAX_RUNS
+
+PARAMS = dict(n=256, m=512, h=4, d=2, w=16, tau=8, k=64)
+
+
+def test_archive():
+    sphincs = SPHINCS(**PARAMS)
+    sk, pk = sphincs.keygen()
+    messages = [os.urandom(32) for _ in range(6)]
+    sigs = [sphincs.pack(sphincs.sign(M, sk)) for M in messages]
+    path = os.path.join(tempfile.mkdtemp(), 'sigs')
+    with Archive(path, PARAMS, writable=True) as archive:
+        assert len(archive) == 0 and archive.get(messages[0]) is None
+        for M, sig in zip(messages[:4], sigs[:4]):
+            archive.add(M, sig)
+        assert archive.get(messages[1]) == sigs[1]
+        archive.add(messages[4], sigs[4])
+        assert archive.get(messages[4]) == sigs[4]
+        # the top layer comes from one of only 2^(h/d) = 4 leaves
+        stats = archive.stats()
+        assert stats['signatures'] == 5
+        assert stats['stored_bytes'] < stats['raw_bytes']
+    with open(path, 'ab') as f:
+        f.write(b'torn')
+    with open(path + '.index', 'ab') as f:
+        f.write(b'torn')
+
+    with Archive(path) as archive:
+        assert len(archive) == 5 and messages[5] not in archive
+        assert all(archive.get(M) == sig
+                   for M, sig in zip(messages[:5], sigs[:5]))
+        assert archive.verify(messages[0], pk)
+        assert not archive.verify(messages[0] + b'!', pk)
+        try:
+            archive.add(messages[5], sigs[5])
+            assert False
+        except ValueError:
+            pass
+
+    with Archive(path, writable=True) as archive:
+        assert len(archive) == 5
+        archive.add(messages[5], sigs[5])
+        archive.add(messages[0], sigs[1])
+        known = {digest(M): M for M in messages[1:]}
+        results = list(archive.verify_all(pk, known.get))
+        # every message once, in digest order
+        assert [key for key, _ in results] == \
+            sorted(digest(M) for M in messages)
+        assert dict(results) == dict([(digest(messages[0]), 'missing')] +
+                                     [(key, 'valid') for key in known])
+        # a later signature on the same message replaces the earlier one
+        assert archive.get(messages[0]) == sigs[1]
+        assert not archive.verify(messages[0], pk)
+        assert len(archive) == 6
+
+
+def test_archive_runs():
+    path = os.path.join(tempfile.mkdtemp(), 'sigs')
+    messages = [os.urandom(32) for _ in range(8)]
+    with Archive(path, PARAMS, writable=True) as archive:
+        length = sum(archive.sizes)
+        # only the layers are deduplicated
+        assert archive.deduplicated == {2, 3}
+    sigs = [os.urandom(length) for _ in range(12)]
+    latest = {}
+    # only the components that may be shared are hashed
+    hashed = []
+    archive_module.digest = lambda data: hashed.append(len(data)) or \
+        digest(data)
+    try:
+        with Archive(path + '-hashed', PARAMS, writable=True) as archive:
+            archive.add_digest(bytes(32), sigs[0])
+    finally:
+        archive_module.digest = digest
+    assert sorted(hashed) == sorted(archive.sizes[i]
+                                    for i in archive.deduplicated)
+    try:
+        archive_module.MAX_RUNS = 2
+        for run in range(4):
+            with Archive(path, writable=True) as archive:
+                for j in range(3):
+                    M, sig = messages[(3 * run + j) % 8], sigs[3 * run + j]
+                    archive.add(M, sig)
+                    latest[M] = sig
+            assert len(archive.runs) == [1, 2, 1, 2][run]
+    finally:
+        archive_module.MAX_RUNS = MAX_RUNS
+    with Archive(path) as archive:
+        assert len(archive) == 8
+        assert list(archive.digests()) == sorted(map(digest, messages))
+        assert all(archive.get(M) == sig for M, sig in latest.items())
+    with open(path + '.shared', 'rb') as f:
+        assert len(f.read()) == 2 * 12 * SHARED.size
+
+    os.truncate(path, os.path.getsize(path) - 1)
+    try:
+        Archive(path)
+        assert False
+    except ValueError as e:
+        assert 'truncated' in str(e)
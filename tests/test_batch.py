@@ -0,0 +1,84 @@
+import os
+import tempfile
+from SPHINCS import SPHINCS
+import batch
+import archive
+
+PARAMS = dict(n=256, m=512, h=4, d=2, w=16, tau=8, k=64)
+
+
+def test_batch():
+    sphincs = SPHINCS(**PARAMS)
+    sk, pk = sphincs.keygen()
+    root = tempfile.mkdtemp()
+    os.makedirs(os.path.join(root, 'sub'))
+    names = ['a.bin', 'b.bin', os.path.join('sub', 'c.bin')]
+    for name in names:
+        with open(os.path.join(root, name), 'wb') as f:
+            f.write(os.urandom(100))
+    with open(os.path.join(root, 'MANIFEST'), 'w') as f:
+        f.write('# artifacts\n%s\n\n%s\n' % (names[0], names[2]))
+
+    # the manifest, and the files of an archive, are not part of the batch
+    archive.Archive(os.path.join(root, 'sub', 'sigs'), PARAMS,
+                    writable=True).close()
+    _, paths = batch.collect(directory=root)
+    assert paths == [os.path.join(root, n) for n in names]
+    _, paths = batch.collect(manifest=os.path.join(root, 'MANIFEST'))
+    assert paths == [os.path.join(root, names[0]),
+                     os.path.join(root, names[2])]
+
+    _, paths = batch.collect(directory=root)
+    report = batch.run('sign', paths, root, sphincs.pack(sk), PARAMS,
+                       workers=2, cache_levels=1)
+    assert report['ok'] == 3 and report['failed'] == 0
+    for path in paths:
+        with open(path, 'rb') as f, open(path + '.sig', 'rb') as g:
+            assert sphincs.verify(f.read(), sphincs.unpack(sig=g.read()), pk)
+    # the signatures are skipped when collecting a directory
+    assert batch.collect(directory=root)[1] == paths
+
+    with open(os.path.join(root, 'b.bin'), 'ab') as f:
+        f.write(b'!')
+    os.remove(os.path.join(root, 'a.bin.sig'))
+    report = batch.run('verify', paths, root, sphincs.pack(pk), PARAMS)
+    status = {os.path.relpath(f['path'], root): f['status']
+              for f in report['files']}
+    assert status == {'a.bin': 'missing', 'b.bin': 'invalid',
+                      names[2]: 'valid'}
+    assert report['ok'] == 1 and report['failed'] == 2
+
+    out = tempfile.mkdtemp()
+    paths = paths + [os.path.join(root, 'gone.bin')]
+    report = batch.run('sign', paths, root, sphincs.pack(sk), PARAMS, out=out)
+    assert report['files'][-1]['status'].startswith('error')
+    assert os.path.exists(os.path.join(out, 'sub', 'c.bin.sig'))
+    report = batch.run('verify', paths[:-1], root, sphincs.pack(pk), PARAMS,
+                       out=out)
+    assert report['ok'] == 3
+
+
+def test_timed():
+    # any error is reported for its file rather than aborting the batch
+    status, size, _ = batch.timed(lambda path, sig_path: 1 / 0, 'a', 'b')
+    assert status == 'error: ZeroDivisionError: division by zero'
+    assert size == 0
+
+
+def test_batch_archive():
+    sphincs = SPHINCS(**PARAMS)
+    sk, pk = sphincs.keygen()
+    root = tempfile.mkdtemp()
+    for name in ['a', 'b', 'c']:
+        with open(os.path.join(root, name), 'wb') as f:
+            f.write(name.encode())
+    _, paths = batch.collect(directory=root)
+    archive = os.path.join(tempfile.mkdtemp(), 'sigs')
+    report = batch.run('sign', paths[:2], root, sphincs.pack(sk), PARAMS,
+                       workers=2, archive=archive)
+    assert report['ok'] == 2
+    assert not os.path.exists(paths[0] + '.sig')
+    report = batch.run('verify', paths, root, sphincs.pack(pk), PARAMS,
+                       workers=2, archive=archive)
+    assert [f['status'] for f in report['files']] == \
+        ['valid', 'valid', 'missing']
@@ -0,0 +1,96 @@
+import io
+from benchmarks.timing import measure, summarize
+from benchmarks import micro, scaling, loadgen, compare, memory, transport
+
+
+def test_summarize():
+    stats = summarize([2.0, 1.0, 4.0])
+    assert stats['median'] == 2.0
+    assert stats['min'] == 1.0 and stats['max'] == 4.0
+    assert stats['ops_per_sec'] == 0.5
+
+
+def test_measure():
+    calls = []
+    stats = measure(lambda: calls.append(1), repeat=3, warmup=2,
+                    min_time=0.001)
+    assert len(stats['samples']) == 3
+    assert len(calls) == 2 + 1 + 3 * stats['number']
+
+
+def test_micro():
+    report = micro.run(params='small', repeat=1, min_time=0, only='chacha.')
+    assert report['version'] == micro.FORMAT_VERSION
+    assert 'chacha.permuted' in report['results']
+    assert all(name.startswith('chacha.') for name in report['results'])
+
+
+def test_scaling():
+    report = scaling.run(params='small', ops=1, workers=(1,),
+                         modes=['processes', 'intra-threads'])
+    runs = [(r['mode'], r['op']) for r in report['results']]
+    assert runs == [('processes', 'sign'), ('processes', 'verify'),
+                    ('intra-threads', 'sign')]
+    assert all(r['efficiency'] == 1.0 for r in report['results'])
+    assert 'sign.horst' in report['results'][0]['phases']
+    assert report['results'][2]['phases']['sign']['count'] == 1
+    assert report['free_threaded'] in (True, False)
+    # the efficiency is always relative to a run with one worker
+    report = scaling.run(params='small', ops=1, workers=(2,),
+                         modes=['threads'])
+    assert [r['workers'] for r in report['results']] == [1, 2, 1, 2]
+    assert [r['efficiency'] for r in report['results']][::2] == [1.0, 1.0]
+
+
+def test_loadgen():
+    trace = loadgen.synthetic(rate=20, duration=1, verify_ratio=1,
+                              sizes=(32, 64), keys=2, seed=1)
+    assert trace == loadgen.synthetic(rate=20, duration=1, verify_ratio=1,
+                                      sizes=(32, 64), keys=2, seed=1)
+    assert all(r['op'] == 'verify' and r['t'] < 1 for r in trace)
+    f = io.StringIO()
+    loadgen.save(trace, f)
+    f.seek(0)
+    assert loadgen.load(f) == trace
+    trace = trace[:3] + [{'t': 0.05, 'op': 'sign', 'size': 32, 'key': 'k'}]
+    report = loadgen.replay(trace, params='small', target='threads')
+    assert report['ops']['verify']['count'] == 3
+    assert report['ops']['sign']['count'] == 1
+    assert report['ops']['sign']['queueing']['max'] >= 0
+
+
+def test_t_quantile():
+    assert abs(compare.t_quantile(0.975, 4) - 2.776) < 0.02
+    assert abs(compare.t_quantile(0.975, 1000) - 1.962) < 0.01
+
+
+def test_compare():
+    base = {'results': {'F': {'samples': [1.0, 1.1, 0.9, 1.0, 1.0]},
+                        'H': {'samples': [2.0, 2.1, 1.9, 2.0, 1.95]},
+                        'sign': {'samples': [5.0, 6.0, 4.0, 5.5, 4.5]}}}
+    current = {'results': {'F': {'samples': [1.5, 1.6, 1.4, 1.5, 1.5]},
+                           'H': {'samples': [1.0, 1.1, 0.9, 1.0, 0.95]},
+                           'sign': {'samples': [5.5, 6.5, 4.5, 6.0, 5.0]}}}
+    rows = compare.compare(compare.pooled([base]), compare.pooled([current]))
+    assert [(r['name'], r['flag']) for r in rows] == [
+        ('F', 'slower'), ('H', 'faster'), ('sign', '')]
+    assert abs(rows[0]['change'] - 50) < 1e-6
+    single = {'results': {'F': {'samples': [1.5]}}}
+    rows = compare.compare(compare.pooled([base]), compare.pooled([single]))
+    assert rows[0]['flag'] == 'too few samples'
+    assert compare.too_few(compare.pooled([single])) == ['F']
+
+
+def test_memory():
+    phases = memory.run(params='small', top=0)['phases']
+    for level in range(2):
+        assert 'sign.wots_path/%d' % level in phases
+        assert 'verify.wots/%d' % level in phases
+    assert phases['sign']['peak'] >= phases['sign.horst']['peak'] > 0
+    assert phases['keygen']['count'] == 1
+
+
+def test_transport():
+    results = transport.run(sizes=(32, 41000), repeat=1)['results']
+    assert sorted(results) == ['pickle.32', 'pickle.41000',
+                               'ring.32', 'ring.41000']
@@ -0,0 +1,44 @@
+import os
+import bytes_utils
+from bytes_utils import (xor, xor_each, ints_from_4bytes, words_to_bytes,
+                         words_from_blocks, words_to_blocks)
+
+
+def paths():
+    """Runs the body of the loop with NumPy (if installed) and without"""
+    installed = bytes_utils.numpy
+    try:
+        for numpy in [installed, None] if installed else [None]:
+            bytes_utils.numpy = numpy
+            yield numpy
+    finally:
+        bytes_utils.numpy = installed
+
+
+def test_xor():
+    assert xor(bytes([0x0f, 0xf0]), bytes([0xff, 0xff])) == bytes([0xf0, 0x0f])
+    assert xor(bytes(32), bytes(32)) == bytes(32)
+
+
+def test_batch_xor():
+    for _ in paths():
+        for count in [3, bytes_utils.BATCH_MIN]:
+            blocks = [os.urandom(32) for _ in range(count)]
+            mask = os.urandom(32)
+            assert xor_each(blocks, mask) == [xor(b, mask) for b in blocks]
+
+
+def test_words():
+    a = os.urandom(64)
+    assert words_to_bytes(ints_from_4bytes(a)) == a
+    assert ints_from_4bytes(bytes([1, 0, 0, 0, 0, 0, 0, 0x80])) == (1, 1 << 31)
+
+
+def test_batch_words():
+    for _ in paths():
+        for count in [3, bytes_utils.BATCH_MIN]:
+            blocks = [os.urandom(32) for _ in range(count)]
+            words = words_from_blocks(blocks)
+            assert words == [list(ints_from_4bytes(b)) for b in blocks]
+            assert all(type(w) is int for w in words[-1])
+            assert words_to_blocks(words) == blocks
@@ -0,0 +1,56 @@
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+import addresses
+from SPHINCS import SPHINCS
+from cache import LeafCache
+from metrics import Registry, Metrics
+
+PARAMS = dict(n=256, m=512, h=8, d=4, w=16, tau=8, k=64)
+
+
+def leaves(cache, a, SK1, Q):
+    return [bytes(leaf) for leaf in cache.leaves(a, SK1, Q)]
+
+
+def test_leaf_cache():
+    sphincs = SPHINCS(**PARAMS)
+    (SK1, SK2, Q), pk = sk, pk = sphincs.keygen()
+    M = os.urandom(100)
+    sig = sphincs.sign(M, sk)
+    cache = LeafCache.build(sphincs, SK1, Q, 2)
+    assert len(cache.buffer) == LeafCache.size(sphincs, 2, len(Q))
+    assert cache.masks() == Q
+    top = addresses.pack(3, 0, 1)
+    assert cache.leaves(top, SK1, Q) == sphincs.wots_leaves(top, SK1, Q, 2)
+    a = addresses.pack(2, 3, 0)
+    assert cache.leaves(a, SK1, Q) == sphincs.wots_leaves(a, SK1, Q, 2)
+    assert cache.leaves(addresses.pack(1, 0, 0), SK1, Q) is None
+    assert cache.leaves(top, SK2, Q) is None
+
+    registry = Registry()
+    Metrics(sphincs, registry).attach()
+    sphincs.leaf_cache = pickle.loads(pickle.dumps(cache))
+    assert sphincs.sign(M, sk) == sig
+    exposition = registry.exposition()
+    assert 'sphincs_cache_hits_total{cache="leaves"} 2' in exposition
+    assert 'sphincs_cache_misses_total{cache="leaves"} 2' in exposition
+    assert 'sphincs_cache_hit_ratio{cache="leaves"} 0.5' in exposition
+
+
+def test_shared_leaf_cache():
+    sphincs = SPHINCS(**PARAMS)
+    SK1, _, Q = sphincs.keygen()[0]
+    with ProcessPoolExecutor(2) as executor:
+        cache = LeafCache.build(sphincs, SK1, Q, 2, shared=True,
+                                executor=executor)
+        try:
+            expected = LeafCache.build(sphincs, SK1, Q, 2)
+            assert bytes(cache.buffer) == bytes(expected.buffer)
+            a = addresses.pack(2, 1, 0)
+            # the workers attach to the segment by name
+            assert executor.submit(leaves, cache, a, SK1, Q).result() == \
+                expected.leaves(a, SK1, Q)
+        finally:
+            cache.close()
+            cache.unlink()
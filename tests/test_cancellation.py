@@ -0,0 +1,83 @@
+import os
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from SPHINCS import SPHINCS
+from cancellation import Token, Cancelled, DeadlineExceeded
+
+PARAMS = dict(n=256, m=512, h=4, d=2, w=16, tau=8, k=64)
+
+
+def raises(exception, fn, *args, **kwargs):
+    try:
+        fn(*args, **kwargs)
+    except exception:
+        return True
+    return False
+
+
+def test_token():
+    token = Token()
+    token.check()
+    assert token.remaining() is None
+    token.cancel()
+    assert raises(Cancelled, token.check)
+    token = Token(timeout=0)
+    assert raises(DeadlineExceeded, token.check)
+    token = Token(timeout=60)
+    assert 59 < token.remaining() <= 60
+    token.cancel()
+    copy = pickle.loads(pickle.dumps(token))
+    assert copy.deadline == token.deadline and not copy.cancelled
+
+
+def test_sign_cancellation():
+    sphincs = SPHINCS(**PARAMS)
+    sk, pk = sphincs.keygen()
+    M = os.urandom(100)
+    assert sphincs.verify(M, sphincs.sign(M, sk, token=Token(60)), pk)
+    assert raises(DeadlineExceeded, sphincs.keygen, token=Token(0))
+    assert raises(DeadlineExceeded, sphincs.sign, M, sk, token=Token(0))
+
+    for executor in [None, ThreadPoolExecutor(1)]:
+        token = Token()
+        calls = []
+        subtree = sphincs.horst_subtree
+
+        def horst_subtree(chunk, Q):
+            calls.append(chunk)
+            token.cancel()
+            return subtree(chunk, Q)
+        sphincs.horst_subtree = horst_subtree
+        # the remaining subtrees are abandoned
+        assert raises(Cancelled, sphincs.sign, M, sk, executor, token)
+        if executor is None:
+            assert len(calls) == 1
+        else:
+            assert len(calls) < 1 << sphincs.horst.x
+        del sphincs.horst_subtree
+        if executor is not None:
+            executor.shutdown()
+
+    # cancelling between the layers stops the remaining layers
+    token = Token()
+    parts = sphincs.sign_parts(M, sk, token=token)
+    for _ in range(5):
+        next(parts)
+    token.cancel()
+    assert raises(Cancelled, next, parts)
+
+
+def test_keygen_cancellation():
+    sphincs = SPHINCS(**PARAMS)
+    token = Token()
+    leafs = []
+    wots_leaf = sphincs.wots_leaf
+
+    def leaf(*args):
+        leafs.append(args)
+        if len(leafs) == 2:
+            token.cancel()
+        return wots_leaf(*args)
+    sphincs.wots_leaf = leaf
+    assert raises(Cancelled, sphincs.keygen, token=token)
+    assert len(leafs) == 2
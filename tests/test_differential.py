@@ -0,0 +1,22 @@
+import random
+import differential
+from differential import first_difference
+
+
+def test_first_difference():
+    assert first_difference([b'a', [b'b', b'c']], (b'a', (b'b', b'c'))) is None
+    assert first_difference([b'a', [b'b', b'c']], [b'a', [b'b', b'd']]) == \
+        ('[1][1]', b'c', b'd')
+    assert first_difference([1, 2], [1]) == (' (length)', 2, 1)
+
+
+def test_differential():
+    assert differential.run(iterations=1) == []
+
+
+def test_differential_detects():
+    rng = random.Random(0)
+    values = list(differential.check_trees(rng))
+    name, ref, alt = values[0]
+    path, _, _ = first_difference(ref, (ref[0], bytes(32)), name)
+    assert path == 'treehash[1]'
@@ -0,0 +1,37 @@
+import os
+from collections import Counter
+from SPHINCS import SPHINCS
+from instrument import HashCounter
+
+
+def test_counts():
+    sphincs = SPHINCS(n=256, m=512, h=4, d=2, w=16, tau=8, k=64)
+    F = sphincs.F
+    M = os.urandom(256)
+    leafs = 1 << (sphincs.h // sphincs.d)
+    chains = sphincs.wots.l * (sphincs.w - 1)
+    wots_leafs = Counter({'Glambda': leafs,
+                          'keystream_bytes': leafs * sphincs.wots.l * 32,
+                          'F': leafs * chains,
+                          'H': leafs * (sphincs.wots.l - 1) + leafs - 1})
+    with HashCounter(sphincs) as counter:
+        sk, pk = sphincs.keygen()
+        sig = sphincs.sign(M, sk)
+        assert sphincs.verify(M, sig, pk)
+    assert sphincs.F is F and sphincs.observers == []
+    counts = counter.counts
+    assert counts['keygen.pub'] == wots_leafs
+    assert counts['sign'] == Counter({'Frand': 1, 'Hdigest': 1})
+    assert counts['sign.horst'] == Counter({
+        'Glambda': 1, 'keystream_bytes': sphincs.t * 32,
+        'F': sphincs.t, 'H': sphincs.t - 1})
+    x = sphincs.horst.x
+    assert counts['verify.horst'] == Counter({
+        'F': sphincs.k, 'H': sphincs.k * (sphincs.tau - x) + (1 << x) - 1})
+    for level in range(sphincs.d):
+        assert counts['sign.wots_path/%d' % level] == wots_leafs
+        assert (counts['sign.wots/%d' % level]['F'] +
+                counts['verify.wots/%d' % level]['F']) == chains
+    assert counts['seed'] == Counter({'Fa': 1 + (sphincs.d + 1) * leafs +
+                                            sphincs.d})
+    assert counter.total()['Hdigest'] == 2
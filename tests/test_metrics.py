@@ -0,0 +1,61 @@
+import os
+from SPHINCS import SPHINCS
+from metrics import Registry, Metrics
+from cancellation import Token, Cancelled
+
+
+def test_registry():
+    registry = Registry()
+    registry.counter('requests_total', 'Requests.', op='sign').inc(2)
+    registry.counter('requests_total', 'Requests.', op='sign').inc()
+    registry.gauge('queue_depth', 'Queue depth.').set(4)
+    registry.summary('latency_seconds', 'Latency.').observe(0.5)
+    text = registry.exposition()
+    assert '# TYPE requests_total counter' in text
+    assert 'requests_total{op="sign"} 3\n' in text
+    assert 'queue_depth 4\n' in text
+    assert 'latency_seconds{quantile="0.99"} 0.5\n' in text
+    assert 'latency_seconds_count 1\n' in text
+
+
+def test_metrics():
+    sphincs = SPHINCS(n=256, m=512, h=4, d=2, w=16, tau=8, k=64)
+    registry = Registry()
+    metrics = Metrics(sphincs, registry).attach()
+    M = os.urandom(32)
+    sk, pk = sphincs.keygen()
+    sig = sphincs.sign(M, sk)
+    assert sphincs.verify(M, sig, pk)
+    assert sphincs.verify(M, sig, pk)
+    metrics.cache('subtrees', True)
+    metrics.cache('subtrees', False)
+    text = registry.exposition()
+    assert 'sphincs_operations_total{op="verify"} 2\n' in text
+    assert 'sphincs_operations_in_flight{op="sign"} 0\n' in text
+    assert ('sphincs_signature_bytes_total %d\n' %
+            len(sphincs.pack(sig))) in text
+    assert 'sphincs_cache_hit_ratio{cache="subtrees"} 0.5\n' in text
+    assert 'sphincs_operation_seconds_count{op="keygen"} 1\n' in text
+
+
+def test_failed_operations():
+    sphincs = SPHINCS(n=256, m=512, h=4, d=2, w=16, tau=8, k=64)
+    registry = Registry()
+    Metrics(sphincs, registry).attach()
+    M = os.urandom(32)
+    sk, pk = sphincs.keygen()
+    try:
+        sphincs.sign(M, sk, token=Token(0))
+        assert False
+    except Cancelled:
+        pass
+    text = registry.exposition()
+    assert 'sphincs_operations_total{op="sign"}' not in text
+    assert ('sphincs_operations_failed_total{op="sign",reason="cancelled"} 1'
+            in text)
+    assert 'sphincs_signature_bytes_total 0\n' in text
+    sig = b''.join(sphincs.sign_stream(M, sk))
+    text = registry.exposition()
+    assert 'sphincs_operations_total{op="sign"} 1\n' in text
+    assert 'sphincs_signature_bytes_total %d\n' % len(sig) in text
+    assert 'sphincs_operations_in_flight{op="sign"} 0\n' in text
@@ -0,0 +1,66 @@
+import os
+import time
+import signal
+from concurrent.futures.process import BrokenProcessPool
+from pool import AdaptivePool, SizingPolicy, Overloaded
+
+warmed = []
+
+
+def warmup():
+    warmed.append(os.getpid())
+    time.sleep(0.05)
+
+
+def pid(t):
+    time.sleep(t)
+    return os.getpid(), len(warmed)
+
+
+def test_sizing_policy():
+    policy = SizingPolicy(min_workers=1, max_workers=4, cpus=4)
+    assert policy.size(busy=0, queued=0) == 1
+    assert policy.size(busy=1, queued=1) == 2
+    assert policy.size(busy=2, queued=10) == 4
+    # no new workers for CPUs that other processes keep busy
+    assert policy.size(busy=1, queued=10, load=2.5) == 1
+    assert policy.size(busy=3, queued=10, load=3) == 3
+    assert SizingPolicy(min_workers=2, cpus=4).size(0, 0, load=4) == 2
+
+
+def test_adaptive_pool():
+    policy = SizingPolicy(min_workers=1, max_workers=3, idle=0.3, cpus=3)
+    with AdaptivePool(policy, max_queue=4, warmup=warmup, interval=0.05,
+                      load=lambda busy: 0) as pool:
+        assert pool.size() == 1
+        futures = [pool.submit(pid, 0.3) for _ in range(4)]
+        # at most 4 calls wait; the workers are still warming up
+        try:
+            pool.submit(pid, 0)
+            assert False
+        except Overloaded:
+            pass
+        assert pool.size() == 3
+        results = [f.result() for f in futures]
+        # every worker ran the warm-up before its first call
+        assert len(set(p for p, _ in results)) == 3
+        assert all(n == 1 for _, n in results)
+        time.sleep(1)
+        assert pool.size() == 1
+        assert pool.submit(pid, 0).result()[1] == 1
+
+
+def test_dead_worker():
+    policy = SizingPolicy(min_workers=1, max_workers=1, cpus=1)
+    with AdaptivePool(policy, interval=0.05, load=lambda busy: 0) as pool:
+        worker = pool.submit(os.getpid).result()
+        os.kill(worker, signal.SIGKILL)
+        time.sleep(0.5)
+        # the call on the dead worker fails rather than hanging, and the
+        # worker is replaced
+        try:
+            pool.submit(os.getpid).result(timeout=10)
+            assert False
+        except BrokenProcessPool:
+            pass
+        assert pool.submit(os.getpid).result(timeout=30) != worker
@@ -0,0 +1,35 @@
+import io
+from profiler import Sampler, Tracer, top, write_collapsed
+
+
+def inner(n):
+    return sum(i * i for i in range(n))
+
+
+def outer():
+    return [inner(20000) for _ in range(20)]
+
+
+def test_tracer():
+    with Tracer() as tracer:
+        outer()
+    stacks = tracer.stacks
+    assert any(s.endswith('test_profiler.py:inner;~sum') and
+               s.index(':outer') < s.index(':inner') for s in stacks)
+    rows = top(stacks, 100)
+    names = [name for name, _, _ in rows]
+    assert 'test_profiler.py:inner' in names
+    total = dict((name, inclusive) for name, _, inclusive in rows)
+    assert total['test_profiler.py:inner'] <= total['test_profiler.py:outer']
+    f = io.StringIO()
+    write_collapsed(stacks, f)
+    assert all(line.rsplit(' ', 1)[1].isdigit()
+               for line in f.getvalue().splitlines())
+
+
+def test_sampler():
+    with Sampler(interval=0.0005) as sampler:
+        for _ in range(5):
+            outer()
+    assert sum(sampler.stacks.values()) > 0
+    assert any('test_profiler.py:outer' in s for s in sampler.stacks)
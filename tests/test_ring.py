@@ -0,0 +1,63 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from ring import Ring, Transport
+
+
+def work(M, n, sig=b''):
+    assert type(M) is bytes and type(sig) is bytes
+    if n is None:
+        return len(M)
+    return (M + sig) * n
+
+
+class Recording(object):
+
+    def __init__(self, executor):
+        """Wraps executor to keep the futures of the calls it runs"""
+        self.executor = executor
+        self.futures = []
+
+    def submit(self, fn, *args):
+        future = self.executor.submit(fn, *args)
+        self.futures.append(future)
+        return future
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+
+def test_ring():
+    ring = Ring(2, 64)
+    try:
+        ring.write(1, [b'abc', b'', bytearray(b'd')])
+        ring.write(0, [b'x' * 56])
+        assert ring.read(1) == [b'abc', b'', b'd']
+        assert ring.read(0) == [b'x' * 56]
+        assert not ring.fits([b'x' * 57])
+    finally:
+        ring.close()
+        ring.unlink()
+
+
+def test_transport():
+    ring = Ring(2, 4096)
+    try:
+        for executor in [ProcessPoolExecutor(2), ThreadPoolExecutor(2)]:
+            recording = Recording(executor)
+            with Transport(recording, ring) as transport:
+                M = os.urandom(1000)
+                futures = [transport.submit(work, M, 2, b'!')
+                           for _ in range(8)]
+                assert all(f.result() == (M + b'!') * 2 for f in futures)
+                # the bytes results came back through the slots
+                assert [f.result() for f in recording.futures] == \
+                    [(None, True)] * 8
+                assert transport.submit(work, M, None).result() == 1000
+                assert recording.futures[-1].result() == (1000, False)
+                # arguments that do not fit in a slot are passed as usual
+                big = os.urandom(5000)
+                assert transport.submit(work, big, None).result() == 5000
+                assert len(transport.free) == 2
+    finally:
+        ring.close()
+        ring.unlink()
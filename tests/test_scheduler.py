@@ -0,0 +1,75 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from metrics import Registry
+from scheduler import Scheduler
+
+
+def test_scheduler():
+    lock = threading.Lock()
+    order = []
+
+    def work(name, t):
+        with lock:
+            order.append(name)
+        time.sleep(t)
+        return name
+
+    registry = Registry()
+    with ThreadPoolExecutor(2) as executor:
+        scheduler = Scheduler(executor, 2, reserved={'verify': 1},
+                              registry=registry)
+        signs = [scheduler.submit('sign', work, 's%d' % i, 0.1)
+                 for i in range(5)]
+        assert scheduler.depth()['sign'] == 4
+        assert 'sphincs_scheduler_queue_depth{op="sign"} 4' \
+            in registry.exposition()
+        start = time.perf_counter()
+        verifies = [scheduler.submit('verify', work, 'v%d' % i, 0.001)
+                    for i in range(20)]
+        assert [f.result() for f in verifies] == ['v%d' % i for i in range(20)]
+        # the reserved slot serves verifies while the signs are queued
+        assert time.perf_counter() - start < 0.09
+        assert scheduler.depth()['sign'] >= 3
+        assert [f.result() for f in signs] == ['s%d' % i for i in range(5)]
+    assert order.index('s1') > order.index('v19')
+    assert 'sphincs_scheduler_wait_seconds_count{op="verify"} 20' \
+        in registry.exposition()
+
+
+def test_scheduler_weights():
+    done = []
+    with ThreadPoolExecutor(1) as executor:
+        scheduler = Scheduler(executor, 1, weights={'a': 3, 'b': 1},
+                              registry=None)
+        block = threading.Event()
+        first = scheduler.submit('a', block.wait)
+        futures = [scheduler.submit(c, done.append, c)
+                   for c in 'ab' * 8]
+        futures[0].cancel()
+        block.set()
+        first.result()
+        for f in futures[1:]:
+            f.result()
+    # the cancelled call is skipped; otherwise a gets 3 of every 4 dispatches
+    assert done[:8].count('a') == 6
+    assert done.count('a') == 7 and done.count('b') == 8
+
+
+def test_scheduler_slots():
+    slots = [1]
+    with ThreadPoolExecutor(2) as executor:
+        scheduler = Scheduler(executor, lambda: slots[0],
+                              reserved={'verify': 1}, registry=None)
+        block = threading.Event()
+        # with a single slot, it is not reserved
+        first = scheduler.submit('sign', block.wait, 10)
+        second = scheduler.submit('sign', block.wait, 10)
+        assert scheduler.queued() == 1
+        slots[0] = 2
+        scheduler.wake()
+        # the new slot is reserved for verifies
+        assert scheduler.queued() == 1
+        assert scheduler.submit('verify', int).result(timeout=10) == 0
+        block.set()
+        assert first.result() and second.result()
@@ -0,0 +1,145 @@
+import os
+import glob
+import time
+import struct
+import tempfile
+import threading
+from SPHINCS import SPHINCS
+import service
+from service import Server, Client, ServiceError
+from cache import LeafCache
+from instrument import HashCounter
+
+PARAMS = dict(n=256, m=512, h=4, d=2, w=16, tau=8, k=64)
+
+
+def test_service():
+    sphincs = SPHINCS(**PARAMS)
+    sk, pk = sphincs.keygen()
+    path = os.path.join(tempfile.mkdtemp(), 'sphincs.sock')
+    server = Server(path, PARAMS, sk=sphincs.pack(sk), workers=2,
+                    cache_levels=1, ring_slot_size=1 << 16)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        with Client(path) as client:
+            M = os.urandom(100)
+            sig = client.sign(M)
+            # the workers sign with the shared leaf cache
+            assert sig == sphincs.pack(sphincs.sign(M, sk))
+            assert client.verify(M, sig)
+            assert not client.verify(M + b'!', sig)
+            assert not client.verify(M, sig[:-1])
+            try:
+                client.request(b'X', [])
+                assert False
+            except ServiceError as e:
+                assert 'malformed' in str(e)
+            assert client.verify(M, sig)
+            assert sphincs.verify(M, sphincs.unpack(sig=client.sign(M, 60)),
+                                  pk)
+            try:
+                client.sign(M, 0)
+                assert False
+            except ServiceError as e:
+                assert 'DeadlineExceeded' in str(e)
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+    assert not os.path.exists(path)
+
+
+def test_service_adaptive():
+    sphincs = SPHINCS(**PARAMS)
+    sk, pk = sphincs.keygen()
+    path = os.path.join(tempfile.mkdtemp(), 'sphincs.sock')
+    server = Server(path, PARAMS, pk=sphincs.pack(pk), max_workers=2,
+                    max_queue=1, ring_slot_size=1 << 16)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        M = os.urandom(100)
+        sig = sphincs.pack(sphincs.sign(M, sk))
+        with Client(path) as client:
+            assert client.verify(M, sig)
+            try:
+                client.sign(M)
+                assert False
+            except ServiceError as e:
+                assert 'no secret key' in str(e)
+        with Client(path) as client:
+            # a frame that claims to be 2 GiB long is rejected unread
+            client.file.write(struct.pack('>I', 1 << 31))
+            client.file.flush()
+            status, fields = service.decode(service.read_frame(client.file))
+            assert status == service.ERROR and b'exceeds' in fields[0]
+            assert service.read_frame(client.file) is None
+        server.scheduler.max_queue = 0
+        with Client(path) as client:
+            try:
+                client.verify(M, sig)
+                assert False
+            except ServiceError as e:
+                assert 'Overloaded' in str(e)
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def test_warm_task():
+    sphincs = SPHINCS(**PARAMS)
+    sk, pk = sphincs.keygen()
+    cache = LeafCache.build(sphincs, sk[0], sk[2], 1)
+    packed = service.without_masks(sphincs, sphincs.pack(sk))
+    service.init_worker(PARAMS, packed, sphincs.pack(pk), cache)
+    try:
+        assert service._worker['sk'][2] == sk[2]
+        with HashCounter(service._worker['sphincs']) as counter:
+            assert service.warm_task()
+        # a WOTS+ leaf with the secret key, and a verification with the
+        # public key that stops after HORST
+        assert counter.total()['Fa'] == 1
+        assert counter.total()['Hdigest'] == 1
+        assert cache.key is not None
+    finally:
+        service._worker.clear()
+
+
+def test_service_metrics():
+    sphincs = SPHINCS(**PARAMS)
+    sk, pk = sphincs.keygen()
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'sphincs.sock')
+    metrics = os.path.join(directory, 'sphincs.prom')
+    server = Server(path, PARAMS, pk=sphincs.pack(pk), workers=1,
+                    metrics=metrics, metrics_interval=0.01)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        M = os.urandom(100)
+        with Client(path) as client:
+            assert client.verify(M, sphincs.pack(sphincs.sign(M, sk)))
+        deadline = time.monotonic() + 30
+        while True:
+            found = glob.glob(os.path.join(directory, 'sphincs.*[0-9].prom'))
+            text = ''.join(open(f).read() for f in found)
+            if 'sphincs_operations_total' in text:
+                break
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        # the operations are counted by the worker, labelled with its pid
+        assert len(found) == 1
+        pid = found[0].split('.')[-2]
+        assert ('sphincs_operations_total{op="verify",worker="%s"} 1\n' %
+                pid) in text
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+    with open(metrics) as f:
+        text = f.read()
+    assert 'sphincs_scheduler_wait_seconds_count{op="verify"}' in text
+    assert 'sphincs_scheduler_queue_depth{op="verify"} 0\n' in text
+    assert glob.glob(os.path.join(directory, '*.prom')) == [metrics]
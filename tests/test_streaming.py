@@ -0,0 +1,36 @@
+import os
+from SPHINCS import SPHINCS
+
+
+def test_verifier():
+    sphincs = SPHINCS(n=256, m=512, h=8, d=2, w=4, tau=8, k=64)
+    M = os.urandom(256)
+    sk, pk = sphincs.keygen()
+    sig = sphincs.pack(sphincs.sign(M, sk))
+    for chunksize in [1, 1000, len(sig)]:
+        verifier = sphincs.verifier(M, pk)
+        for i in range(0, len(sig), chunksize):
+            assert verifier.update(sig[i:i+chunksize])
+        assert verifier.finalize()
+    verifier = sphincs.verifier(M, pk)
+    assert verifier.update(sig[:-1])
+    assert not verifier.finalize()
+    verifier = sphincs.verifier(M, pk)
+    assert not verifier.update(sig + bytes(1))
+    # a corrupted HORST signature is rejected before the hyper-tree arrives
+    layer = (sphincs.wots.l + sphincs.h // sphincs.d) * 32
+    horst_end = len(sig) - sphincs.d * layer
+    bad = bytearray(sig)
+    bad[100] ^= 1
+    verifier = sphincs.verifier(M, pk)
+    assert not verifier.update(bad[:horst_end])
+    assert not verifier.finalize()
+
+
+def test_sign_stream():
+    sphincs = SPHINCS(n=256, m=512, h=8, d=2, w=4, tau=8, k=64)
+    M = os.urandom(256)
+    sk, pk = sphincs.keygen()
+    chunks = list(sphincs.sign_stream(M, sk))
+    assert len(chunks) == 3 + 2 * sphincs.d
+    assert b''.join(chunks) == sphincs.pack(sphincs.sign(M, sk))
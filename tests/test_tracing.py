@@ -0,0 +1,49 @@
+import os
+import io
+import json
+from SPHINCS import SPHINCS
+from tracing import Tracer, Recorder, Histogram
+
+
+def test_histogram():
+    h = Histogram()
+    for i in range(1, 101):
+        h.add(i / 1000)
+    assert h.count == 100
+    assert 0.045 <= h.quantile(0.5) <= 0.071
+    assert h.quantile(0.99) <= h.max == 0.1
+    other = Histogram()
+    other.add(1.0)
+    h.merge(other)
+    assert h.count == 101 and h.max == 1.0
+
+
+def test_tracer():
+    sphincs = SPHINCS(n=256, m=512, h=4, d=2, w=16, tau=8, k=64)
+    spans = []
+    recorder = Recorder()
+    sphincs.observers += [Tracer(spans.append), recorder]
+    sk, pk = sphincs.keygen()
+    sig = sphincs.sign(os.urandom(32), sk)
+    names = [span.label for span in spans]
+    assert names[-1] == 'sign'
+    for level in range(sphincs.d):
+        assert 'sign.wots_path/%d' % level in names
+    outer = spans[-1]
+    assert all(outer.start <= s.start and s.end <= outer.end
+               for s in spans if s.name.startswith('sign.'))
+    summary = recorder.summary()
+    assert summary['keygen']['count'] == 1
+    assert summary['sign.horst']['p99'] <= summary['sign']['max']
+    f = io.StringIO()
+    recorder.dump(f)
+    events = json.loads(f.getvalue())['traceEvents']
+    assert len(events) == len(spans)
+    event = events[names.index('sign.wots/1')]
+    assert event['ph'] == 'X'
+    assert event['args'] == {'level': 1, 'subtree': 0}
+    # the spans of the bottom layer name the subtree below the HORST tree
+    subh = sphincs.h // sphincs.d
+    for name in ['sign.wots/0', 'sign.wots_path/0']:
+        assert spans[names.index(name)].attrs == {'level': 0,
+                                                  'subtree': sig[0] >> subh}
@@ -1,4 +1,7 @@
-from trees import l_tree, hash_tree, auth_path, construct_root
+import os
+from trees import (l_tree, hash_tree, auth_path, construct_root, treehash,
+                   MaskedHash)
+from bytes_utils import xor
 
 
 def test_sum_tree():
@@ -33,3 +36,21 @@ def test_construct_root():
         leaf = minus_tree[0][i]
         path = auth_path(minus_tree, i)
         assert construct_root(H, path, leaf, i) == minus_tree[-1][0]
+
+
+def test_treehash():
+    H = lambda x, y, i: x * 3 - y + i
+    tree = list(hash_tree(H, range(32)))
+    path, root = treehash(H, iter(range(32)))
+    assert path == [] and root == tree[-1][0]
+    for i in range(32):
+        assert treehash(H, iter(range(32)), i) == (auth_path(tree, i), root)
+
+
+def test_masked_layers():
+    masks = [os.urandom(32) for _ in range(10)]
+    H = lambda x, y: xor(x, y[::-1])
+    plain = lambda x, y, i: H(xor(x, masks[2*i]), xor(y, masks[2*i+1]))
+    leafs = [os.urandom(32) for _ in range(19)]
+    assert list(l_tree(MaskedHash(H, masks), leafs)) == \
+        list(l_tree(plain, leafs))
@@ -0,0 +1,153 @@
+"""Timing spans for the phases of SPHINCS
+
+A Tracer is an observer (see instrument.py) that times every phase and
+passes the finished Span to a callback. The Recorder is a Tracer that keeps
+the spans, aggregates them into latency histograms per phase, and can dump
+them in the Chrome trace event format (to be opened in chrome://tracing or
+Perfetto).
+"""
+import os
+import json
+import time
+import threading
+from bisect import bisect_left
+
+from instrument import label
+
+
+class Span(object):
+
+    def __init__(self, name, attrs, start):
+        self.name = name
+        self.attrs = attrs
+        self.start = start
+        self.end = None
+        self.thread = threading.get_ident()
+
+    @property
+    def label(self):
+        return label(self.name, self.attrs)
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+
+class Tracer(object):
+
+    def __init__(self, callback):
+        """Times the phases of SPHINCS, passing each finished Span to callback
+
+        Append the tracer to SPHINCS.observers to register it.
+        """
+        self.callback = callback
+        self.local = threading.local()
+
+    @property
+    def stack(self):
+        """The spans that are currently open in this thread"""
+        return self.local.__dict__.setdefault('stack', [])
+
+    def enter(self, name, attrs):
+        self.stack.append(Span(name, dict(attrs), time.perf_counter()))
+
+    def exit(self, name, attrs, exc=None):
+        span = self.stack.pop()
+        span.end = time.perf_counter()
+        if exc is not None:
+            span.attrs['error'] = type(exc).__name__
+        self.callback(span)
+
+
+class Histogram(object):
+
+    # exponential bucket bounds (in seconds), from 1us up to roughly 100s
+    BOUNDS = [1e-6 * 2 ** (i / 2) for i in range(54)]
+
+    def __init__(self):
+        self.buckets = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+
+    def add(self, value):
+        self.buckets[bisect_left(self.BOUNDS, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        for i, c in enumerate(other.buckets):
+            self.buckets[i] += c
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q):
+        """Estimates the q-quantile as the upper bound of its bucket
+
+        The estimate is clamped to the observed minimum and maximum.
+        """
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.buckets):
+            seen += c
+            if seen >= rank and c > 0:
+                bound = self.BOUNDS[i] if i < len(self.BOUNDS) else self.max
+                return min(max(bound, self.min), self.max)
+        return self.max
+
+    def summary(self):
+        return {'count': self.count,
+                'mean': self.sum / self.count if self.count else 0.0,
+                'min': self.min if self.count else 0.0,
+                'max': self.max,
+                'p50': self.quantile(0.5),
+                'p95': self.quantile(0.95),
+                'p99': self.quantile(0.99)}
+
+
+class Recorder(Tracer):
+
+    def __init__(self, keep_spans=True):
+        """Aggregates phase latencies, and optionally keeps all spans
+
+        keep_spans -- whether to keep the spans for chrome_trace
+        """
+        super(Recorder, self).__init__(self.record)
+        self.keep_spans = keep_spans
+        self.spans = []
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def record(self, span):
+        with self.lock:
+            if self.keep_spans:
+                self.spans.append(span)
+            h = self.histograms.setdefault(span.label, Histogram())
+            h.add(span.duration)
+
+    def summary(self):
+        """Returns latency statistics (in seconds) per phase label"""
+        return {k: h.summary() for k, h in sorted(self.histograms.items())}
+
+    def chrome_trace(self):
+        pid = os.getpid()
+        events = [{'name': span.label,
+                   'cat': span.name.split('.')[0],
+                   'ph': 'X',
+                   'ts': span.start * 1e6,
+                   'dur': span.duration * 1e6,
+                   'pid': pid,
+                   'tid': span.thread,
+                   'args': span.attrs} for span in self.spans]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def dump(self, f):
+        """Writes the Chrome trace JSON to the file object f"""
+        json.dump(self.chrome_trace(), f)
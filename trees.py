@@ -1,4 +1,25 @@
 from math import log2, ceil
+from bytes_utils import xor, xor_each
+
+
+class MaskedHash(object):
+
+    def __init__(self, H, masks):
+        """Masks both inputs of H with the bitmasks of their tree layer
+
+        H -- function that hashes two nodes into their parent
+        masks -- bitmasks, of which 2i and 2i+1 are used on layer i
+        """
+        self.H = H
+        self.masks = masks
+
+    def __call__(self, x, y, i):
+        return self.H(xor(x, self.masks[2*i]), xor(y, self.masks[2*i+1]))
+
+    def layer(self, lefts, rights, i):
+        """Hashes all pairs of a layer; every node shares the layer's masks"""
+        return list(map(self.H, xor_each(lefts, self.masks[2*i]),
+                        xor_each(rights, self.masks[2*i+1])))
 
 
 def hash_tree(H, leafs):
@@ -10,7 +31,11 @@ def l_tree(H, leafs):
     layer = leafs
     yield layer
     for i in range(ceil(log2(len(leafs)))):
-        next_layer = [H(l, r, i) for l, r in zip(layer[0::2], layer[1::2])]
+        if hasattr(H, 'layer'):  # mask the whole layer at once
+            half = len(layer) // 2
+            next_layer = H.layer(layer[0:2*half:2], layer[1::2], i)
+        else:
+            next_layer = [H(l, r, i) for l, r in zip(layer[0::2], layer[1::2])]
         if len(layer) & 1:  # if there is a node left on this layer
             next_layer.append(layer[-1])
         layer = next_layer
@@ -39,5 +64,31 @@ def construct_root(H, auth_path, leaf, idx):
     return node
 
 
+def treehash(H, leafs, idx=None):
+    """Computes the root of a full binary hash tree from a stream of leafs
+
+    Rather than retaining every layer, it keeps at most one node per height.
+    If idx is given, the authentication path of leaf idx is collected along
+    the way. Returns the authentication path (empty if idx is None) and root.
+    """
+    stack = []  # pairs of (height, node), with strictly decreasing heights
+    path = {}
+    for j, node in enumerate(leafs):
+        height = 0
+        if idx is not None and j == idx ^ 1:
+            path[height] = node
+        while stack and stack[-1][0] == height:
+            _, left = stack.pop()
+            node = H(left, node, height)
+            height += 1
+            if idx is not None and j >> height == (idx >> height) ^ 1:
+                path[height] = node
+        stack.append((height, node))
+    assert len(stack) == 1  # test for full binary tree
+    return [path[i] for i in range(len(path))], stack[0][1]
+
+
 def root(tree):
-    return list(tree)[-1][0]
+    for layer in tree:  # only the current layer of the generator is kept
+        pass
+    return layer[0]